@@ -0,0 +1,69 @@
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+import scipy.sparse as sp
+
+from sgl.operators.utils import adj_to_symmetric_norm, degree_power
+
+
+# Normalization through sparse matrix products, as adj_to_symmetric_norm used to compute it
+def legacy_symmetric_norm(adj, r):
+    adj = adj.tocoo() + sp.eye(adj.shape[0])
+    degrees = np.array(adj.sum(1)).reshape(-1)
+    r_mat_inv_sqrt_left = sp.diags(degree_power(degrees, r - 1))
+    r_mat_inv_sqrt_right = sp.diags(degree_power(degrees, -r))
+    return adj.dot(r_mat_inv_sqrt_left).transpose().dot(r_mat_inv_sqrt_right).tocsr()
+
+
+def random_graph(num_node, avg_degree, seed):
+    rng = np.random.default_rng(seed)
+    num_edge = num_node * avg_degree // 2
+    row, col = rng.integers(0, num_node, num_edge), rng.integers(0, num_node, num_edge)
+    adj = sp.csr_matrix((np.ones(2 * num_edge, dtype=np.float32),
+                         (np.concatenate((row, col)), np.concatenate((col, row)))), shape=(num_node, num_node))
+    adj.data[:] = 1
+    return adj
+
+
+# numpy reports its buffers to tracemalloc, so the peak covers every temporary array
+def measure(fn, *args):
+    tracemalloc.start()
+    t = time.time()
+    result = fn(*args)
+    elapsed = time.time() - t
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 2 ** 20
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("Peak memory and time of the adjacency normalization")
+    parser.add_argument("--dataset", type=str, default=None,
+                        help="ogbn dataset name (e.g. products); a random graph is used if omitted")
+    parser.add_argument("--root", type=str, default="./", help="root directory of the dataset")
+    parser.add_argument("--num-node", type=int, default=2000000, help="number of nodes of the random graph")
+    parser.add_argument("--avg-degree", type=int, default=50, help="average degree of the random graph")
+    parser.add_argument("--r", type=float, nargs="+", default=[0.5, 0., 1.], help="values of r to compare")
+    args = parser.parse_args()
+
+    if args.dataset is not None:
+        from sgl.dataset import Ogbn
+        adj = Ogbn(args.dataset, args.root).adj.tocsr()
+    else:
+        adj = random_graph(args.num_node, args.avg_degree, seed=42)
+    print(f"Graph: {adj.shape[0]} nodes, {adj.nnz} edges")
+
+    for r in args.r:
+        legacy, legacy_time, legacy_peak = measure(legacy_symmetric_norm, adj, r)
+        del legacy
+        in_place, in_place_time, in_place_peak = measure(adj_to_symmetric_norm, adj, r)
+        print(f"r={r}: sparse products {legacy_time:.2f}s / {legacy_peak:.0f}MB, "
+              f"in place {in_place_time:.2f}s / {in_place_peak:.0f}MB")
+
+        legacy = legacy_symmetric_norm(adj, r)
+        assert np.array_equal(legacy.indptr, in_place.indptr) and np.array_equal(legacy.indices, in_place.indices)
+        assert np.array_equal(legacy.data.view(np.uint64), in_place.data.view(np.uint64))
+        del legacy, in_place
+    print("Results are bit-identical")
@@ -0,0 +1,71 @@
+import argparse
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+from sgl.data.reorder import reorder
+from sgl.operators.graph_op import LaplacianGraphOp
+
+
+# Graph made of num_cluster dense communities whose node ids are shuffled, as in most crawled datasets
+def shuffled_community_graph(num_node, avg_degree, num_cluster, p_in, seed):
+    rng = np.random.default_rng(seed)
+    num_edge = num_node * avg_degree // 2
+    cluster_size = num_node // num_cluster
+
+    row = rng.integers(0, num_node, num_edge)
+    inside = rng.random(num_edge) < p_in
+    col = rng.integers(0, num_node, num_edge)
+    col[inside] = (row[inside] // cluster_size) * cluster_size + rng.integers(0, cluster_size, inside.sum())
+    col = np.minimum(col, num_node - 1)
+
+    shuffle = rng.permutation(num_node)
+    row, col = shuffle[row], shuffle[col]
+    adj = sp.csr_matrix((np.ones(2 * num_edge, dtype=np.float32),
+                         (np.concatenate((row, col)), np.concatenate((col, row)))), shape=(num_node, num_node))
+    adj.data[:] = 1
+    return adj
+
+
+def time_propagation(graph_op, adj, feature, repeat):
+    graph_op.propagate(adj, feature)
+    t = time.time()
+    for _ in range(repeat):
+        graph_op.propagate(adj, feature)
+    return (time.time() - t) / repeat
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("SpMM time before and after reordering")
+    parser.add_argument("--num-node", type=int, default=1000000, help="number of nodes")
+    parser.add_argument("--avg-degree", type=int, default=16, help="average degree")
+    parser.add_argument("--num-cluster", type=int, default=1000, help="number of communities")
+    parser.add_argument("--p-in", type=float, default=0.9, help="probability of an intra-community edge")
+    parser.add_argument("--feat-dim", type=int, default=128, help="dimension of the features")
+    parser.add_argument("--prop-steps", type=int, default=3, help="number of propagation steps")
+    parser.add_argument("--num-parts", type=int, default=256, help="number of parts for recursive bisection")
+    parser.add_argument("--repeat", type=int, default=3, help="number of timed runs")
+    parser.add_argument("--methods", type=str, nargs="+", default=["degree", "rcm", "partition"],
+                        help="reordering methods to measure")
+    args = parser.parse_args()
+
+    adj = shuffled_community_graph(args.num_node, args.avg_degree, args.num_cluster, args.p_in, seed=42)
+    feature = np.random.default_rng(0).standard_normal((args.num_node, args.feat_dim), dtype=np.float32)
+    graph_op = LaplacianGraphOp(args.prop_steps, r=0.5)
+    print(f"Graph: {adj.shape[0]} nodes, {adj.nnz} non-zeros")
+
+    base_time = time_propagation(graph_op, adj, feature, args.repeat)
+    print(f"original order: {base_time:.4f}s")
+
+    for method in args.methods:
+        t = time.time()
+        perm = reorder(adj, method, args.num_parts)
+        reorder_time = time.time() - t
+
+        reordered_adj = adj[perm][:, perm]
+        reordered_time = time_propagation(graph_op, reordered_adj, feature[perm], args.repeat)
+        coo = reordered_adj.tocoo()
+        mean_dist = np.abs(coo.row - coo.col).mean()
+        print(f"{method}: reordering {reorder_time:.2f}s, propagation {reordered_time:.4f}s, "
+              f"speedup {base_time / reordered_time:.2f}x, mean |i - j| {mean_dist:.0f}")
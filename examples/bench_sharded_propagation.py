@@ -0,0 +1,63 @@
+import argparse
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+from sgl.operators.graph_op import LaplacianGraphOp
+from sgl.operators.sharded_propagation import ShardedPropagator
+from sgl.operators.utils import adj_to_symmetric_norm
+
+
+# Chung-Lu graph whose expected degrees follow a power law with the given exponent
+def power_law_graph(num_node, avg_degree, exponent, seed):
+    rng = np.random.default_rng(seed)
+    weights = (np.arange(1, num_node + 1, dtype=np.float64)) ** (-1.0 / (exponent - 1))
+    prob = weights / weights.sum()
+
+    num_edge = num_node * avg_degree // 2
+    row = rng.choice(num_node, size=num_edge, p=prob)
+    col = rng.choice(num_node, size=num_edge, p=prob)
+    keep = row != col
+    row, col = row[keep], col[keep]
+
+    adj = sp.csr_matrix((np.ones(2 * len(row), dtype=np.float32),
+                         (np.concatenate((row, col)), np.concatenate((col, row)))), shape=(num_node, num_node))
+    adj.data[:] = 1
+    return adj
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("Sharded propagation scaling")
+    parser.add_argument("--num-node", type=int, default=1000000, help="number of nodes")
+    parser.add_argument("--avg-degree", type=int, default=20, help="average degree")
+    parser.add_argument("--exponent", type=float, default=2.1, help="power-law exponent of the degrees")
+    parser.add_argument("--feat-dim", type=int, default=128, help="dimension of the features")
+    parser.add_argument("--prop-steps", type=int, default=3, help="number of propagation steps")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="worker counts to measure")
+    parser.add_argument("--no-numa", action="store_true", help="do not pin the workers to NUMA nodes")
+    args = parser.parse_args()
+
+    adj = power_law_graph(args.num_node, args.avg_degree, args.exponent, seed=42)
+    feature = np.random.default_rng(0).standard_normal((args.num_node, args.feat_dim), dtype=np.float32)
+    print(f"Graph: {adj.shape[0]} nodes, {adj.nnz} non-zeros, max degree {np.diff(adj.indptr).max()}")
+
+    graph_op = LaplacianGraphOp(args.prop_steps, r=0.5)
+    hops = [args.prop_steps]
+
+    t = time.time()
+    reference = graph_op.propagate(adj, feature, hops)[-1]
+    base_time = time.time() - t
+    print(f"single process: {base_time:.4f}s")
+
+    for num_workers in args.workers:
+        t = time.time()
+        output = graph_op.propagate_sharded(adj, feature, num_workers, hops, numa_aware=not args.no_numa)[-1]
+        elapsed = time.time() - t
+        max_err = (output - reference).abs().max().item()
+        print(f"{num_workers} worker(s) incl. start-up: {elapsed:.4f}s, speedup {base_time / elapsed:.2f}x, max abs err {max_err:.2e}")
+
+        # one more hop on a fresh pool, to report the number of threads every worker actually runs
+        with ShardedPropagator(adj_to_symmetric_norm(adj, 0.5), num_workers, numa_aware=not args.no_numa) as propagator:
+            propagator.propagate(feature, 1, {1})
+            print(f"    threads per worker: {propagator.worker_threads}")
@@ -0,0 +1,66 @@
+import argparse
+import time
+
+import numpy as np
+import torch
+
+from sgl.data import Graph, get_subgraph, get_subgraphs
+
+
+def random_graph(num_node, num_edge, feat_dim, seed):
+    rng = np.random.default_rng(seed)
+    row, col = rng.integers(0, num_node, num_edge), rng.integers(0, num_node, num_edge)
+    x = rng.standard_normal((num_node, feat_dim), dtype=np.float32)
+    y = rng.integers(0, 10, num_node)
+    return Graph(row, col, np.ones(num_edge, dtype=np.float32), num_node, "node", "node__to__node", x=x, y=y)
+
+
+# per-edge dict relabeling, as drop_edges used to do it
+def legacy_relabel(row, col, node_id_dict):
+    row, col = row.clone(), col.clone()
+    for i in range(row.shape[0]):
+        row[i] = node_id_dict[row[i].item()]
+        col[i] = node_id_dict[col[i].item()]
+    return row, col
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("Induced subgraph extraction")
+    parser.add_argument("--num-node", type=int, default=1000000, help="number of nodes")
+    parser.add_argument("--num-edge", type=int, default=10000000, help="number of edges")
+    parser.add_argument("--feat-dim", type=int, default=16, help="dimension of the features")
+    parser.add_argument("--num-subgraph", type=int, default=32, help="number of node sets in the batch")
+    parser.add_argument("--keep-ratio", type=float, default=0.2, help="fraction of nodes kept in every node set")
+    parser.add_argument("--legacy-edges", type=int, default=100000,
+                        help="number of edges relabeled with the legacy loop (the time is extrapolated)")
+    args = parser.parse_args()
+
+    g = random_graph(args.num_node, args.num_edge, args.feat_dim, seed=42)
+    masks = [torch.rand(args.num_node) < args.keep_ratio for _ in range(args.num_subgraph)]
+    print(f"Graph: {g.num_node} nodes, {g.num_edge} edges")
+
+    # legacy dict relabeling on a sample of the edges of the first subgraph
+    row, col = g.edge_index
+    edge_mask = masks[0][row] & masks[0][col]
+    kept_row, kept_col = row[edge_mask], col[edge_mask]
+    node_id_dict = {int(idx): i for i, idx in enumerate(masks[0].nonzero(as_tuple=True)[0])}
+    num_sample = min(args.legacy_edges, kept_row.shape[0])
+    t = time.time()
+    legacy_relabel(kept_row[:num_sample], kept_col[:num_sample], node_id_dict)
+    legacy_time = (time.time() - t) * kept_row.shape[0] / max(num_sample, 1)
+    print(f"legacy relabeling of one subgraph ({kept_row.shape[0]} edges, extrapolated): {legacy_time:.2f}s")
+
+    t = time.time()
+    single = [get_subgraph(g, mask) for mask in masks]
+    single_time = time.time() - t
+    print(f"get_subgraph x {args.num_subgraph}: {single_time:.2f}s")
+
+    t = time.time()
+    batched = get_subgraphs(g, masks)
+    batched_time = time.time() - t
+    print(f"get_subgraphs: {batched_time:.2f}s, speedup {single_time / batched_time:.2f}x")
+
+    for sub_a, sub_b in zip(single, batched):
+        assert sub_a.num_node == sub_b.num_node and sub_a.num_edge == sub_b.num_edge
+        assert all(torch.equal(a, b) for a, b in zip(sub_a.edge_index, sub_b.edge_index))
+    print("get_subgraph and get_subgraphs results match")
@@ -0,0 +1,50 @@
+import argparse
+
+import numpy as np
+import scipy.sparse as sp
+
+from sgl.operators.base_op import GraphOp
+from sgl.operators.graph_op import LaplacianGraphOp
+from sgl.operators.utils import adj_to_symmetric_norm
+
+
+# A user-defined operator written before the degrees were passed to _construct_adj
+class LegacyLaplacianGraphOp(GraphOp):
+    def __init__(self, prop_steps, r=0.5):
+        super(LegacyLaplacianGraphOp, self).__init__(prop_steps)
+        self.__r = r
+
+    def _construct_adj(self, adj):
+        return adj_to_symmetric_norm(adj.tocoo(), self.__r)
+
+
+def random_undirected_graph(num_node, avg_degree, seed):
+    rng = np.random.default_rng(seed)
+    num_edge = num_node * avg_degree // 2
+    row, col = rng.integers(0, num_node, num_edge), rng.integers(0, num_node, num_edge)
+    adj = sp.csr_matrix((np.ones(2 * num_edge, dtype=np.float32),
+                         (np.concatenate((row, col)), np.concatenate((col, row)))), shape=(num_node, num_node))
+    adj.data[:] = 1
+    return adj
+
+
+# Checks that operators whose _construct_adj only takes the adjacency still propagate when degrees are passed,
+# as NodeClassification does, and agree with the built-in operator.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("Legacy graph operator check")
+    parser.add_argument("--num-node", type=int, default=10000, help="number of nodes")
+    parser.add_argument("--avg-degree", type=int, default=10, help="average degree")
+    parser.add_argument("--feat-dim", type=int, default=32, help="dimension of the features")
+    parser.add_argument("--prop-steps", type=int, default=3, help="number of propagation steps")
+    args = parser.parse_args()
+
+    adj = random_undirected_graph(args.num_node, args.avg_degree, seed=42)
+    feature = np.random.default_rng(0).standard_normal((args.num_node, args.feat_dim), dtype=np.float32)
+    degrees = np.asarray(adj.sum(axis=1), dtype=np.float64).reshape(-1) + 1
+
+    legacy = LegacyLaplacianGraphOp(args.prop_steps).propagate(adj, feature, degrees=degrees)
+    reference = LaplacianGraphOp(args.prop_steps).propagate(adj, feature, degrees=degrees)
+    max_err = max((hop - ref).abs().max().item() for hop, ref in zip(legacy, reference))
+    print(f"max abs err {max_err:.2e}")
+    if max_err > 1e-5:
+        raise AssertionError("The legacy operator differs from LaplacianGraphOp!")
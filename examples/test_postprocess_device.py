@@ -0,0 +1,55 @@
+import argparse
+
+import numpy as np
+import scipy.sparse as sp
+import torch
+
+from sgl.models.base_model import BaseSGAPModel
+from sgl.operators.graph_op import LaplacianGraphOp
+from sgl.operators.message_op import MeanMessageOp, SimpleWeightedMessageOp
+
+
+def random_undirected_graph(num_node, avg_degree, seed):
+    rng = np.random.default_rng(seed)
+    num_edge = num_node * avg_degree // 2
+    row, col = rng.integers(0, num_node, num_edge), rng.integers(0, num_node, num_edge)
+    adj = sp.csr_matrix((np.ones(2 * num_edge, dtype=np.float32),
+                         (np.concatenate((row, col)), np.concatenate((col, row)))), shape=(num_node, num_node))
+    adj.data[:] = 1
+    return adj
+
+
+def post_model(prop_steps, num_classes, post_msg_op):
+    model = BaseSGAPModel(prop_steps, num_classes, num_classes)
+    model._post_graph_op = LaplacianGraphOp(prop_steps, r=0.5)
+    model._post_msg_op = post_msg_op
+    return model
+
+
+# Checks that the post-processing of outputs living on a device matches the one of the same outputs on the cpu.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("Post-processing device check")
+    parser.add_argument("--device", type=str, default="cuda:0", help="device holding the outputs")
+    parser.add_argument("--num-node", type=int, default=10000, help="number of nodes")
+    parser.add_argument("--avg-degree", type=int, default=10, help="average degree")
+    parser.add_argument("--num-classes", type=int, default=16, help="number of classes")
+    parser.add_argument("--prop-steps", type=int, default=3, help="number of propagation steps")
+    args = parser.parse_args()
+
+    device = torch.device(args.device)
+    if device.type == "cuda" and not torch.cuda.is_available():
+        raise SystemExit("CUDA is not available, nothing to check!")
+
+    adj = random_undirected_graph(args.num_node, args.avg_degree, seed=42)
+    output = torch.randn(args.num_node, args.num_classes)
+    msg_ops = {"mean": lambda: MeanMessageOp(0, args.prop_steps + 1),
+               "alpha": lambda: SimpleWeightedMessageOp(0, args.prop_steps + 1, "alpha", 0.15)}
+    for name, msg_op in msg_ops.items():
+        reference = post_model(args.prop_steps, args.num_classes, msg_op()).postprocess(adj, output)
+        result = post_model(args.prop_steps, args.num_classes, msg_op()).postprocess(adj, output.to(device))
+        if result.device != device:
+            raise AssertionError(f"{name}: the post-processed output left {device}!")
+        max_err = (result.cpu() - reference).abs().max().item()
+        print(f"{name}: max abs err {max_err:.2e}")
+        if max_err > 1e-5:
+            raise AssertionError(f"{name}: the post-processed outputs differ between the cpu and {device}!")
@@ -1,6 +1,12 @@
-from .transforms import random_drop_edges, random_drop_nodes, biased_drop_edges, get_subgraph, mask_features
+from .transforms import random_drop_edges, random_drop_nodes, biased_drop_edges, get_subgraph, get_subgraphs, mask_features
 from .transforms import sort_edges, add_edges, delete_repeated_edges, add_self_loops, remove_self_loops
 from .base_data import Node, Edge, Graph
+from .disk_csr import DiskCSRMatrix
+from .columnar import save_columnar, load_columnar, save_split, load_split, migrate_pickle
+from .ingest import EdgeFileFormat, ingest_edge_list
+from .augment import DropEdges, DropNodes, MaskFeatures, AugmentedView, AugmentationPipeline
+from .reorder import degree_order, rcm_order, recursive_bisection, reorder, reorder_graph
+from .meta_path import MetaPathEngine
 
 __all__ = [
     "random_drop_edges",
@@ -8,6 +14,7 @@ __all__ = [
     "biased_drop_edges",
     "mask_features",
     "get_subgraph",
+    "get_subgraphs",
     "sort_edges",
     "add_edges",
     "delete_repeated_edges",
@@ -16,4 +23,21 @@ __all__ = [
     "Node", 
     "Edge",
     "Graph",
+    "DiskCSRMatrix",
+    "DropEdges",
+    "DropNodes",
+    "MaskFeatures",
+    "AugmentedView",
+    "AugmentationPipeline",
+    "save_columnar",
+    "load_columnar",
+    "migrate_pickle",
+    "EdgeFileFormat",
+    "ingest_edge_list",
+    "degree_order",
+    "rcm_order",
+    "recursive_bisection",
+    "reorder",
+    "reorder_graph",
+    "MetaPathEngine",
 ]
\ No newline at end of file
@@ -0,0 +1,265 @@
+import queue
+import threading
+import numpy as np
+import torch
+from scipy.sparse import csr_matrix
+from torch import BoolTensor, Tensor
+from typing import List, Optional
+
+from sgl.data.base_data import Node, Edge, Graph
+
+# Augmentations expressed as masks over a shared base graph. Every augmentation draws the masks of all the
+# views at once, as (num_views, ...) boolean tensors; the views only hold these masks and a reference to the
+# base graph, so neither the edges nor the features are copied until a view is materialized.
+
+
+class Augmentation:
+    def prepare(self, g: Graph) -> None:
+        """
+        precompute what the sampling needs from the base graph; called once by the pipeline
+        """
+        pass
+
+    def sample(self, g: Graph, num_views: int, masks: dict, generator: torch.Generator) -> None:
+        """
+        combine the masks of this augmentation into masks ('node', 'edge' and 'feature' entries)
+        """
+        raise NotImplementedError
+
+
+def _combine(masks, key, mask):
+    masks[key] = mask if masks.get(key) is None else masks[key] & mask
+
+
+class DropEdges(Augmentation):
+    """
+    p - dropping probability; force_undirected - an edge and its reverse are kept or dropped together
+    """
+    def __init__(self, p: float = 0.5, force_undirected: bool = True):
+        if p < 0. or p > 1.:
+            raise ValueError('Dropout probability has to be between 0 and 1!')
+        self.__p = p
+        self.__force_undirected = force_undirected
+        self.__pair_ids, self.__num_pair = None, None
+
+    def prepare(self, g):
+        if not self.__force_undirected:
+            return
+        row, col = (index.numpy() for index in g.edge_index)
+        keys = np.minimum(row, col).astype(np.int64) * g.num_node + np.maximum(row, col)
+        uniq, pair_ids = np.unique(keys, return_inverse=True)
+        self.__pair_ids, self.__num_pair = torch.from_numpy(pair_ids.reshape(-1)), len(uniq)
+
+    def sample(self, g, num_views, masks, generator):
+        if self.__force_undirected:
+            if self.__pair_ids is None:
+                self.prepare(g)
+            pair_mask = torch.rand((num_views, self.__num_pair), generator=generator) >= self.__p
+            mask = pair_mask[:, self.__pair_ids]
+        else:
+            mask = torch.rand((num_views, g.num_edge), generator=generator) >= self.__p
+        _combine(masks, "edge", mask)
+
+
+class DropNodes(Augmentation):
+    """
+    p - dropping probability; the edges of a dropped node are dropped and its features are zeroed
+    """
+    def __init__(self, p: float = 0.5):
+        if p < 0. or p > 1.:
+            raise ValueError('Dropout probability has to be between 0 and 1!')
+        self.__p = p
+
+    def sample(self, g, num_views, masks, generator):
+        _combine(masks, "node", torch.rand((num_views, g.num_node), generator=generator) >= self.__p)
+
+
+class MaskFeatures(Augmentation):
+    """
+    p - masking probability; by_column - mask whole feature columns, otherwise single elements
+    (element masks take num_views * num_node * num_features bytes)
+    """
+    def __init__(self, p: float = 0.3, by_column: bool = True):
+        if p < 0. or p > 1.:
+            raise ValueError('Masking probability has to be between 0 and 1!')
+        self.__p = p
+        self.__by_column = by_column
+
+    def sample(self, g, num_views, masks, generator):
+        if g.x is None:
+            raise ValueError('make sure that the graph has a feature matrix')
+        shape = (num_views, g.num_features) if self.__by_column else (num_views, g.num_node, g.num_features)
+        _combine(masks, "feature", torch.rand(shape, generator=generator) >= self.__p)
+
+
+class AugmentedView:
+    """
+    One augmented view of a base graph, described by its (optional) node, edge and feature keep masks.
+    Node ids are kept: dropped nodes stay in the view with zero features and no edges.
+    """
+    def __init__(self, base: Graph, node_mask: Optional[BoolTensor] = None, edge_mask: Optional[BoolTensor] = None,
+                 feature_mask: Optional[BoolTensor] = None):
+        self.__base = base
+        self.__node_mask = node_mask
+        self.__edge_mask = edge_mask
+        self.__feature_mask = feature_mask
+        self.__adj = None
+
+    @property
+    def base(self):
+        return self.__base
+
+    @property
+    def node_mask(self):
+        return self.__node_mask
+
+    @property
+    def edge_mask(self):
+        return self.__edge_mask
+
+    @property
+    def feature_mask(self):
+        return self.__feature_mask
+
+    @property
+    def num_node(self):
+        return self.__base.num_node
+
+    @property
+    def edge_index(self):
+        row, col = self.__base.edge_index
+        if self.__edge_mask is None:
+            return row, col
+        return row[self.__edge_mask], col[self.__edge_mask]
+
+    @property
+    def edge_weight(self):
+        edge_weight = self.__base.edge_weight
+        return edge_weight if self.__edge_mask is None else edge_weight[self.__edge_mask]
+
+    @property
+    def adj(self):
+        if self.__adj is None:
+            if self.__edge_mask is None:
+                self.__adj = self.__base.adj
+            else:
+                row, col = self.edge_index
+                self.__adj = csr_matrix((self.edge_weight.numpy(), (row.numpy(), col.numpy())),
+                                        shape=(self.num_node, self.num_node))
+        return self.__adj
+
+    @property
+    def x(self):
+        """
+        the masked features; a new tensor is only created when some mask applies to the features
+        """
+        x = self.__base.x
+        if x is None or (self.__node_mask is None and self.__feature_mask is None):
+            return x
+        keep = torch.ones((1, 1), dtype=torch.bool)
+        if self.__node_mask is not None:
+            keep = keep & self.__node_mask.view(-1, 1)
+        if self.__feature_mask is not None:
+            keep = keep & (self.__feature_mask.view(1, -1) if self.__feature_mask.dim() == 1 else self.__feature_mask)
+        return x * keep
+
+    @property
+    def y(self):
+        return self.__base.y
+
+    def to_graph(self) -> Graph:
+        row, col = self.edge_index
+        edge = Edge(row, col, self.edge_weight, self.__base.edge_type, self.num_node)
+        node = Node(self.__base.node_type, self.num_node, self.x, self.y)
+        return Graph.from_parts(edge, node)
+
+
+class AugmentationPipeline:
+    """
+    g - shared base graph; augmentations - composed by intersecting their keep masks
+    num_views - number of views drawn per sample; seed - makes the sequence of views reproducible
+    """
+    def __init__(self, g: Graph, augmentations: List[Augmentation], num_views: int = 2, seed: Optional[int] = None):
+        if num_views <= 0:
+            raise ValueError('The number of views must be a positive integer!')
+        self.__g = g
+        self.__augmentations = augmentations
+        self.__num_views = num_views
+        self.__generator = torch.Generator()
+        if seed is not None:
+            self.__generator.manual_seed(seed)
+        else:
+            self.__generator.seed()
+        for augmentation in augmentations:
+            augmentation.prepare(g)
+
+        self.__queue = None
+        self.__worker = None
+        self.__stop = threading.Event()
+
+    def sample(self) -> List[AugmentedView]:
+        masks = {}
+        for augmentation in self.__augmentations:
+            augmentation.sample(self.__g, self.__num_views, masks, self.__generator)
+
+        node_mask, edge_mask, feature_mask = masks.get("node"), masks.get("edge"), masks.get("feature")
+        if node_mask is not None:
+            # edges incident to a dropped node are dropped as well
+            row, col = self.__g.edge_index
+            incident_mask = node_mask[:, row] & node_mask[:, col]
+            edge_mask = incident_mask if edge_mask is None else edge_mask & incident_mask
+
+        return [AugmentedView(self.__g,
+                              node_mask[i] if node_mask is not None else None,
+                              edge_mask[i] if edge_mask is not None else None,
+                              feature_mask[i] if feature_mask is not None else None)
+                for i in range(self.__num_views)]
+
+    # gives up once close() is called, so the worker never blocks on a full queue that nobody consumes
+    def _put(self, item):
+        while not self.__stop.is_set():
+            try:
+                self.__queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _run(self, num_samples):
+        try:
+            for _ in range(num_samples):
+                if self.__stop.is_set():
+                    return
+                self._put(self.sample())
+        except Exception as e:
+            self._put(e)
+
+    def prefetch(self, num_samples: int, buffer_size: int = 2):
+        """
+        draw num_samples groups of views on a background thread, at most buffer_size ahead of the consumer;
+        the random draws run in torch kernels that release the GIL, so the training loop keeps running
+        """
+        self.close()
+        self.__stop.clear()
+        self.__queue = queue.Queue(maxsize=buffer_size)
+        self.__worker = threading.Thread(target=self._run, args=(num_samples,), daemon=True)
+        self.__worker.start()
+
+        try:
+            for _ in range(num_samples):
+                item = self.__queue.get()
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # also reached when the consumer stops iterating early
+            self.close()
+
+    def close(self):
+        if self.__worker is not None:
+            self.__stop.set()
+            self.__worker.join()
+            self.__worker, self.__queue = None, None
+
+    def __iter__(self):
+        while True:
+            yield self.sample()
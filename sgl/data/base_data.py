@@ -1,4 +1,5 @@
 import numpy as np
+import scipy.sparse as sp
 import torch
 from scipy.sparse import csr_matrix
 from torch import Tensor
@@ -20,19 +21,68 @@ class Edge:
             col = torch.LongTensor(col)
         if not isinstance(edge_weight, Tensor):
             edge_weight = torch.FloatTensor(edge_weight)
+        # the COO edge list is the canonical representation; the csr/csc views are built on first access
         self.__row = row
         self.__col = col
         self.__edge_weight = edge_weight
         self.__edge_attrs = edge_attrs
         self.__num_edge = len(row)
-
-        self.__sparse_matrix = csr_matrix((edge_weight.numpy(), (row.numpy(), col.numpy())),
-                                              shape=(num_node, num_node))
+        self.__num_node = num_node
+        self.__sparse_matrix = None
+        self.__csc_matrix = None
+
+    # pickles written before the views became lazy hold a csr matrix only
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if "_Edge__num_node" not in state:
+            self.__num_node = state["_Edge__sparse_matrix"].shape[0]
+        if "_Edge__csc_matrix" not in state:
+            self.__csc_matrix = None
+
+    # Build an edge set straight from a csr matrix (e.g. memory-mapped arrays) without going through COO.
+    # Unless given, row/col/edge_weight are derived from the csr matrix on first access.
+    @classmethod
+    def from_csr(cls, sparse_matrix, edge_type, row=None, col=None, edge_weight=None, edge_attrs=None):
+        if not isinstance(edge_type, str):
+            raise TypeError("Edge type must be a string!")
+        if not isinstance(sparse_matrix, csr_matrix):
+            raise TypeError("The sparse matrix must be a scipy csr sparse matrix!")
+        if (row is None) != (col is None) or (row is None) != (edge_weight is None):
+            raise ValueError("Row, col and edge_weight must be given together!")
+
+        eg = cls.__new__(cls)
+        eg.__edge_type = edge_type
+        eg.__sparse_matrix = sparse_matrix
+        eg.__row, eg.__col, eg.__edge_weight = row, col, edge_weight
+        eg.__edge_attrs = edge_attrs
+        eg.__num_edge = len(row) if row is not None else sparse_matrix.nnz
+        eg.__num_node = sparse_matrix.shape[0]
+        eg.__csc_matrix = None
+        return eg
+
+    def __coo_from_csr(self):
+        indptr = self.__sparse_matrix.indptr
+        self.__row = torch.from_numpy(np.repeat(np.arange(len(indptr) - 1, dtype=np.int64), np.diff(indptr)))
+        self.__col = torch.from_numpy(self.__sparse_matrix.indices.astype(np.int64))
+        self.__edge_weight = torch.from_numpy(self.__sparse_matrix.data.astype(np.float32))
 
     @property
     def sparse_matrix(self):
+        if self.__sparse_matrix is None:
+            self.__sparse_matrix = csr_matrix((self.__edge_weight.numpy(), (self.__row.numpy(), self.__col.numpy())),
+                                              shape=(self.__num_node, self.__num_node))
         return self.__sparse_matrix
 
+    @property
+    def csc_matrix(self):
+        if self.__csc_matrix is None:
+            self.__csc_matrix = self.sparse_matrix.tocsc()
+        return self.__csc_matrix
+
+    @property
+    def num_node(self):
+        return self.__num_node
+
     @property
     def edge_type(self):
         return self.__edge_type
@@ -43,7 +93,7 @@ class Edge:
 
     @property
     def edge_index(self):
-        return self.__row, self.__col
+        return self.row, self.col
 
     @property
     def edge_attrs(self):
@@ -57,14 +107,20 @@ class Edge:
 
     @property
     def row(self):
+        if self.__row is None:
+            self.__coo_from_csr()
         return self.__row
 
     @property
     def col(self):
+        if self.__col is None:
+            self.__coo_from_csr()
         return self.__col
 
     @property
     def edge_weight(self):
+        if self.__edge_weight is None:
+            self.__coo_from_csr()
         return self.__edge_weight
 
 
@@ -148,6 +204,56 @@ class Graph:
 
         self.__edge = Edge(row, col, edge_weight, edge_type, num_node, edge_attr)
         self.__node = Node(node_type, num_node, x, y, node_ids)
+        self.__degree_cache = {}
+
+    # assemble a graph from an already built edge set and node set
+    @classmethod
+    def from_parts(cls, edge, node):
+        g = cls.__new__(cls)
+        g.__degree_cache = {}
+        g.edge, g.node = edge, node
+        return g
+
+    # pickles written before the degree cache existed
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if "_Graph__degree_cache" not in state:
+            self.__degree_cache = {}
+
+    # Weighted degrees, as float64 numpy arrays cached on first use. direction: 'out' (row sums) or 'in' (column sums).
+    # With self_loops, the degrees are those of adj + I, i.e. the degrees without self-loops plus one, so the
+    # adjacency is never copied (they match the row sums of adj + I exactly for integer weights).
+    def degrees(self, self_loops=False, direction="out"):
+        if direction not in ("out", "in"):
+            raise ValueError("direction must be 'out' or 'in'!")
+        key = (direction, self_loops)
+        if key not in self.__degree_cache:
+            if self_loops:
+                self.__degree_cache[key] = self.degrees(False, direction) + 1
+            else:
+                self.__degree_cache[key] = np.asarray(self.adj.sum(axis=1 if direction == "out" else 0),
+                                                      dtype=np.float64).reshape(-1)
+        return self.__degree_cache[key]
+
+    # cache degrees computed elsewhere, e.g. loaded along with a columnar dataset
+    def set_degrees(self, degrees, self_loops=False, direction="out"):
+        if len(degrees) != self.num_node:
+            raise ValueError("There must be one degree per node!")
+        self.__degree_cache[(direction, self_loops)] = degrees
+        # powers derived from the replaced degrees are dropped
+        for key in [key for key in self.__degree_cache if key[0] == "power" and key[1:3] == (direction, self_loops)]:
+            del self.__degree_cache[key]
+
+    # degrees ** exponent (e.g. the D^{-r} vectors of the normalization), with zero-degree entries set to zero
+    def degree_power(self, exponent, self_loops=True, direction="out"):
+        key = ("power", direction, self_loops, exponent)
+        if key not in self.__degree_cache:
+            degrees = self.degrees(self_loops, direction)
+            with np.errstate(divide="ignore"):
+                powered = np.power(degrees, exponent)
+            powered[np.isinf(powered)] = 0.
+            self.__degree_cache[key] = powered
+        return self.__degree_cache[key]
 
     @property
     def num_node(self):
@@ -209,8 +315,7 @@ class Graph:
 
     @property
     def node_degrees(self):
-        row_sum = self.adj.sum(axis=1)
-        return torch.LongTensor(row_sum).squeeze(1)
+        return torch.from_numpy(self.degrees().astype(np.int64))
 
     @property
     def node(self):
@@ -231,6 +336,7 @@ class Graph:
         if not isinstance(edge, Edge):
             raise TypeError("edge must be an Edge!")
         self.__edge = edge
+        self.__degree_cache = {}
 
 
 # Base class for heterogeneous graph
@@ -287,15 +393,17 @@ class HeteroGraph:
             raise ValueError("The keys of the rows, cols, edge_weights and edge_types must be the same!")
 
         for edge_type in edge_types:
-            if edge_attr_dict is not None:
-                self.__edges_dict[edge_type] = Edge(row_dict[edge_type], col_dict[edge_type],
-                                                    edge_weight_dict[edge_type], edge_type,
-                                                    edge_attr_dict.get(edge_type, None))
-            else:
-                self.__edges_dict[edge_type] = Edge(row_dict[edge_type], col_dict[edge_type],
-                                                    edge_weight_dict[edge_type], edge_type,
-                                                    node_count)
-
+            edge_attrs = edge_attr_dict.get(edge_type, None) if edge_attr_dict is not None else None
+            self.__edges_dict[edge_type] = Edge(row_dict[edge_type], col_dict[edge_type],
+                                                edge_weight_dict[edge_type], edge_type,
+                                                node_count, edge_attrs)
+        self.__blocks = {}
+
+    # pickles written before the typed blocks were cached
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if "_HeteroGraph__blocks" not in state:
+            self.__blocks = {}
 
     def __getitem__(self, key):
         if key in self.__edge_types:
@@ -314,6 +422,7 @@ class HeteroGraph:
             # more restrictions
 
             self.__edges_dict[key] = value
+            self.__blocks.pop(key, None)
         elif key in self.__node_types:
             if not isinstance(value, Node):
                 raise TypeError("Please organize the dataset using the Node class!")
@@ -327,6 +436,26 @@ class HeteroGraph:
     def node_id_dict(self):
         return self.__node_id_dict
 
+    # offset of every node type in the global node id space
+    @property
+    def node_id_offsets(self):
+        return self.__node_id_offsets
+
+    # Typed block of an edge type "src__to__dst": a (num_src x num_dst) csr matrix of the edge weights
+    # in node ids local to the two node types, built on first access and cached.
+    def block(self, edge_type):
+        if edge_type not in self.__edge_types:
+            raise ValueError("Please input valid edge type!")
+        if edge_type not in self.__blocks:
+            src_type, dst_type = edge_type.split("__")[0], edge_type.split("__")[2]
+            row, col = self.__edges_dict[edge_type].edge_index
+            row = row.numpy() - self.__node_id_offsets[src_type]
+            col = col.numpy() - self.__node_id_offsets[dst_type]
+            edge_weight = self.__edges_dict[edge_type].edge_weight.numpy()
+            self.__blocks[edge_type] = csr_matrix((edge_weight, (row, col)), shape=(
+                self.__nodes_dict[src_type].num_node, self.__nodes_dict[dst_type].num_node))
+        return self.__blocks[edge_type]
+
     @property
     def nodes(self):
         return self.__nodes_dict
@@ -2,11 +2,15 @@ import itertools
 import numpy as np
 import os
 import os.path as osp
+import scipy.sparse as sp
 import torch
 import warnings
 from scipy.sparse import csr_matrix
 
 from sgl.data.base_data import Node, Edge
+from sgl.data.columnar import MANIFEST_FILE, columnar_path, load_split, save_split
+from sgl.data.meta_path import MetaPathEngine, parse_meta_path
+from sgl.data.reorder import reorder, reorder_graph
 from sgl.data.utils import file_exist, to_undirected
 from sgl.dataset.choose_edge_type import ChooseMultiSubgraphs
 
@@ -20,6 +24,7 @@ class NodeDataset:
         self._processed_dir = osp.join(self._root, "processed")
         self._data = None
         self._train_idx, self._val_idx, self._test_idx = None, None, None
+        self._perm, self._inv_perm = None, None
         self.__preprocess()
 
     @property
@@ -50,7 +55,7 @@ class NodeDataset:
             self._download()
             print("Downloading done!")
 
-        if file_exist(self.processed_file_paths):
+        if file_exist(self.processed_file_paths) or self._columnar_dir() is not None:
             print("Files already processed.")
         else:
             print("Processing...")
@@ -59,6 +64,29 @@ class NodeDataset:
             self._process()
             print("Processing done!")
 
+    # directory of the columnar copy of the processed graph (see sgl.dataset.utils.graph_read_file), or None
+    def _columnar_dir(self):
+        processed_file = self.processed_file_paths
+        if not isinstance(processed_file, str):
+            return None
+        path = osp.dirname(processed_file) if osp.basename(processed_file) == MANIFEST_FILE \
+            else columnar_path(processed_file)
+        return path if osp.exists(osp.join(path, MANIFEST_FILE)) else None
+
+    # The train/val/test indices of a deterministic split, stored with the columnar copy of the graph under the split
+    # name and its parameters, so that later loads read them from there instead of the raw files.
+    # Random splits are drawn anew on every load.
+    def _stored_split(self, split, generate, *params):
+        path = self._columnar_dir()
+        if split == "random" or path is None:
+            return generate()
+        key = "_".join([split] + [str(param) for param in params])
+        stored = load_split(path, key)
+        if stored is None:
+            stored = generate()
+            save_split(path, key, stored)
+        return stored
+
     @property
     def data(self):
         return self._data
@@ -119,6 +147,48 @@ class NodeDataset:
     def num_node(self):
         return self._data.num_node
 
+    # degrees of adj + I, computed once and cached with the graph (persisted by the columnar format)
+    @property
+    def degrees(self):
+        return self._data.degrees(self_loops=True)
+
+    # perm[new_id] = original id, accumulated over all the reorderings
+    @property
+    def perm(self):
+        return self._perm
+
+    # inv_perm[original id] = new_id
+    @property
+    def inv_perm(self):
+        return self._inv_perm
+
+    # Relabel the nodes for a better memory locality of the propagation, see sgl.data.reorder.
+    # The train/val/test indices are remapped to the new ids, keeping their container and dtype.
+    def reorder(self, method="rcm", num_parts=16):
+        perm = reorder(self.adj, method, num_parts)
+        self._data, inv_perm = reorder_graph(self._data, perm)
+
+        def remap(idx):
+            if idx is None:
+                return None
+            elif isinstance(idx, torch.Tensor):
+                new_idx = inv_perm[idx.cpu().numpy().astype(np.int64)]
+                return torch.from_numpy(new_idx).to(dtype=idx.dtype, device=idx.device)
+            elif isinstance(idx, np.ndarray):
+                return inv_perm[idx.astype(np.int64)].astype(idx.dtype)
+            elif isinstance(idx, list):
+                return inv_perm[np.asarray(idx, dtype=np.int64)].tolist()
+            raise TypeError("The split indices must be a tensor, a numpy array or a list!")
+
+        self._train_idx, self._val_idx, self._test_idx = map(remap, (self._train_idx, self._val_idx, self._test_idx))
+        if self._perm is None:
+            self._perm, self._inv_perm = perm, inv_perm
+        else:
+            self._perm = self._perm[perm]
+            self._inv_perm = np.empty_like(self._perm)
+            self._inv_perm[self._perm] = np.arange(len(self._perm))
+        return self
+
 
 # Base class for graph-level tasks
 class GraphDataset:
@@ -134,6 +204,7 @@ class HeteroNodeDataset:
         self._processed_dir = osp.join(self._root, "processed")
         self._data = None
         self._train_idx, self._val_idx, self._test_idx = None, None, None
+        self.__meta_path_engine = None
         self.__preprocess()
 
     @property
@@ -245,158 +316,91 @@ class HeteroNodeDataset:
                 if not isinstance(edge_type, str):
                     raise TypeError("Edge type must be a string!")
 
-        pre_sampled_node_types = []
+        pre_sampled_node_types = set()
         for edge_type in edge_types:
-            pre_sampled_node_types = pre_sampled_node_types + \
-                                     [edge_type.split('__')[0], edge_type.split('__')[2]]
-        pre_sampled_node_types = list(set(pre_sampled_node_types))
-
-        sampled_node_types = []
-        node_id_offsets = {}
-        node_count = 0
-        for node_type in self.node_types:
-            if node_type in pre_sampled_node_types:
-                sampled_node_types.append(node_type)
-
-            node_id_offsets[node_type] = node_count
-            node_count = node_count + self._data.num_node[node_type]
-
-        num_node = 0
-        feature = None
-        node_id = None
-        node_id_offset = {}
-        for node_type in sampled_node_types:
-            node_id_offset[node_type] = node_id_offsets[node_type] - num_node
-            num_node = num_node + self._data.num_node[node_type]
-
-            current_feature = torch.from_numpy(self._data[node_type].x)
-            if current_feature is None:
-                warnings.warn(
-                    f'{node_type} nodes have no features!', UserWarning)
-            if feature is None:
-                feature = current_feature
-            else:
-                feature = torch.vstack((feature, current_feature))
+            pre_sampled_node_types.update([edge_type.split('__')[0], edge_type.split('__')[2]])
+        sampled_node_types = [node_type for node_type in self.node_types if node_type in pre_sampled_node_types]
+        position = {node_type: i for i, node_type in enumerate(sampled_node_types)}
+        feature, node_id = self.__stack_nodes(sampled_node_types)
 
-            if node_id is None:
-                node_id = self._data.node_id_dict[node_type][:]
-            else:
-                node_id = node_id + self._data.node_id_dict[node_type]
+        # compose the typed blocks: every edge type fills its (src, dst) cell, and its transpose the (dst, src) one
+        # when undirected; the edges of the same cell are summed before the weights are reset
+        blocks = [[None] * len(sampled_node_types) for _ in sampled_node_types]
 
-        rows, cols = None, None
-        for edge_type in edge_types:
-            row_temp, col_temp = self._data[edge_type].edge_index
+        def add_block(i, j, block):
+            blocks[i][j] = block if blocks[i][j] is None else blocks[i][j] + block
 
-            node_type_of_row = edge_type.split('__')[0]
-            node_type_of_col = edge_type.split('__')[2]
-            row_temp = row_temp - node_id_offset[node_type_of_row]
-            col_temp = col_temp - node_id_offset[node_type_of_col]
+        for edge_type in edge_types:
+            node_type_of_row, node_type_of_col = edge_type.split('__')[0], edge_type.split('__')[2]
+            i, j = position[node_type_of_row], position[node_type_of_col]
+            block = self._data.block(edge_type)
+            add_block(i, j, block)
             if undirected is True and node_type_of_row != node_type_of_col:
-                row_temp, col_temp = to_undirected((row_temp, col_temp))
-
-            if rows is None:
-                rows, cols = row_temp, col_temp
-            else:
-                rows = torch.hstack((rows, row_temp))
-                cols = torch.hstack((cols, col_temp))
+                add_block(j, i, block.transpose())
 
-        edge_weight = torch.ones(len(rows))
-        adj = csr_matrix((edge_weight.numpy(), (rows.numpy(),
-                                                cols.numpy())), shape=(num_node, num_node))
+        for i, node_type in enumerate(sampled_node_types):
+            if blocks[i][i] is None:
+                num_node = self._data.num_node[node_type]
+                blocks[i][i] = csr_matrix((num_node, num_node), dtype=np.float32)
+        adj = sp.bmat(blocks, format="csr")
+        adj.sum_duplicates()
 
         # remove previously existed undirected edges
-        adj.data = torch.ones(len(adj.data)).numpy()
+        adj.data = np.ones(len(adj.data), dtype=np.float32)
 
-        return adj, feature.numpy(), torch.LongTensor(node_id)
+        return adj, feature, node_id
+
+    # features stacked in one copy and the node ids of the given node types, in this order
+    def __stack_nodes(self, node_types):
+        features, node_id = [], []
+        for node_type in node_types:
+            if self._data[node_type].x is None:
+                warnings.warn(
+                    f'{node_type} nodes have no features!', UserWarning)
+            features.append(self._data[node_type].x)
+            node_id = node_id + list(self._data.node_id_dict[node_type])
+        return np.vstack(features), torch.LongTensor(node_id)
+
+    @property
+    def meta_path_engine(self):
+        if self.__meta_path_engine is None:
+            self.__meta_path_engine = MetaPathEngine(self._data)
+        return self.__meta_path_engine
 
     # return sampled adjacency matrix containing the given meta-path, "xxx__to__xxx__to...__xxx"
-    def sample_by_meta_path(self, meta_path, undirected=True):
+    # top_k/threshold prune every row of the (intermediate) products, see MetaPathEngine
+    def sample_by_meta_path(self, meta_path, undirected=True, top_k=None, threshold=None):
         if isinstance(meta_path, str):
             if len(meta_path.split("__")) == 3:
                 return self.sample_by_edge_type(meta_path, undirected)
 
-        node_types = meta_path.split("__")
-
-        node_type_st, node_type_ed = node_types[0], node_types[-1]
-        sampled_node_types = []
-        num_node = 0
-        for node_type in self.node_types:
-            if node_type in [node_type_st, node_type_ed]:
-                sampled_node_types.append(node_type)
-                num_node = num_node + self._data.num_node[node_type]
-
-        feature = None
-        node_id = None
-        for node_type in sampled_node_types:
-            current_feature = torch.from_numpy(self._data[node_type].x)
-            if current_feature is None:
-                warnings.warn(
-                    f'{node_type} nodes have no features!', UserWarning)
-            if feature is None:
-                feature = current_feature
-            else:
-                feature = torch.vstack((feature, current_feature))
-
-            if node_id is None:
-                node_id = self._data.node_id_dict[node_type][:]
-            else:
-                node_id = node_id + self._data.node_id_dict[node_type]
-
-        # two at a time
-        adj = None
-        for i in range(int((len(node_types) - 1) / 2)):
-            edge_type = "__".join(
-                [node_types[i * 2], "to", node_types[(i + 1) * 2]])
-            row, col = self._data[edge_type].edge_index
-            edge_weight = torch.ones(len(row))
-            adj_temp = csr_matrix(
-                (edge_weight.numpy(), (row.numpy(), col.numpy())))
-
-            # extremely slow
-            if adj is None:
-                adj = adj_temp
-            else:
-                adj = adj * adj_temp
-
-        adj = adj.tocoo()
-        row, col, data = torch.LongTensor(adj.row), torch.LongTensor(
-            adj.col), torch.FloatTensor(adj.data)
-
-        st_index, ed_index = self.node_types.index(
-            node_type_st), self.node_types.index(node_type_ed)
-        if st_index == ed_index:
-            for node_type in self.node_types[:st_index]:
-                row = row - self._data.num_node[node_type]
-                col = col - self._data.num_node[node_type]
+        path_adj = self.meta_path_engine.adjacency(meta_path, top_k, threshold)
+        path_node_types = parse_meta_path(meta_path)
+        node_type_st, node_type_ed = path_node_types[0], path_node_types[-1]
+        sampled_node_types = [node_type for node_type in self.node_types if node_type in (node_type_st, node_type_ed)]
+
+        feature, node_id = self.__stack_nodes(sampled_node_types)
+
+        if node_type_st == node_type_ed:
+            adj = path_adj + path_adj.transpose() if undirected is True else path_adj
         else:
-            if st_index < ed_index:
-                for node_type in self.node_types[:st_index]:
-                    row = row - self._data.num_node[node_type]
-                    col = col - self._data.num_node[node_type]
-                for node_type in self.node_types[st_index:ed_index]:
-                    col = col - self._data.num_node[node_type]
-                col = col + self._data.num_node[node_type_st]
-            else:
-                for node_type in self.node_types[:ed_index]:
-                    print(node_type)
-                    col = col - self._data.num_node[node_type]
-                    row = row - self._data.num_node[node_type]
-                for node_type in self.node_types[ed_index:st_index]:
-                    row = row - self._data.num_node[node_type]
-                row = row + self._data.num_node[node_type_ed]
-
-        if undirected is True:
-            data = torch.ones(2 * len(data))
-            row, col = to_undirected((row, col))
-        adj = csr_matrix(
-            (data.numpy(), (row.numpy(), col.numpy())), shape=(num_node, num_node))
+            # the path block goes to the (start, end) position, in the order of the node types
+            blocks = [[None, path_adj], [path_adj.transpose() if undirected is True else None, None]]
+            if sampled_node_types[0] != node_type_st:
+                blocks = [[None, blocks[1][0]], [blocks[0][1], None]]
+            num_node = [self._data.num_node[node_type] for node_type in sampled_node_types]
+            blocks[0][0] = csr_matrix((num_node[0], num_node[0]), dtype=np.float32)
+            blocks[1][1] = csr_matrix((num_node[1], num_node[1]), dtype=np.float32)
+            adj = sp.bmat(blocks, format="csr")
+        adj = adj.tocsr()
+        adj.sum_duplicates()
 
         # remove existed self loops
-        adj.data = torch.ones(len(adj.data)).numpy()
-        return adj, feature.numpy(), torch.LongTensor(node_id)
+        adj.data = np.ones(len(adj.data), dtype=np.float32)
+        return adj, feature, node_id
 
-    # return a dict of sub-graphs that contain all the combinations of given edge types and sampled number
-    def nars_preprocess(self, edge_types, predict_class, random_subgraph_num, subgraph_edge_type_num):
+    # return the sampled combinations of edge types (tuples) used as the sub-graphs of NARS
+    def nars_edge_types(self, edge_types, predict_class, random_subgraph_num, subgraph_edge_type_num):
         if not isinstance(edge_types, (str, list, tuple)):
             raise TypeError(
                 "The given edge types must be a string or a list or a tuple!")
@@ -424,9 +428,16 @@ class HeteroNodeDataset:
                                       replace=False)
         chosen_edge_types = [tuple(edge_type) for edge_type in np.array(
             adopted_edge_type_combinations)[chosen_idx]]
-        subgraph_dict = {}
         for chosen_edge_type in chosen_edge_types:
             print(chosen_edge_type)
+        return chosen_edge_types
+
+    # return a dict of sub-graphs that contain all the combinations of given edge types and sampled number
+    def nars_preprocess(self, edge_types, predict_class, random_subgraph_num, subgraph_edge_type_num):
+        chosen_edge_types = self.nars_edge_types(edge_types, predict_class, random_subgraph_num,
+                                                 subgraph_edge_type_num)
+        subgraph_dict = {}
+        for chosen_edge_type in chosen_edge_types:
             subgraph_dict[chosen_edge_type] = self.sample_by_edge_type(
                 chosen_edge_type)
 
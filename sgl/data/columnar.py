@@ -0,0 +1,237 @@
+import argparse
+import json
+import numpy as np
+import os
+import os.path as osp
+import pickle as pkl
+import sys
+import torch
+from scipy.sparse import csr_matrix
+from torch import Tensor
+
+from sgl.data.base_data import Node, Edge, Graph
+
+# Columnar on-disk format of a homogeneous Graph: a directory holding one .npy file per array
+# plus a small JSON manifest. Arrays are memory-mapped on load, so opening a dataset only maps the files
+# and the pages are faulted in when touched.
+#
+#   indptr, indices, weights    csr adjacency (indptr and indices share one integer dtype)
+#   row, col, edge_weight       original COO edge list, only stored when it differs from the csr order
+#   edge_attrs                  per-edge attributes, aligned with the COO edge list
+#   x, y, node_ids              node features, labels and ids (node_ids only if not range(num_node))
+#   {out,in}_degrees[_self_loops]  weighted degrees (float64), see Graph.degrees
+#   split__<key>__{train,val,test}_idx  node indices of the dataset splits stored by save_split
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+DEGREE_NAMES = {"out_degrees": ("out", False), "in_degrees": ("in", False),
+                "out_degrees_self_loops": ("out", True), "in_degrees_self_loops": ("in", True)}
+
+
+def columnar_path(graph_file):
+    return graph_file + ".columnar"
+
+
+def _to_numpy(value):
+    if isinstance(value, Tensor):
+        return value.detach().cpu().numpy()
+    return np.asarray(value)
+
+
+def _coo_matches_csr(adj, row, col, edge_weight):
+    if len(row) != adj.nnz:
+        return False
+    csr_row = np.repeat(np.arange(adj.shape[0], dtype=np.int64), np.diff(adj.indptr))
+    return np.array_equal(csr_row, row) and np.array_equal(adj.indices, col) and np.array_equal(adj.data, edge_weight)
+
+
+def save_columnar(g, path):
+    """
+    g - homogeneous Graph; path - output directory
+    """
+    if not isinstance(g, Graph):
+        raise TypeError("Only homogeneous graphs can be stored in the columnar format!")
+    os.makedirs(path, exist_ok=True)
+
+    arrays = {}
+    adj = g.adj
+    index_dtype = np.int32 if adj.nnz < np.iinfo(np.int32).max and adj.shape[0] < np.iinfo(np.int32).max \
+        else np.int64
+    arrays["indptr"] = adj.indptr.astype(index_dtype)
+    arrays["indices"] = adj.indices.astype(index_dtype)
+    arrays["weights"] = adj.data.astype(np.float32)
+
+    row, col = (_to_numpy(index).astype(np.int64) for index in g.edge_index)
+    edge_weight = _to_numpy(g.edge_weight).astype(np.float32)
+    if not _coo_matches_csr(adj, row, col, edge_weight):
+        arrays["row"], arrays["col"], arrays["edge_weight"] = row, col, edge_weight
+    if g.edge_attrs is not None:
+        if not isinstance(g.edge_attrs, (np.ndarray, Tensor)):
+            raise TypeError("Only np.ndarray or Tensor edge attributes can be stored in the columnar format!")
+        arrays["edge_attrs"] = _to_numpy(g.edge_attrs)
+
+    if g.x is not None:
+        arrays["x"] = _to_numpy(g.x)
+    if g.y is not None:
+        arrays["y"] = _to_numpy(g.y)
+    if not isinstance(g.node.node_ids, range):
+        arrays["node_ids"] = _to_numpy(g.node.node_ids).astype(np.int64)
+    for name, (direction, self_loops) in DEGREE_NAMES.items():
+        arrays[name] = g.degrees(self_loops, direction)
+
+    for name, array in arrays.items():
+        np.save(osp.join(path, name + ".npy"), np.ascontiguousarray(array))
+    write_manifest(path, g.num_node, g.node_type, g.edge_type, arrays)
+
+
+def open_array(path, name, dtype, shape):
+    """
+    create one array file of a columnar dataset, memory-mapped for writing it in place
+    """
+    return np.lib.format.open_memmap(osp.join(path, name + ".npy"), mode="w+", dtype=dtype, shape=tuple(shape))
+
+
+def write_manifest(path, num_node, node_type, edge_type, arrays):
+    """
+    arrays - the arrays stored in path, by name
+    the manifest is written last and atomically, so a directory without one is an interrupted write
+    """
+    manifest = {
+        "version": FORMAT_VERSION,
+        "num_node": int(num_node),
+        "node_type": node_type,
+        "edge_type": edge_type,
+        "arrays": {name: _array_entry(array) for name, array in arrays.items()}
+    }
+    _write_manifest_file(path, manifest)
+
+
+def _array_entry(array):
+    return {"dtype": str(array.dtype), "shape": list(array.shape)}
+
+
+def _write_manifest_file(path, manifest):
+    tmp_file = osp.join(path, MANIFEST_FILE + ".tmp")
+    with open(tmp_file, "w") as wf:
+        json.dump(manifest, wf, indent=2)
+    os.replace(tmp_file, osp.join(path, MANIFEST_FILE))
+
+
+def read_manifest(path):
+    manifest_file = osp.join(path, MANIFEST_FILE)
+    if not osp.exists(manifest_file):
+        return None
+    with open(manifest_file, "r") as rf:
+        manifest = json.load(rf)
+    if manifest.get("version", 0) > FORMAT_VERSION:
+        raise ValueError("Columnar format version {} is newer than the supported version {}!".format(
+            manifest.get("version"), FORMAT_VERSION))
+    return manifest
+
+
+def load_columnar(path):
+    """
+    return the Graph; every array is memory-mapped copy-on-write,
+    so in-place updates of the returned tensors never reach the files
+    """
+    manifest = read_manifest(path)
+    if manifest is None:
+        raise FileNotFoundError("No columnar dataset found in {}!".format(path))
+
+    def load(name):
+        if name not in manifest["arrays"]:
+            return None
+        return np.load(osp.join(path, name + ".npy"), mmap_mode="c")
+
+    def load_tensor(name):
+        array = load(name)
+        return torch.from_numpy(array) if array is not None else None
+
+    num_node = manifest["num_node"]
+    adj = csr_matrix((load("weights"), load("indices"), load("indptr")), shape=(num_node, num_node), copy=False)
+    edge = Edge.from_csr(adj, manifest["edge_type"], load_tensor("row"), load_tensor("col"),
+                         load_tensor("edge_weight"), load_tensor("edge_attrs"))
+    node = Node(manifest["node_type"], num_node, load_tensor("x"), load_tensor("y"), load("node_ids"))
+
+    g = Graph.from_parts(edge, node)
+    # datasets written before the degrees were stored compute them on first use instead
+    for name, (direction, self_loops) in DEGREE_NAMES.items():
+        if name in manifest["arrays"]:
+            g.set_degrees(load(name), self_loops, direction)
+    return g
+
+
+SPLIT_NAMES = ("train_idx", "val_idx", "test_idx")
+SPLIT_CONTAINERS = {Tensor: "tensor", np.ndarray: "ndarray", list: "list"}
+
+
+def _split_array_name(key, name):
+    return "split__{}__{}".format(key, name)
+
+
+def save_split(path, key, split):
+    """
+    store split = (train_idx, val_idx, test_idx) with the columnar dataset in path under key
+    (e.g. the split name and its parameters); the container of the indices (tensor, ndarray or list) is kept
+    return whether the split was stored (None entries and other containers are not)
+    """
+    manifest = read_manifest(path)
+    if manifest is None:
+        raise FileNotFoundError("No columnar dataset found in {}!".format(path))
+    containers = [SPLIT_CONTAINERS.get(type(idx)) for idx in split]
+    if len(split) != len(SPLIT_NAMES) or any(container is None for container in containers):
+        return False
+
+    for name, idx in zip(SPLIT_NAMES, split):
+        array = np.ascontiguousarray(_to_numpy(idx))
+        np.save(osp.join(path, _split_array_name(key, name) + ".npy"), array)
+        manifest["arrays"][_split_array_name(key, name)] = _array_entry(array)
+    manifest.setdefault("splits", {})[key] = containers
+    _write_manifest_file(path, manifest)
+    return True
+
+
+def load_split(path, key):
+    """
+    the (train_idx, val_idx, test_idx) stored under key in path, in their original containers, or None
+    """
+    manifest = read_manifest(path)
+    if manifest is None or key not in manifest.get("splits", {}):
+        return None
+    split = []
+    for name, container in zip(SPLIT_NAMES, manifest["splits"][key]):
+        array = np.load(osp.join(path, _split_array_name(key, name) + ".npy"))
+        if container == "tensor":
+            split.append(torch.from_numpy(array))
+        elif container == "list":
+            split.append(array.tolist())
+        else:
+            split.append(array)
+    return tuple(split)
+
+
+def migrate_pickle(graph_file, path=None):
+    """
+    convert a pickled Graph (the processed .graph file of a dataset) into the columnar format
+    """
+    path = columnar_path(graph_file) if path is None else path
+    with open(graph_file, "rb") as rf:
+        if sys.version_info > (3, 0):
+            g = pkl.load(rf, encoding="latin1")
+        else:
+            g = pkl.load(rf)
+    save_columnar(g, path)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("Migrate pickled graphs to the columnar format")
+    parser.add_argument("graph_files", type=str, nargs="+", help="processed .graph files")
+    parser.add_argument("--out", type=str, default=None,
+                        help="output directory (single input only); defaults to <graph_file>.columnar")
+    args = parser.parse_args()
+
+    if args.out is not None and len(args.graph_files) > 1:
+        parser.error("--out can only be used with a single input file")
+    for graph_file in args.graph_files:
+        out = migrate_pickle(graph_file, args.out)
+        print("{} -> {}".format(graph_file, out))
@@ -0,0 +1,111 @@
+import json
+import numpy as np
+import os
+import os.path as osp
+import scipy.sparse as sp
+
+from sgl.data.utils import file_exist
+
+
+# CSR adjacency matrix stored on disk as separate memory-mapped arrays,
+# so that it can be streamed by row ranges instead of loaded as a whole.
+# Layout of the directory: indptr.npy (int64), indices.npy (int32), data.npy (float32) and meta.json.
+class DiskCSRMatrix:
+    META_FILE = "meta.json"
+    ARRAY_FILES = {"indptr": "indptr.npy", "indices": "indices.npy", "data": "data.npy"}
+
+    def __init__(self, path):
+        if not file_exist(osp.join(path, self.META_FILE)):
+            raise ValueError(f"No on-disk CSR matrix found at {path}!")
+        self.__path = path
+
+        with open(osp.join(path, self.META_FILE), "r") as rf:
+            meta = json.load(rf)
+        self.__shape = tuple(meta["shape"])
+        self.__nnz = int(meta["nnz"])
+
+        # np.load only maps the files here, pages are faulted in when a row range is touched
+        self.__indptr = np.load(osp.join(path, self.ARRAY_FILES["indptr"]), mmap_mode="r")
+        self.__indices = np.load(osp.join(path, self.ARRAY_FILES["indices"]), mmap_mode="r")
+        self.__data = np.load(osp.join(path, self.ARRAY_FILES["data"]), mmap_mode="r")
+
+        if len(self.__indptr) != self.__shape[0] + 1 or len(self.__indices) != self.__nnz:
+            raise ValueError("The on-disk CSR arrays do not match the recorded shape!")
+
+    @staticmethod
+    def save(adj, path):
+        if not isinstance(adj, (sp.csr_matrix, sp.coo_matrix)):
+            raise TypeError("The adjacency matrix must be a scipy.sparse.coo_matrix/csr_matrix!")
+        adj = adj.tocsr()
+        if not file_exist(path):
+            os.makedirs(path)
+
+        np.save(osp.join(path, DiskCSRMatrix.ARRAY_FILES["indptr"]), adj.indptr.astype(np.int64))
+        np.save(osp.join(path, DiskCSRMatrix.ARRAY_FILES["indices"]), adj.indices.astype(np.int32))
+        np.save(osp.join(path, DiskCSRMatrix.ARRAY_FILES["data"]), adj.data.astype(np.float32))
+        DiskCSRMatrix.write_meta(path, adj.shape, adj.nnz)
+
+        return DiskCSRMatrix(path)
+
+    @staticmethod
+    def write_meta(path, shape, nnz):
+        with open(osp.join(path, DiskCSRMatrix.META_FILE), "w") as wf:
+            json.dump({"shape": [int(shape[0]), int(shape[1])], "nnz": int(nnz)}, wf)
+
+    @property
+    def path(self):
+        return self.__path
+
+    @property
+    def shape(self):
+        return self.__shape
+
+    @property
+    def nnz(self):
+        return self.__nnz
+
+    @property
+    def indptr(self):
+        return self.__indptr
+
+    @property
+    def indices(self):
+        return self.__indices
+
+    @property
+    def data(self):
+        return self.__data
+
+    # consecutive row ranges [start, end) holding at most max_nnz non-zeros each (a single denser row is kept whole)
+    def row_chunks(self, max_nnz):
+        if max_nnz <= 0:
+            raise ValueError("max_nnz must be a positive integer!")
+
+        num_row = self.__shape[0]
+        start = 0
+        while start < num_row:
+            limit = self.__indptr[start] + max_nnz
+            end = int(np.searchsorted(self.__indptr, limit, side="right")) - 1
+            end = min(max(end, start + 1), num_row)
+            yield start, end
+            start = end
+
+    # rows [start, end) read into memory, with the row pointer rebased to zero
+    def row_block(self, start, end):
+        nnz_st, nnz_ed = int(self.__indptr[start]), int(self.__indptr[end])
+        indptr = np.asarray(self.__indptr[start:end + 1]) - nnz_st
+        indices = np.array(self.__indices[nnz_st:nnz_ed], dtype=np.int32)
+        data = np.array(self.__data[nnz_st:nnz_ed], dtype=np.float32)
+        return indptr, indices, data
+
+    def row_sums(self, max_nnz):
+        row_sum = np.zeros(self.__shape[0], dtype=np.float64)
+        for start, end in self.row_chunks(max_nnz):
+            indptr, _, data = self.row_block(start, end)
+            local_rows = np.repeat(np.arange(end - start), np.diff(indptr))
+            row_sum[start:end] = np.bincount(local_rows, weights=data, minlength=end - start)
+        return row_sum
+
+    def to_csr(self):
+        return sp.csr_matrix((np.asarray(self.__data), np.asarray(self.__indices), np.asarray(self.__indptr)),
+                             shape=self.__shape)
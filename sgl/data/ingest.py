@@ -0,0 +1,318 @@
+import argparse
+import multiprocessing as mp
+from collections import deque
+import numpy as np
+import os
+import os.path as osp
+import scipy.sparse as sp
+
+from sgl.data.columnar import DEGREE_NAMES, open_array, write_manifest
+
+# Ingestion of large edge-list files straight into the columnar format (see sgl.data.columnar),
+# without holding the whole edge list in memory:
+#   1. the file is cut into byte ranges ("chunks") aligned to lines / records;
+#   2. first pass: a pool of workers parses the chunks and counts the out-degree of every node;
+#   3. indptr is the prefix sum of the counts, and indices / weights are created as memory-mapped files;
+#   4. second pass: the workers parse the chunks again and the edges of every chunk are scattered into
+#      their rows behind a per-row cursor (counting sort), so the edges of a row keep the file order.
+#
+# Text files hold one edge per line: "src<delimiter>dst[<delimiter>weight]".
+# Binary files hold fixed-size records of two integer node ids, optionally followed by a float weight.
+TEXT_DELIMITERS = {".csv": ",", ".tsv": "\t", ".txt": None}
+DEFAULT_CHUNK_BYTES = 64 << 20
+
+
+class EdgeFileFormat:
+    """
+    delimiter - column delimiter of a text file (None for any whitespace); skip_rows - header lines of a text file
+    binary - fixed-size records; id_dtype / weight_dtype - dtypes of a binary record
+    weighted - whether the third column (or record field) holds the edge weight
+    """
+    def __init__(self, delimiter=None, skip_rows=0, weighted=False, binary=False, id_dtype=np.int64,
+                 weight_dtype=np.float32):
+        self.delimiter = delimiter
+        self.skip_rows = skip_rows
+        self.weighted = weighted
+        self.binary = binary
+        fields = [("src", id_dtype), ("dst", id_dtype)]
+        if weighted:
+            fields.append(("weight", weight_dtype))
+        self.record_dtype = np.dtype(fields)
+
+    @classmethod
+    def from_path(cls, path, weighted=False, skip_rows=0):
+        ext = osp.splitext(path)[1].lower()
+        if ext == ".bin":
+            return cls(weighted=weighted, binary=True)
+        elif ext in TEXT_DELIMITERS:
+            return cls(delimiter=TEXT_DELIMITERS[ext], skip_rows=skip_rows, weighted=weighted)
+        raise ValueError("Edge files must be .csv, .tsv, .txt or .bin!")
+
+
+def _split_chunks(path, file_format, chunk_bytes):
+    size = osp.getsize(path)
+    if file_format.binary:
+        record_size = file_format.record_dtype.itemsize
+        if size % record_size != 0:
+            raise ValueError("The size of {} is not a multiple of the record size!".format(path))
+        step = max(chunk_bytes // record_size, 1) * record_size
+    else:
+        step = max(chunk_bytes, 1)
+    return [(start, min(start + step, size)) for start in range(0, size, step)]
+
+
+def _parse_chunk(path, file_format, byte_range):
+    """
+    return (src, dst, weight) of the edges in byte_range; weight is None for unweighted files
+    a text chunk owns the lines starting inside its byte range
+    """
+    start, end = byte_range
+    if file_format.binary:
+        records = np.fromfile(path, dtype=file_format.record_dtype,
+                              count=(end - start) // file_format.record_dtype.itemsize, offset=start)
+        src, dst = records["src"].astype(np.int64), records["dst"].astype(np.int64)
+        weight = records["weight"].astype(np.float32) if file_format.weighted else None
+        return src, dst, weight
+
+    with open(path, "rb") as rf:
+        if start > 0:
+            rf.seek(start - 1)
+            # the line crossing start belongs to the previous chunk
+            if rf.read(1) != b"\n":
+                rf.readline()
+        else:
+            for _ in range(file_format.skip_rows):
+                rf.readline()
+        data_start = rf.tell()
+        buf = rf.read(max(end - data_start, 0))
+        if data_start < end and len(buf) > 0 and not buf.endswith(b"\n"):
+            buf += rf.readline()
+
+    num_col = 3 if file_format.weighted else 2
+    if file_format.delimiter is not None:
+        buf = buf.replace(file_format.delimiter.encode(), b" ")
+    values = np.array(buf.split()).astype(np.float64 if file_format.weighted else np.int64)
+    if len(values) % num_col != 0:
+        raise ValueError("Malformed edge list in {} near byte {}!".format(path, start))
+    values = values.reshape(-1, num_col)
+    src, dst = values[:, 0].astype(np.int64), values[:, 1].astype(np.int64)
+    weight = values[:, 2].astype(np.float32) if file_format.weighted else None
+    return src, dst, weight
+
+
+def _parse_edges(path, file_format, byte_range, undirected):
+    src, dst, weight = _parse_chunk(path, file_format, byte_range)
+    if undirected:
+        # self-loops are only added once
+        not_loop = src != dst
+        src, dst = np.concatenate((src, dst[not_loop])), np.concatenate((dst, src[not_loop]))
+        if weight is not None:
+            weight = np.concatenate((weight, weight[not_loop]))
+    return src, dst, weight
+
+
+def _count_worker(args):
+    path, file_format, byte_ranges, undirected = args
+    counts = np.zeros(0, dtype=np.int64)
+    for byte_range in byte_ranges:
+        src, dst, _ = _parse_edges(path, file_format, byte_range, undirected)
+        if len(src) == 0:
+            continue
+        if min(src.min(), dst.min()) < 0:
+            raise ValueError("Node ids must be non-negative!")
+        chunk_counts = np.bincount(src, minlength=int(dst.max()) + 1)
+        if len(chunk_counts) > len(counts):
+            counts = np.concatenate((counts, np.zeros(len(chunk_counts) - len(counts), dtype=np.int64)))
+        counts[:len(chunk_counts)] += chunk_counts
+    return counts
+
+
+def _parse_worker(args):
+    path, file_format, byte_range, undirected = args
+    return _parse_edges(path, file_format, byte_range, undirected)
+
+
+def _ordered_imap(pool, fn, items, max_in_flight):
+    """
+    yield fn(item) for every item, in order; at most max_in_flight items are submitted ahead of the consumer,
+    so results parsed faster than they are consumed do not pile up in memory
+    """
+    pending = deque()
+    for item in items:
+        pending.append(pool.apply_async(fn, (item, )))
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().get()
+    while len(pending) > 0:
+        yield pending.popleft().get()
+
+
+def _sort_row_blocks(indptr, indices, weights, block_nnz, merge_duplicates=False):
+    """
+    sort the column indices inside every row, one block of rows at a time
+    merge_duplicates - also merge the duplicated entries of every row, keeping the max weight as to_undirected does;
+    the rows are compacted towards the front in place and indptr is updated
+    return the number of entries left
+    """
+    num_row = len(indptr) - 1
+    start, read, write = 0, int(indptr[0]), int(indptr[0])
+    while start < num_row:
+        # indptr[:start + 1] already holds compacted offsets, which are not beyond read
+        end = int(np.searchsorted(indptr, read + block_nnz, side="right")) - 1
+        end = min(max(end, start + 1), num_row)
+        st, ed = read, int(indptr[end])
+        counts = np.diff(np.concatenate(([st], np.asarray(indptr[start + 1:end + 1], dtype=np.int64))))
+        rows = np.repeat(np.arange(end - start), counts)
+        order = np.lexsort((indices[st:ed], rows))
+        rows, cols, vals = rows[order], indices[st:ed][order], weights[st:ed][order]
+        if merge_duplicates and len(rows) > 0:
+            starts = np.flatnonzero(np.concatenate(([True], (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1]))))
+            rows, cols, vals = rows[starts], cols[starts], np.maximum.reduceat(vals, starts)
+
+        indices[write:write + len(cols)] = cols
+        weights[write:write + len(cols)] = vals
+        indptr[start + 1:end + 1] = write + np.cumsum(np.bincount(rows, minlength=end - start))
+        write += len(cols)
+        read, start = ed, end
+    return write
+
+
+def _truncate_array(path, name, array, length, block_nnz):
+    """
+    replace the array file name of path by its first length entries, copied one block at a time
+    """
+    truncated = open_array(path, name + ".tmp", array.dtype, (length, ))
+    for start in range(0, length, block_nnz):
+        truncated[start:start + block_nnz] = array[start:start + block_nnz]
+    truncated.flush()
+    del truncated
+    os.replace(osp.join(path, name + ".tmp.npy"), osp.join(path, name + ".npy"))
+    return np.load(osp.join(path, name + ".npy"), mmap_mode="r+")
+
+
+def _degrees_blockwise(indptr, indices, weights, num_node, block_nnz):
+    """
+    the degree vectors of the columnar format, computed one block of rows at a time
+    (the degrees with self-loops are those without plus one, as in Graph.degrees)
+    """
+    degrees = {name: np.zeros(num_node, dtype=np.float64) for name in DEGREE_NAMES}
+    start = 0
+    while start < num_node:
+        end = int(np.searchsorted(indptr, indptr[start] + block_nnz, side="right")) - 1
+        end = min(max(end, start + 1), num_node)
+        st, ed = int(indptr[start]), int(indptr[end])
+        block = sp.csr_matrix((np.asarray(weights[st:ed]), np.asarray(indices[st:ed]),
+                               np.asarray(indptr[start:end + 1]) - st), shape=(end - start, num_node))
+        degrees["out_degrees"][start:end] = np.asarray(block.sum(axis=1)).reshape(-1)
+        degrees["in_degrees"] += np.bincount(np.asarray(indices[st:ed]), weights=np.asarray(weights[st:ed]),
+                                             minlength=num_node)
+        start = end
+    degrees["out_degrees_self_loops"] = degrees["out_degrees"] + 1
+    degrees["in_degrees_self_loops"] = degrees["in_degrees"] + 1
+    return degrees
+
+
+def ingest_edge_list(edge_file, path, num_node=None, node_type="node", edge_type="node__to__node",
+                     file_format=None, undirected=False, sort_indices=True, x=None, y=None, num_workers=None,
+                     chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """
+    edge_file - edge-list file; path - output directory of the columnar dataset
+    num_node - number of nodes, max node id + 1 if not given; file_format - EdgeFileFormat, guessed from the extension
+    undirected - add the reverse of every edge and merge the duplicated edges, keeping the max weight as to_undirected
+    does (the column indices are then sorted); sort_indices - sort the column indices inside every row
+    x, y - optional node features / labels, as arrays or .npy files (copied through memory maps)
+    """
+    file_format = EdgeFileFormat.from_path(edge_file) if file_format is None else file_format
+    num_workers = num_workers or os.cpu_count()
+    chunks = _split_chunks(edge_file, file_format, chunk_bytes)
+    os.makedirs(path, exist_ok=True)
+
+    ctx = mp.get_context("spawn")
+    with ctx.Pool(num_workers) as pool:
+        # first pass: out-degrees, each worker accumulating over every num_workers-th chunk
+        groups = [chunks[i::num_workers] for i in range(num_workers)]
+        counts = np.zeros(0, dtype=np.int64)
+        for worker_counts in pool.imap_unordered(
+                _count_worker, [(edge_file, file_format, group, undirected) for group in groups if len(group) > 0]):
+            if len(worker_counts) > len(counts):
+                counts = np.concatenate((counts, np.zeros(len(worker_counts) - len(counts), dtype=np.int64)))
+            counts[:len(worker_counts)] += worker_counts
+
+        if num_node is None:
+            num_node = len(counts)
+        elif len(counts) > num_node:
+            raise ValueError("The edge list holds node ids beyond num_node!")
+        counts = np.concatenate((counts, np.zeros(num_node - len(counts), dtype=np.int64)))
+
+        nnz = int(counts.sum())
+        index_dtype = np.int32 if nnz < np.iinfo(np.int32).max and num_node < np.iinfo(np.int32).max else np.int64
+        arrays = {"indptr": open_array(path, "indptr", index_dtype, (num_node + 1, )),
+                  "indices": open_array(path, "indices", index_dtype, (nnz, )),
+                  "weights": open_array(path, "weights", np.float32, (nnz, ))}
+        indptr, indices, weights = arrays["indptr"], arrays["indices"], arrays["weights"]
+        indptr[0] = 0
+        np.cumsum(counts, out=indptr[1:])
+        cursor = np.asarray(indptr[:-1], dtype=np.int64).copy()
+        del counts
+
+        # second pass: chunks are consumed in file order, so the rows keep the order of the file;
+        # at most 2 * num_workers parsed chunks are held at a time while the parent scatters them
+        for src, dst, weight in _ordered_imap(pool, _parse_worker,
+                                              [(edge_file, file_format, chunk, undirected) for chunk in chunks],
+                                              2 * num_workers):
+            if len(src) == 0:
+                continue
+            order = np.argsort(src, kind="stable")
+            src_sorted = src[order]
+            run_starts = np.flatnonzero(np.concatenate(([True], src_sorted[1:] != src_sorted[:-1])))
+            run_lengths = np.diff(np.append(run_starts, len(src_sorted)))
+            rank = np.arange(len(src_sorted)) - np.repeat(run_starts, run_lengths)
+
+            run_rows = src_sorted[run_starts]
+            positions = np.repeat(cursor[run_rows], run_lengths) + rank
+            indices[positions] = dst[order]
+            weights[positions] = weight[order] if weight is not None else 1.
+            cursor[run_rows] += run_lengths
+
+    if sort_indices or undirected:
+        block_nnz = max(chunk_bytes // 8, 1)
+        num_entries = _sort_row_blocks(indptr, indices, weights, block_nnz, merge_duplicates=undirected)
+        if num_entries < nnz:
+            indices = arrays["indices"] = _truncate_array(path, "indices", indices, num_entries, block_nnz)
+            weights = arrays["weights"] = _truncate_array(path, "weights", weights, num_entries, block_nnz)
+    for name, degrees in _degrees_blockwise(indptr, indices, weights, num_node, max(chunk_bytes // 8, 1)).items():
+        arrays[name] = open_array(path, name, np.float64, (num_node, ))
+        arrays[name][:] = degrees
+
+    for name, value in (("x", x), ("y", y)):
+        if value is None:
+            continue
+        source = np.load(value, mmap_mode="r") if isinstance(value, str) else np.asarray(value)
+        if source.shape[0] != num_node:
+            raise ValueError("{} must hold one row per node!".format(name))
+        arrays[name] = open_array(path, name, source.dtype, source.shape)
+        step = max(chunk_bytes // max(source[:1].nbytes, 1), 1)
+        for start in range(0, num_node, step):
+            arrays[name][start:start + step] = source[start:start + step]
+
+    for array in arrays.values():
+        array.flush()
+    write_manifest(path, num_node, node_type, edge_type, arrays)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("Ingest an edge-list file into the columnar format")
+    parser.add_argument("edge_file", type=str, help=".csv, .tsv, .txt (whitespace) or .bin edge file")
+    parser.add_argument("out", type=str, help="output directory")
+    parser.add_argument("--num-node", type=int, default=None, help="number of nodes")
+    parser.add_argument("--weighted", action="store_true", help="the third column holds the edge weight")
+    parser.add_argument("--skip-rows", type=int, default=0, help="header lines of a text file")
+    parser.add_argument("--undirected", action="store_true", help="add the reverse of every edge")
+    parser.add_argument("--x", type=str, default=None, help=".npy file of node features")
+    parser.add_argument("--y", type=str, default=None, help=".npy file of node labels")
+    parser.add_argument("--num-workers", type=int, default=None, help="number of parsing processes")
+    args = parser.parse_args()
+
+    edge_format = EdgeFileFormat.from_path(args.edge_file, args.weighted, args.skip_rows)
+    ingest_edge_list(args.edge_file, args.out, args.num_node, file_format=edge_format, undirected=args.undirected,
+                     x=args.x, y=args.y, num_workers=args.num_workers)
@@ -0,0 +1,138 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+# Meta-path adjacency over typed blocks. Every edge type "src__to__dst" is a compact (num_src x num_dst) csr block
+# in type-local ids (HeteroGraph.block), and the adjacency of a meta-path "t0__to__t1__to__...__tn" is the chained
+# product of its blocks, whose entries count the instances of the path between two nodes (weighted by the edges).
+# The chain is multiplied in the association order of least estimated cost, and the intermediate products can be
+# pruned (top-k entries per row and/or a minimum path count) to bound the fill-in on large graphs.
+
+EDGE_TYPE_DELIMITER = "__to__"
+
+
+def parse_meta_path(meta_path):
+    """
+    "a__to__b__to__c" -> ["a", "b", "c"]
+    """
+    node_types = meta_path.split(EDGE_TYPE_DELIMITER)
+    if len(node_types) < 2 or any(len(node_type) == 0 for node_type in node_types):
+        raise ValueError("Meta-path must be of the form 'xxx__to__xxx__to__...__xxx'!")
+    return node_types
+
+
+def estimate_product(shape_a, nnz_a, shape_b, nnz_b):
+    """
+    estimated (flops, nnz) of a sparse product, assuming uniformly spread entries
+    """
+    inner = max(shape_a[1], 1)
+    flops = nnz_a * nnz_b / inner
+    num_cell = float(shape_a[0]) * shape_b[1]
+    density_a = nnz_a / max(float(shape_a[0]) * inner, 1.)
+    density_b = nnz_b / max(float(inner) * shape_b[1], 1.)
+    # probability that at least one of the inner paths exists
+    nnz = num_cell * -np.expm1(inner * np.log1p(-min(density_a * density_b, 1. - 1e-12)))
+    return flops, min(nnz, flops)
+
+
+def chain_order(shapes, nnzs):
+    """
+    matrix-chain dynamic programming over the estimated flops of the sparse products;
+    returns the split table, split[i][j] being where the product of blocks i..j is cut
+    """
+    num_block = len(shapes)
+    cost = [[0.] * num_block for _ in range(num_block)]
+    nnz = [[0.] * num_block for _ in range(num_block)]
+    split = [[None] * num_block for _ in range(num_block)]
+    for i in range(num_block):
+        nnz[i][i] = float(nnzs[i])
+
+    for length in range(2, num_block + 1):
+        for i in range(num_block - length + 1):
+            j = i + length - 1
+            cost[i][j] = np.inf
+            for k in range(i, j):
+                shape_a, shape_b = (shapes[i][0], shapes[k][1]), (shapes[k + 1][0], shapes[j][1])
+                flops, out_nnz = estimate_product(shape_a, nnz[i][k], shape_b, nnz[k + 1][j])
+                current = cost[i][k] + cost[k + 1][j] + flops
+                if current < cost[i][j]:
+                    cost[i][j], nnz[i][j], split[i][j] = current, out_nnz, k
+    return split
+
+
+def prune_rows(adj, top_k=None, threshold=None):
+    """
+    keep the entries of every row that are >= threshold and among its top_k largest (ties broken by column)
+    """
+    adj = adj.tocsr()
+    if threshold is not None:
+        adj.data[adj.data < threshold] = 0
+        adj.eliminate_zeros()
+    if top_k is None:
+        return adj
+
+    row_nnz = np.diff(adj.indptr)
+    if row_nnz.max(initial=0) <= top_k:
+        return adj
+    rows = np.repeat(np.arange(adj.shape[0]), row_nnz)
+    # order every row by decreasing value, the sort being stable on the (sorted) column indices
+    adj.sort_indices()
+    order = np.lexsort((-adj.data, rows))
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order)) - np.repeat(adj.indptr[:-1], row_nnz)
+    keep = rank < top_k
+    return csr_matrix((adj.data[keep], adj.indices[keep], np.concatenate(([0], np.cumsum(np.minimum(row_nnz, top_k))))),
+                      shape=adj.shape)
+
+
+class MetaPathEngine:
+    """
+    g - HeteroGraph; top_k/threshold - default pruning of the intermediate and final products
+    """
+    def __init__(self, g, top_k=None, threshold=None):
+        self.__g = g
+        self.__top_k = top_k
+        self.__threshold = threshold
+        self.__blocks = {}
+        self.__cache = {}
+
+    def block(self, src_type, dst_type):
+        """
+        (num_src x num_dst) csr block of the edges src -> dst, built from the reversed edge type if only it exists
+        """
+        key = (src_type, dst_type)
+        if key not in self.__blocks:
+            edge_type = EDGE_TYPE_DELIMITER.join([src_type, dst_type])
+            reverse_type = EDGE_TYPE_DELIMITER.join([dst_type, src_type])
+            if edge_type in self.__g.edge_types:
+                self.__blocks[key] = self.__g.block(edge_type)
+            elif reverse_type in self.__g.edge_types:
+                self.__blocks[key] = self.__g.block(reverse_type).transpose().tocsr()
+            else:
+                raise ValueError("Edge type {} does not exist!".format(edge_type))
+        return self.__blocks[key]
+
+    def adjacency(self, meta_path, top_k=None, threshold=None):
+        """
+        (num_first_type x num_last_type) csr matrix of the meta-path instance counts, cached per meta-path
+        """
+        top_k = self.__top_k if top_k is None else top_k
+        threshold = self.__threshold if threshold is None else threshold
+        node_types = parse_meta_path(meta_path)
+        key = (tuple(node_types), top_k, threshold)
+        if key not in self.__cache:
+            blocks = [self.block(node_types[i], node_types[i + 1]) for i in range(len(node_types) - 1)]
+            split = chain_order([block.shape for block in blocks], [block.nnz for block in blocks])
+
+            def multiply(i, j):
+                if i == j:
+                    return blocks[i]
+                k = split[i][j]
+                return prune_rows(multiply(i, k).dot(multiply(k + 1, j)), top_k, threshold)
+
+            adj = multiply(0, len(blocks) - 1)
+            # a single block is pruned on a copy, the blocks being shared by every meta-path
+            self.__cache[key] = prune_rows(adj.copy(), top_k, threshold) if len(blocks) == 1 else adj
+        return self.__cache[key]
+
+    def clear_cache(self):
+        self.__cache = {}
@@ -0,0 +1,170 @@
+import numpy as np
+import scipy.sparse as sp
+import torch
+from scipy.sparse.csgraph import breadth_first_order, connected_components, reverse_cuthill_mckee
+from typing import Tuple
+
+from sgl.data.base_data import Graph
+
+# All the orderings below return perm, with perm[new_id] = old_id.
+
+
+def degree_order(adj: sp.csr_matrix, descending: bool = True) -> np.ndarray:
+    """
+    sort nodes by degree, so that the hub rows touched by most of the columns are packed together
+    """
+    degrees = np.diff(adj.tocsr().indptr)
+    perm = np.argsort(-degrees if descending else degrees, kind="stable")
+    return perm
+
+
+def rcm_order(adj: sp.csr_matrix) -> np.ndarray:
+    """
+    reverse Cuthill-McKee ordering, which reduces the bandwidth of the adjacency matrix
+    """
+    return reverse_cuthill_mckee(adj.tocsr(), symmetric_mode=True).astype(np.int64)
+
+
+def _bfs_order(adj: sp.csr_matrix) -> np.ndarray:
+    """
+    BFS order started from a pseudo-peripheral node, covering every connected component
+    (components are taken in the order of their lowest degree node, and searched on their own diagonal block)
+    """
+    num_node = adj.shape[0]
+    if num_node == 0:
+        return np.zeros(0, dtype=np.int64)
+    sym = abs(adj)
+    sym = (sym + sym.transpose()).tocsr()
+    num_comp, labels = connected_components(sym, directed=False)
+
+    rank = np.empty(num_node, dtype=np.int64)
+    rank[np.argsort(np.diff(adj.indptr), kind="stable")] = np.arange(num_node)
+    # nodes grouped by component, the lowest degree node of every component first
+    nodes = np.lexsort((rank, labels))
+    bounds = np.searchsorted(labels[nodes], np.arange(num_comp + 1))
+    block = sym[nodes][:, nodes]
+
+    orders = []
+    for comp in np.argsort(rank[nodes[bounds[:-1]]], kind="stable"):
+        st, ed = int(bounds[comp]), int(bounds[comp + 1])
+        if ed - st == 1:
+            orders.append(nodes[st:ed])
+            continue
+        # the last node reached from a low degree seed approximates a peripheral node of the component
+        sub = block[st:ed, st:ed]
+        order = breadth_first_order(sub, 0, directed=True, return_predecessors=False)
+        order = breadth_first_order(sub, order[-1], directed=True, return_predecessors=False)
+        orders.append(nodes[st + order])
+    return np.concatenate(orders).astype(np.int64)
+
+
+def _refine_bisection(adj: sp.csr_matrix, side: np.ndarray, num_pass: int) -> np.ndarray:
+    """
+    Kernighan-Lin style refinement: swap equally many boundary nodes with positive gain between both sides
+    """
+    cut = _cut_size(adj, side)
+    for _ in range(num_pass):
+        sign = np.where(side, 1., -1.)
+        # gain of moving a node = external edges - internal edges
+        gain = -sign * adj.dot(sign)
+        left = np.nonzero(~side & (gain > 0))[0]
+        right = np.nonzero(side & (gain > 0))[0]
+        num_swap = min(len(left), len(right))
+        if num_swap == 0:
+            break
+        left = left[np.argsort(-gain[left], kind="stable")[:num_swap]]
+        right = right[np.argsort(-gain[right], kind="stable")[:num_swap]]
+
+        new_side = side.copy()
+        new_side[left], new_side[right] = True, False
+        # swapping adjacent nodes may cancel their gains, so only keep the swap if the cut shrinks
+        new_cut = _cut_size(adj, new_side)
+        if new_cut >= cut:
+            break
+        side, cut = new_side, new_cut
+    return side
+
+
+def _cut_size(adj: sp.csr_matrix, side: np.ndarray) -> float:
+    coo = adj.tocoo()
+    return float(coo.data[side[coo.row] != side[coo.col]].sum())
+
+
+def recursive_bisection(adj: sp.csr_matrix, num_parts: int, refine_passes: int = 4) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Partition the graph into num_parts balanced parts by recursive graph-growing bisection:
+    each part is split at the median of a BFS order from a pseudo-peripheral node, then refined.
+    return (perm, part) where the nodes of every part are consecutive in perm and part[old_id] is the part id
+    """
+    if num_parts <= 0:
+        raise ValueError("The number of parts must be a positive integer!")
+    adj = adj.tocsr()
+    adj = ((adj + adj.T) != 0).astype(np.float32).tocsr()
+
+    part = np.zeros(adj.shape[0], dtype=np.int64)
+    # each entry: (node ids, first part id, number of parts)
+    stack = [(np.arange(adj.shape[0]), 0, num_parts)]
+    orders = []
+    while len(stack) > 0:
+        nodes, first_part, parts = stack.pop()
+        sub_adj = adj[nodes][:, nodes]
+        local_order = _bfs_order(sub_adj)
+        if parts == 1 or len(nodes) <= 1:
+            part[nodes] = first_part
+            orders.append((first_part, nodes[local_order]))
+            continue
+
+        parts_left = parts // 2
+        split = len(nodes) * parts_left // parts
+        side = np.ones(len(nodes), dtype=bool)
+        side[local_order[:split]] = False
+        side = _refine_bisection(sub_adj, side, refine_passes)
+
+        stack.append((nodes[side], first_part + parts_left, parts - parts_left))
+        stack.append((nodes[~side], first_part, parts_left))
+
+    orders.sort(key=lambda item: item[0])
+    perm = np.concatenate([order for _, order in orders]).astype(np.int64)
+    return perm, part
+
+
+def reorder_graph(g: Graph, perm: np.ndarray) -> Tuple[Graph, np.ndarray]:
+    """
+    Relabel the nodes of g so that the new node i is the old node perm[i].
+    Node features and labels are permuted accordingly; edges keep their order so edge attributes stay aligned.
+    return the new graph and inv_perm, with inv_perm[old_id] = new_id
+    """
+    num_node = g.num_node
+    perm = np.asarray(perm, dtype=np.int64)
+    if perm.shape != (num_node,) or not np.array_equal(np.sort(perm), np.arange(num_node)):
+        raise ValueError("perm must be a permutation of the node ids!")
+
+    inv_perm = np.empty(num_node, dtype=np.int64)
+    inv_perm[perm] = np.arange(num_node)
+    perm_tensor, inv_perm_tensor = torch.from_numpy(perm), torch.from_numpy(inv_perm)
+
+    row, col = g.edge_index
+    row, col = inv_perm_tensor[row], inv_perm_tensor[col]
+    x = g.x[perm_tensor] if g.x is not None else None
+    y = g.y[perm_tensor] if g.y is not None else None
+
+    # node_ids keep the original id of every relabeled node
+    node_ids = np.asarray(g.node.node_ids)[perm]
+
+    new_g = Graph(row, col, g.edge_weight, num_node, g.node_type, g.edge_type, x=x, y=y, node_ids=node_ids,
+                  edge_attr=g.edge_attrs)
+    return new_g, inv_perm
+
+
+def reorder(adj: sp.csr_matrix, method: str = "rcm", num_parts: int = 16) -> np.ndarray:
+    """
+    method: 'degree', 'rcm', or 'partition' (recursive bisection into num_parts parts)
+    """
+    if method == "degree":
+        return degree_order(adj)
+    elif method == "rcm":
+        return rcm_order(adj)
+    elif method == "partition":
+        return recursive_bisection(adj, num_parts)[0]
+    else:
+        raise ValueError("Reordering method must be 'degree', 'rcm' or 'partition'!")
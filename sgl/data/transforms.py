@@ -1,7 +1,6 @@
-import copy
 import torch
 import numpy as np
-from typing import Tuple, Dict, Optional
+from typing import Tuple, Dict, List, Optional
 from torch import BoolTensor, Tensor
 from sgl.data.base_data import Node, Edge, Graph
 
@@ -52,8 +51,26 @@ def random_drop_nodes(g: Graph, p: float = 0.5, keep_ids: bool = False) -> Tuple
 
     return new_g, node_mask
 
+def _relabel_lookup(node_id_map, num_node: int) -> Tensor:
+    """
+    turn a {old id: new id} dict into a lookup tensor (-1 for the ids not in the dict);
+    lookup arrays / tensors are returned as tensors
+    """
+    if isinstance(node_id_map, Dict):
+        lookup = torch.full((num_node, ), -1, dtype=torch.long)
+        if len(node_id_map) > 0:
+            old_ids = torch.as_tensor(np.fromiter(node_id_map.keys(), dtype=np.int64, count=len(node_id_map)))
+            new_ids = torch.as_tensor(np.fromiter(node_id_map.values(), dtype=np.int64, count=len(node_id_map)))
+            lookup[old_ids] = new_ids
+        return lookup
+    return torch.as_tensor(node_id_map, dtype=torch.long)
+
 def drop_edges(old_eg: Edge, num_node: int, edge_mask: BoolTensor, \
                 force_undirected: bool = False, node_id_dict=None) -> Edge:
+    """
+    node_id_dict - optional relabeling of the kept edges, either a {old id: new id} dict
+    or a lookup array / tensor with node_id_dict[old id] = new id
+    """
     edge_index = old_eg.edge_index
     edge_weight = old_eg.edge_weight
 
@@ -62,6 +79,7 @@ def drop_edges(old_eg: Edge, num_node: int, edge_mask: BoolTensor, \
     edge_index = torch.vstack([row, col])
 
     if force_undirected:
+        edge_mask = edge_mask.clone()
         edge_mask[row > col] = False
 
     edge_index = edge_index[:, edge_mask]
@@ -74,11 +92,11 @@ def drop_edges(old_eg: Edge, num_node: int, edge_mask: BoolTensor, \
     row, col = edge_index
 
     if node_id_dict is not None:
-        assert isinstance(node_id_dict, Dict), 'node_id_dict must be of Class Dict'
-
-        for i in range(edge_index.shape[1]):
-            row[i] = node_id_dict[row[i].item()]
-            col[i] = node_id_dict[col[i].item()]
+        if not isinstance(node_id_dict, (Dict, np.ndarray, Tensor)):
+            raise TypeError('node_id_dict must be a dict, np.ndarray or Tensor!')
+        old_num_node = max(old_eg.num_node, int(edge_index.max()) + 1 if edge_index.numel() > 0 else 0)
+        lookup = _relabel_lookup(node_id_dict, old_num_node)
+        row, col = lookup[row], lookup[col]
 
     return Edge(row, col, edge_weight, old_eg.edge_type, num_node, old_eg.edge_attrs)
 
@@ -165,25 +183,27 @@ def mask_features(node: Node, feature_mask: BoolTensor, type: int = 0) -> Tensor
 
     return x
     
+def _to_node_mask(node_mask, num_node: int) -> BoolTensor:
+    if isinstance(node_mask, (list, np.ndarray)):
+        node_mask = torch.as_tensor(np.asarray(node_mask, dtype=bool))
+    elif not isinstance(node_mask, Tensor):
+        raise TypeError('node mask must be a list, np.ndarray or Tensor!')
+    if (node_mask.dim() != 1) or (node_mask.size(0) != num_node):
+        raise ValueError('the shape of node mask is wrong!')
+    return node_mask.to(torch.bool)
+
 def get_subgraph(g: Graph, node_mask: BoolTensor, keep_ids: bool = False) -> Graph:
     """
     Preserve nodes in the remain_node_list and edges connecting them.
-    If k in remain_node_list, then the k-th node will be preserved.
+    If node_mask[k] == True, then the k-th node will be preserved.
     """
     num_node = g.num_node
     node_type = g.node_type
     edge_type = g.edge_type
     edge_index = g.edge_index
 
-    if isinstance(node_mask, list):
-        node_mask = np.array(node_mask)
-    if isinstance(node_mask, BoolTensor):
-        node_mask = node_mask.numpy()
-
-    if (node_mask.dim() > 1) or (node_mask.size(0) != num_node):
-        raise ValueError('the shape of node mask is wrong!')
-    
-    num_remain_node = node_mask.nonzero(as_tuple=True)[0].size(0)
+    node_mask = _to_node_mask(node_mask, num_node)
+    num_remain_node = int(node_mask.sum())
 
     if num_remain_node == 0:
         # return an empty graph
@@ -192,13 +212,14 @@ def get_subgraph(g: Graph, node_mask: BoolTensor, keep_ids: bool = False) -> Gra
     x = g.x
     y = g.y
 
+    row, col = edge_index
+    edge_mask = node_mask[row] & node_mask[col]
     if keep_ids:
         drop_mask = ~node_mask
         if x is not None:
+            x = x.clone()
             x[drop_mask, :] = 0
 
-        row, col = edge_index
-        edge_mask = node_mask[row] & node_mask[col]
         new_edge = drop_edges(g.edge, num_node, edge_mask)
     
         new_node = Node(node_type, num_node, x, y)
@@ -209,21 +230,96 @@ def get_subgraph(g: Graph, node_mask: BoolTensor, keep_ids: bool = False) -> Gra
         if y is not None:
             y = y[node_mask]
 
-        row, col = edge_index
-        remain_nodes = np.arange(num_node)[node_mask]
-        node_id_dict = {}
-        for i, idx in enumerate(remain_nodes):
-            node_id_dict[idx] = i
-        edge_mask = node_mask[row] & node_mask[col]
-        new_edge = drop_edges(g.edge, num_remain_node, edge_mask, node_id_dict=node_id_dict)
+        # lookup[old id] = new id, -1 for the dropped nodes
+        lookup = torch.full((num_node, ), -1, dtype=torch.long)
+        lookup[node_mask] = torch.arange(num_remain_node)
+        new_edge = drop_edges(g.edge, num_remain_node, edge_mask, node_id_dict=lookup)
     
         new_node = Node(node_type, num_remain_node, x, y)
 
-    new_g = copy.deepcopy(g)
-    new_g.node = new_node
-    new_g.edge = new_edge
+    return Graph.from_parts(new_edge, new_node)
 
-    return new_g
+def get_subgraphs(g: Graph, node_sets: List, keep_ids: bool = False) -> List[Graph]:
+    """
+    Extract the induced subgraphs of many node sets of g in one pass, equivalent to calling get_subgraph on each.
+    node_sets - list of boolean node masks or of node id arrays / tensors
+    Only the edges leaving the kept nodes are visited: the edges are grouped by source once, the out-edges of all
+    node sets are gathered together and their targets are looked up in the sorted (set id, node id) keys.
+    """
+    num_node = g.num_node
+    node_type = g.node_type
+    edge_type = g.edge_type
+    x, y = g.x, g.y
+    num_set = len(node_sets)
+
+    node_lists = []
+    for node_set in node_sets:
+        node_set = torch.as_tensor(np.asarray(node_set) if isinstance(node_set, list) else node_set)
+        if node_set.dtype == torch.bool:
+            node_set = _to_node_mask(node_set, num_node).nonzero(as_tuple=True)[0]
+        node_set = torch.unique(node_set.to(torch.long))
+        if node_set.numel() > 0 and (node_set[0] < 0 or node_set[-1] >= num_node):
+            raise ValueError('node ids must be in range of [0, num_node)!')
+        node_lists.append(node_set.numpy())
+
+    sizes = np.array([len(nodes) for nodes in node_lists], dtype=np.int64)
+    set_offsets = np.concatenate(([0], np.cumsum(sizes)))
+    set_ids = np.repeat(np.arange(num_set, dtype=np.int64), sizes)
+    nodes = np.concatenate(node_lists) if num_set > 0 else np.zeros(0, dtype=np.int64)
+    # sorted, as every node list is sorted and the set ids increase
+    keys = set_ids * num_node + nodes
+
+    row, col = (index.numpy().astype(np.int64) for index in g.edge_index)
+    edge_weight = g.edge_weight.numpy()
+    by_source = np.argsort(row, kind='stable')
+    ptr = np.concatenate(([0], np.cumsum(np.bincount(row, minlength=num_node))))
+
+    # positions (in by_source) of the out-edges of every kept node of every set
+    counts = ptr[nodes + 1] - ptr[nodes]
+    total = int(counts.sum())
+    shift = np.repeat(ptr[nodes] - (np.cumsum(counts) - counts), counts)
+    edge_ids = by_source[shift + np.arange(total, dtype=np.int64)]
+    src_pos = np.repeat(np.arange(len(nodes), dtype=np.int64), counts)
+    edge_sets = set_ids[src_pos]
+
+    col_keys = edge_sets * num_node + col[edge_ids]
+    dst_pos = np.minimum(np.searchsorted(keys, col_keys), max(len(keys) - 1, 0))
+    keep = keys[dst_pos] == col_keys if len(keys) > 0 else np.zeros(0, dtype=bool)
+    edge_ids, edge_sets, src_pos, dst_pos = edge_ids[keep], edge_sets[keep], src_pos[keep], dst_pos[keep]
+
+    # keep the original edge order inside every subgraph
+    order = np.lexsort((edge_ids, edge_sets))
+    edge_ids, edge_sets, src_pos, dst_pos = edge_ids[order], edge_sets[order], src_pos[order], dst_pos[order]
+    edge_bounds = np.searchsorted(edge_sets, np.arange(num_set + 1))
+
+    subgraphs = []
+    for i in range(num_set):
+        if sizes[i] == 0:
+            subgraphs.append(Graph([], [], [], 0, node_type, edge_type))
+            continue
+        st, ed = edge_bounds[i], edge_bounds[i + 1]
+        kept = torch.from_numpy(node_lists[i])
+        if keep_ids:
+            new_row, new_col = row[edge_ids[st:ed]], col[edge_ids[st:ed]]
+            sub_num_node = num_node
+            sub_x = None
+            if x is not None:
+                sub_x = torch.zeros_like(x)
+                sub_x[kept] = x[kept]
+            sub_y = y
+        else:
+            new_row = src_pos[st:ed] - set_offsets[i]
+            new_col = dst_pos[st:ed] - set_offsets[i]
+            sub_num_node = int(sizes[i])
+            sub_x = x[kept] if x is not None else None
+            sub_y = y[kept] if y is not None else None
+
+        new_edge = Edge(torch.from_numpy(new_row), torch.from_numpy(new_col),
+                        torch.from_numpy(edge_weight[edge_ids[st:ed]]), edge_type, sub_num_node, g.edge_attrs)
+        new_node = Node(node_type, sub_num_node, sub_x, sub_y)
+        subgraphs.append(Graph.from_parts(new_edge, new_node))
+
+    return subgraphs
 
 def sort_edges(old_eg: Edge, num_node: int, sort_by: bool = True) -> Edge:
     """
@@ -1,3 +1,4 @@
+import numpy as np
 import os.path as osp
 import torch
 
@@ -15,10 +16,67 @@ def file_exist(filepaths):
             return False
 
 
-def to_undirected(edge_index):
+def _as_row_col(edge_index):
     row, col = edge_index
-    new_row = torch.hstack((row, col))
-    new_col = torch.hstack((col, row))
-    new_edge_index = torch.stack((new_row, new_col), dim=0)
+    row = torch.as_tensor(row, dtype=torch.long)
+    col = torch.as_tensor(col, dtype=torch.long)
+    return row, col
 
-    return new_edge_index
+
+def coalesce(edge_index, num_node=None, edge_weight=None, remove_self_loops=False, reduce="max"):
+    """
+    Sort the edges by (row, col) and merge the duplicated ones.
+    edge_index - (2, E) tensor or (row, col) pair; num_node - inferred from the edges if not given
+    reduce - how the weights of duplicated edges are merged: 'max', 'min', 'sum', 'mean' or 'first'
+    return the coalesced (2, E') edge_index, and the merged weights too if edge_weight is given
+    """
+    if reduce not in ("max", "min", "sum", "mean", "first"):
+        raise ValueError("reduce must be 'max', 'min', 'sum', 'mean' or 'first'!")
+    row, col = _as_row_col(edge_index)
+    row, col = row.numpy(), col.numpy()
+    weight = None if edge_weight is None else torch.as_tensor(edge_weight).numpy()
+
+    if remove_self_loops:
+        mask = row != col
+        row, col = row[mask], col[mask]
+        weight = weight[mask] if weight is not None else None
+    if num_node is None:
+        num_node = int(max(row.max(), col.max())) + 1 if len(row) > 0 else 0
+
+    keys = row.astype(np.int64) * num_node + col
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    starts = np.flatnonzero(np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1]))) if len(keys) > 0 \
+        else np.zeros(0, dtype=np.int64)
+    uniq = sorted_keys[starts]
+    new_edge_index = torch.from_numpy(np.stack((uniq // num_node, uniq % num_node)).astype(np.int64))
+    if weight is None:
+        return new_edge_index
+
+    weight = weight[order]
+    if len(starts) == 0:
+        new_weight = weight
+    elif reduce == "first":
+        new_weight = weight[starts]
+    elif reduce == "max":
+        new_weight = np.maximum.reduceat(weight, starts)
+    elif reduce == "min":
+        new_weight = np.minimum.reduceat(weight, starts)
+    else:
+        new_weight = np.add.reduceat(weight, starts)
+        if reduce == "mean":
+            new_weight = new_weight / np.diff(np.append(starts, len(weight)))
+    return new_edge_index, torch.from_numpy(np.ascontiguousarray(new_weight))
+
+
+def to_undirected(edge_index, num_node=None, edge_weight=None, remove_self_loops=False, reduce="max"):
+    """
+    Add the reverse of every edge and coalesce, so that every undirected edge appears exactly once per direction.
+    The arguments and return values are the same as for coalesce.
+    """
+    row, col = _as_row_col(edge_index)
+    new_row, new_col = torch.cat((row, col)), torch.cat((col, row))
+    if edge_weight is not None:
+        edge_weight = torch.as_tensor(edge_weight)
+        edge_weight = torch.cat((edge_weight, edge_weight))
+    return coalesce((new_row, new_col), num_node, edge_weight, remove_self_loops, reduce)
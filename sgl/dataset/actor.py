@@ -2,11 +2,11 @@ import numpy as np
 import os.path as osp
 import pickle as pkl
 import torch
-from torch_sparse import SparseTensor, coalesce
+from torch_sparse import SparseTensor
 
 from sgl.data.base_data import Graph
 from sgl.data.base_dataset import NodeDataset
-from sgl.dataset.utils import pkl_read_file, download_to
+from sgl.dataset.utils import graph_read_file, download_to, coalesce
 
 
 class Actor(NodeDataset):
@@ -18,10 +18,10 @@ class Actor(NodeDataset):
             raise ValueError("Split id not supported")
         super(Actor, self).__init__(root + "Actor", name)
 
-        self._data = pkl_read_file(self.processed_file_paths)
+        self._data = graph_read_file(self.processed_file_paths)
         self._split, self._split_id = split, split_id
-        self._train_idx, self._val_idx, self._test_idx = self.__generate_split(
-            split)
+        self._train_idx, self._val_idx, self._test_idx = self._stored_split(
+            split, lambda: self.__generate_split(split), self._split_id)
 
     @property
     def raw_file_paths(self):
@@ -72,7 +72,7 @@ class Actor(NodeDataset):
             data = f.read().split('\n')[1:-1]
             data = [[int(v) for v in r.split('\t')] for r in data]
             edge_index = torch.tensor(data, dtype=torch.long).t().contiguous()
-            edge_index, _ = coalesce(edge_index, None, x.size(0), x.size(0))
+            edge_index = coalesce(edge_index, x.size(0))
 
         row, col = edge_index[0], edge_index[1]
         edge_weight = torch.ones(len(row))
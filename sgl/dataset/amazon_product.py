@@ -8,17 +8,17 @@ import torch
 
 from sgl.data.base_data import Graph
 from sgl.data.base_dataset import NodeDataset
-from sgl.dataset.utils import pkl_read_file, download_to
+from sgl.dataset.utils import graph_read_file, download_to
 
 
 class AmazonProduct(NodeDataset):
     def __init__(self, name="amazonproduct", root="./", split="official"):
         super(AmazonProduct, self).__init__(root + "AmazonProduct", name)
 
-        self._data = pkl_read_file(self.processed_file_paths)
+        self._data = graph_read_file(self.processed_file_paths)
         self._split = split
-        self._train_idx, self._val_idx, self._test_idx = self.__generate_split(
-            split)
+        self._train_idx, self._val_idx, self._test_idx = self._stored_split(
+            split, lambda: self.__generate_split(split))
 
     @property
     def raw_file_paths(self):
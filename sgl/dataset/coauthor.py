@@ -4,7 +4,7 @@ import torch
 
 from sgl.data.base_data import Graph
 from sgl.data.base_dataset import NodeDataset
-from sgl.dataset.utils import pkl_read_file, download_to, read_npz, random_split_dataset
+from sgl.dataset.utils import graph_read_file, download_to, read_npz, random_split_dataset
 
 
 class Coauthor(NodeDataset):
@@ -12,9 +12,10 @@ class Coauthor(NodeDataset):
         if name not in ['cs', 'phy']:
             raise ValueError("Dataset name not supported!")
         super(Coauthor, self).__init__(root + "coauthor/", name)
-        self._data = pkl_read_file(self.processed_file_paths)
+        self._data = graph_read_file(self.processed_file_paths)
         self._split = split
-        self._train_idx, self._val_idx, self._test_idx = self.__generate_split(split)
+        self._train_idx, self._val_idx, self._test_idx = self._stored_split(
+            split, lambda: self.__generate_split(split))
 
     @property
     def raw_file_paths(self):
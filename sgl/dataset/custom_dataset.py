@@ -7,18 +7,29 @@ from typing import Tuple, List
 
 from sgl.data.base_data import Graph, HeteroGraph
 from sgl.data.base_dataset import NodeDataset, HeteroNodeDataset
-from sgl.dataset.utils import pkl_read_file, file_exist, load_np
+from sgl.data.columnar import MANIFEST_FILE, columnar_path
+from sgl.data.ingest import TEXT_DELIMITERS, EdgeFileFormat, ingest_edge_list
+from sgl.dataset.utils import pkl_read_file, graph_read_file, file_exist, load_np
 
+# The raw directory holds either adj_matrix.npz (coo arrays 'row', 'col' and 'data') or an edge-list file
+# edges.csv / edges.tsv / edges.txt / edges.bin, which is ingested chunk by chunk into the columnar format
+# (see sgl.data.ingest); x.npy, label.npy and indices.npz are optional in both cases.
 class Custom_Homo(NodeDataset):
-    def __init__(self, name, node_type, edge_type_tuple, num_node = 0, root="./", splitted=True):
+    EDGE_FILES = ["edges" + ext for ext in list(TEXT_DELIMITERS.keys()) + [".bin"]]
+
+    def __init__(self, name, node_type, edge_type_tuple, num_node = 0, root="./", splitted=True,
+                 edge_file_format=None, undirected=False, num_workers=None):
         self._num_node = num_node
         self._node_type = node_type
         if len(edge_type_tuple) != 3:
             raise ValueError('number of elements is invalid for input tuple')
         self._edge_type_tuple = edge_type_tuple
+        self._edge_file_format = edge_file_format
+        self._undirected = undirected
+        self._num_workers = num_workers
         super(Custom_Homo, self).__init__(root, name)
 
-        self._data = pkl_read_file(self.processed_file_paths)
+        self._data = graph_read_file(self.processed_file_paths)
         self._train_idx, self._val_idx, self._test_idx = self.__generate_split(splitted)
 
     @property
@@ -26,16 +37,51 @@ class Custom_Homo(NodeDataset):
          # the storage path of user-defined raw data is 'root/name/raw/'
         return self._raw_dir
 
+    @property
+    def edge_file(self):
+        for filename in self.EDGE_FILES:
+            if file_exist(osp.join(self.raw_file_paths, filename)):
+                return osp.join(self.raw_file_paths, filename)
+        return None
+
     @property
     def processed_file_paths(self):
-        # the storage path of user-defined processed data is 'root/name/processed/name.graph'
+        # the storage path of user-defined processed data is 'root/name/processed/name.graph',
+        # or the manifest of the columnar directory 'root/name/processed/name.graph.columnar' for edge-list files
         filename = "graph"
-        return osp.join(self._processed_dir, "{}.{}".format(self._name, filename))
+        graph_file = osp.join(self._processed_dir, "{}.{}".format(self._name, filename))
+        if self.edge_file is not None and not file_exist(osp.join(self.raw_file_paths, "adj_matrix.npz")):
+            return osp.join(columnar_path(graph_file), MANIFEST_FILE)
+        return graph_file
 
     def _download(self):
         pass 
 
+    def _ingest(self):
+        x_file = osp.join(self.raw_file_paths, "x.npy")
+        label_file = osp.join(self.raw_file_paths, "label.npy")
+        x = x_file if file_exist(x_file) else None
+        labels = None
+        if file_exist(label_file):
+            labels = load_np(label_file)
+            if labels.ndim == 2:
+                labels = np.argmax(labels, 1)
+        num_node = self._num_node if self._num_node else None
+        if x is not None:
+            num_x = np.load(x, mmap_mode="r").shape[0]
+            if num_node is not None:
+                assert num_node == num_x, 'every node should have a feature vector'
+            num_node = num_x
+
+        edge_type = self._edge_type_tuple[0] + '__to__' + self._edge_type_tuple[2]
+        ingest_edge_list(self.edge_file, osp.dirname(self.processed_file_paths), num_node, self._node_type,
+                         edge_type, file_format=self._edge_file_format, undirected=self._undirected, x=x,
+                         y=labels, num_workers=self._num_workers)
+
     def _process(self):
+        if osp.basename(self.processed_file_paths) == MANIFEST_FILE:
+            return self._ingest()
+
         features, row, col, edge_weight, labels = None, None, None, None, None
         if file_exist(osp.join(self.raw_file_paths, "x.npy")):
             features = load_np(osp.join(self.raw_file_paths, "x.npy"))
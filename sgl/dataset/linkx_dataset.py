@@ -7,7 +7,7 @@ from scipy.io import loadmat
 
 from sgl.data.base_data import Graph
 from sgl.data.base_dataset import NodeDataset
-from sgl.dataset.utils import pkl_read_file, download_to
+from sgl.dataset.utils import graph_read_file, download_to
 
 
 # A variety of non-homophilous graph datasets
@@ -23,12 +23,13 @@ class LINKXDataset(NodeDataset):
             raise ValueError("Split id not supported!")
         super(LINKXDataset, self).__init__(root + 'LINKXDataset', name)
 
-        self._data = pkl_read_file(self.processed_file_paths)
+        self._data = graph_read_file(self.processed_file_paths)
         self._split, self._split_id = split, split_id
         self._num_train_per_class = num_train_per_class
         self._num_valid_per_class = num_valid_per_class
-        self._train_idx, self._val_idx, self._test_idx = self.__generate_split(
-            split)
+        self._train_idx, self._val_idx, self._test_idx = self._stored_split(
+            split, lambda: self.__generate_split(split),
+            self._split_id, self._num_train_per_class, self._num_valid_per_class)
 
     @property
     def raw_file_paths(self):
@@ -10,7 +10,7 @@ from torch_geometric.io import read_txt_array
 
 from sgl.data.base_data import Graph
 from sgl.data.base_dataset import NodeDataset
-from sgl.dataset.utils import pkl_read_file, download_to
+from sgl.dataset.utils import pkl_read_file, graph_read_file, download_to
 
 
 class Nell(NodeDataset):
@@ -19,9 +19,10 @@ class Nell(NodeDataset):
             raise ValueError("Dataset name not supported!")
         super(Nell, self).__init__(root + "Nell/", name)
 
-        self._data = pkl_read_file(self.processed_file_paths)
+        self._data = graph_read_file(self.processed_file_paths)
         self._split = split
-        self._train_idx, self._val_idx, self._test_idx = self.__generate_split(split)
+        self._train_idx, self._val_idx, self._test_idx = self._stored_split(
+            split, lambda: self.__generate_split(split))
 
     @property
     def raw_file_paths(self):
@@ -6,7 +6,7 @@ from ogb.nodeproppred import PygNodePropPredDataset
 
 from sgl.data.base_data import Graph
 from sgl.data.base_dataset import NodeDataset
-from sgl.dataset.utils import pkl_read_file, to_undirected
+from sgl.dataset.utils import graph_read_file, to_undirected
 
 
 class Ogbn(NodeDataset):
@@ -15,8 +15,9 @@ class Ogbn(NodeDataset):
             raise ValueError("Dataset name not found!")
         super(Ogbn, self).__init__(root + "ogbn/", name)
 
-        self._data = pkl_read_file(self.processed_file_paths)
-        self._train_idx, self._val_idx, self._test_idx = self.__generate_split(split)
+        self._data = graph_read_file(self.processed_file_paths)
+        self._train_idx, self._val_idx, self._test_idx = self._stored_split(
+            split, lambda: self.__generate_split(split))
 
     @property
     def raw_file_paths(self):
@@ -42,7 +43,7 @@ class Ogbn(NodeDataset):
         else:
             node_type = "paper"
 
-        undi_edge_index = to_undirected(data.edge_index)
+        undi_edge_index = to_undirected(data.edge_index, num_node)
         row, col = undi_edge_index
         edge_weight = torch.ones(len(row))
         if self._name == "products":
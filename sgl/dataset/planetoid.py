@@ -7,7 +7,7 @@ import torch
 
 from sgl.data.base_data import Graph
 from sgl.data.base_dataset import NodeDataset
-from sgl.dataset.utils import pkl_read_file, download_to
+from sgl.dataset.utils import pkl_read_file, graph_read_file, download_to
 
 
 class Planetoid(NodeDataset):
@@ -16,9 +16,10 @@ class Planetoid(NodeDataset):
             raise ValueError("Dataset name not supported!")
         super(Planetoid, self).__init__(root + "Planetoid/", name)
 
-        self._data = pkl_read_file(self.processed_file_paths)
+        self._data = graph_read_file(self.processed_file_paths)
         self._split = split
-        self._train_idx, self._val_idx, self._test_idx = self.__generate_split(split)
+        self._train_idx, self._val_idx, self._test_idx = self._stored_split(
+            split, lambda: self.__generate_split(split))
 
     @property
     def raw_file_paths(self):
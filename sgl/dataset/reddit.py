@@ -8,7 +8,7 @@ from torch_geometric.data import extract_zip
 
 from sgl.data.base_data import Graph
 from sgl.data.base_dataset import NodeDataset
-from sgl.dataset.utils import pkl_read_file, download_to
+from sgl.dataset.utils import graph_read_file, download_to
 
 
 class Reddit(NodeDataset):
@@ -17,10 +17,10 @@ class Reddit(NodeDataset):
             raise ValueError("Dataset name not supported!")
         super(Reddit, self).__init__(root + "Reddit/", name)
 
-        self._data = pkl_read_file(self.processed_file_paths)
+        self._data = graph_read_file(self.processed_file_paths)
         self._split = split
-        self._train_idx, self._val_idx, self._test_idx = self.__generate_split(
-            split)
+        self._train_idx, self._val_idx, self._test_idx = self._stored_split(
+            split, lambda: self.__generate_split(split))
 
     @property
     def raw_file_paths(self):
@@ -5,7 +5,7 @@ import torch
 
 from sgl.data.base_data import Graph
 from sgl.data.base_dataset import NodeDataset
-from sgl.dataset.utils import pkl_read_file, download_to, random_split_dataset
+from sgl.dataset.utils import graph_read_file, download_to, random_split_dataset
 
 
 class Twitch(NodeDataset):
@@ -15,11 +15,12 @@ class Twitch(NodeDataset):
             raise ValueError("Dataset name not supported!")
         super(Twitch, self).__init__(root + "Twitch/", name)
 
-        self._data = pkl_read_file(self.processed_file_paths)
+        self._data = graph_read_file(self.processed_file_paths)
         self._split = split
         self._num_train_per_class = num_train_per_class
         self._num_valid_per_class = num_valid_per_class
-        self._train_idx, self._val_idx, self._test_idx = self.__generate_split(split)
+        self._train_idx, self._val_idx, self._test_idx = self._stored_split(
+            split, lambda: self.__generate_split(split), self._num_train_per_class, self._num_valid_per_class)
 
     @property
     def raw_file_paths(self):
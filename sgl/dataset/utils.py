@@ -7,14 +7,8 @@ import sys
 import torch
 import urllib
 
-
-def to_undirected(edge_index):
-    row, col = edge_index
-    new_row = torch.hstack((row, col))
-    new_col = torch.hstack((col, row))
-    new_edge_index = torch.stack((new_row, new_col), dim=0)
-
-    return new_edge_index
+from sgl.data.columnar import MANIFEST_FILE, columnar_path, load_columnar, save_columnar
+from sgl.data.utils import coalesce, to_undirected
 
 
 def remove_self_loops(edge_index):
@@ -61,6 +55,21 @@ def pkl_read_file(filepath):
             exit(1)
     return file
 
+# Load the processed Graph of a homogeneous dataset straight from its columnar copy whenever its manifest is present.
+# The pickled .graph file is only read to create the copy, or to recreate it when the pickle is newer,
+# so it may be deleted once the copy exists.
+# Datasets written straight into the columnar format pass the path of its manifest instead.
+def graph_read_file(filepath):
+    if osp.basename(filepath) == MANIFEST_FILE:
+        return load_columnar(osp.dirname(filepath))
+
+    path = columnar_path(filepath)
+    manifest_file = osp.join(path, MANIFEST_FILE)
+    if (not osp.exists(manifest_file)) or \
+            (osp.exists(filepath) and osp.getmtime(manifest_file) < osp.getmtime(filepath)):
+        save_columnar(pkl_read_file(filepath), path)
+    return load_columnar(path)
+
 def load_np(path):
     f = np.load(path)
     return f
@@ -79,8 +88,7 @@ def parse_npz(f):
     row = torch.from_numpy(adj.row).to(torch.long)
     col = torch.from_numpy(adj.col).to(torch.long)
     edge_index = torch.stack([row, col], dim=0)
-    edge_index = remove_self_loops(edge_index)
-    edge_index = to_undirected(edge_index)
+    edge_index = to_undirected(edge_index, adj.shape[0], remove_self_loops=True)
 
     y = torch.from_numpy(f['labels']).to(torch.long)
 
@@ -2,11 +2,10 @@ import numpy as np
 import os.path as osp
 import pickle as pkl
 import torch
-from torch_sparse import coalesce
 
 from sgl.data.base_data import Graph
 from sgl.data.base_dataset import NodeDataset
-from sgl.dataset.utils import pkl_read_file, download_to
+from sgl.dataset.utils import graph_read_file, download_to, coalesce
 
 
 class WebKB(NodeDataset):
@@ -21,10 +20,10 @@ class WebKB(NodeDataset):
             raise ValueError("Split id not supported")
 
         super(WebKB, self).__init__(root + "WebKB", name)
-        self._data = pkl_read_file(self.processed_file_paths)
+        self._data = graph_read_file(self.processed_file_paths)
         self._split, self._split_id = split, split_id
-        self._train_idx, self._val_idx, self._test_idx = self.__generate_split(
-            split)
+        self._train_idx, self._val_idx, self._test_idx = self._stored_split(
+            split, lambda: self.__generate_split(split), self._split_id)
 
     @property
     def raw_file_paths(self):
@@ -68,7 +67,7 @@ class WebKB(NodeDataset):
             data = f.read().split('\n')[1:-1]
             data = [[int(v) for v in r.split('\t')] for r in data]
             edge_index = torch.tensor(data, dtype=torch.long).t().contiguous()
-            edge_index, _ = coalesce(edge_index, None, num_node, num_node)
+            edge_index = coalesce(edge_index, num_node)
 
         row, col = edge_index[0], edge_index[1]
         edge_weight = torch.ones(len(row))
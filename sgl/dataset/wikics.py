@@ -7,7 +7,7 @@ from itertools import chain
 
 from sgl.data.base_data import Graph
 from sgl.data.base_dataset import NodeDataset
-from sgl.dataset.utils import pkl_read_file, download_to, to_undirected
+from sgl.dataset.utils import graph_read_file, download_to, to_undirected
 
 
 class Wikics(NodeDataset):
@@ -22,9 +22,10 @@ class Wikics(NodeDataset):
         super(Wikics, self).__init__(root + "Wikics", name)
 
         self._split_id = split_id
-        self._data = pkl_read_file(self.processed_file_paths)
+        self._data = graph_read_file(self.processed_file_paths)
         self._split = split
-        self._train_idx, self._val_idx, self._test_idx = self.__generate_split(split)
+        self._train_idx, self._val_idx, self._test_idx = self._stored_split(
+            split, lambda: self.__generate_split(split), self._split_id)
 
     @property
     def raw_file_paths(self):
@@ -56,7 +57,7 @@ class Wikics(NodeDataset):
         edges = list(chain(*edges))
         edge_index = torch.tensor(edges, dtype=torch.long).t().contiguous()
         if self._is_undirected:
-            edge_index = to_undirected(edge_index)
+            edge_index = to_undirected(edge_index, num_node)
 
         edge_index = edge_index.numpy()
         row, col = edge_index[0], edge_index[1]
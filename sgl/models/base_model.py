@@ -1,8 +1,11 @@
+import numpy as np
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 
 from sgl.data.base_dataset import HeteroNodeDataset
+from sgl.operators.cache import aggregation_cache, config_key, normalization_key, propagation_cache
+from sgl.operators.hetero_propagation import NarsPropagator, ordered_map, supports_factors
 
 
 class BaseSGAPModel(nn.Module):
@@ -19,32 +22,75 @@ class BaseSGAPModel(nn.Module):
         self._processed_feat_list = None
         self._processed_feature = None
         self._pre_msg_learnable = False
+        # reuse the propagated and aggregated features of previous models on the same inputs, see sgl.operators.cache
+        self._memoize = False
+        # (adj, degrees, normalized adjacency) of the last preprocessing, reused and then dropped by postprocess
+        self._pre_adj = None
 
-    def preprocess(self, adj, feature):
+    def preprocess(self, adj, feature, degrees=None):
         if self._pre_graph_op is not None:
-            self._processed_feat_list = self._pre_graph_op.propagate(
-                adj, feature)
+            hops = self._pre_msg_op.required_hops(self._pre_graph_op.prop_steps)
+            self._processed_feat_list = self._propagate(adj, feature, hops, degrees)
             if self._pre_msg_op.aggr_type in [
                 "proj_concat", "learnable_weighted", "iterate_learnable_weighted"]:
                 self._pre_msg_learnable = True
             else:
                 self._pre_msg_learnable = False
-                self._processed_feature = self._pre_msg_op.aggregate(
-                    self._processed_feat_list)
+                self._processed_feature = self._aggregate(self._processed_feat_list)
         else:
             self._pre_msg_learnable = False
             self._processed_feature = feature
 
-    def postprocess(self, adj, output):
+    def _propagate(self, adj, feature, hops, degrees):
+        key = None
+        graph_op_key = config_key(self._pre_graph_op) if self._memoize else None
+        if graph_op_key is not None:
+            key = (id(adj), id(feature), id(degrees), graph_op_key, tuple(hops))
+            cached = propagation_cache.get(key)
+            if cached is not None:
+                feat_list, adj_normalized = cached
+                self._pre_adj = (adj, degrees, adj_normalized)
+                return feat_list
+
+        feat_list = self._pre_graph_op.propagate(adj, feature, hops, degrees)
+        self._pre_adj = (adj, degrees, self._pre_graph_op._adj)
+        if key is not None:
+            propagation_cache.put(key, (feat_list, self._pre_graph_op._adj), refs=(adj, feature, degrees))
+        return feat_list
+
+    # the normalized adjacency of the preprocessing when the post-processing normalizes the same inputs in the same way
+    def _post_adj(self, adj, degrees):
+        pre_adj, self._pre_adj = self._pre_adj, None
+        if pre_adj is None or pre_adj[0] is not adj or pre_adj[1] is not degrees:
+            return None
+        pre_key = normalization_key(self._pre_graph_op)
+        if pre_key is None or pre_key != normalization_key(self._post_graph_op):
+            return None
+        return pre_adj[2]
+
+    def _aggregate(self, feat_list):
+        msg_op_key = config_key(self._pre_msg_op) if self._memoize else None
+        if msg_op_key is None:
+            return self._pre_msg_op.aggregate(feat_list)
+        key = (id(feat_list), msg_op_key)
+        processed_feature = aggregation_cache.get(key)
+        if processed_feature is None:
+            processed_feature = self._pre_msg_op.aggregate(feat_list)
+            aggregation_cache.put(key, processed_feature, refs=(feat_list,))
+        return processed_feature
+
+    def postprocess(self, adj, output, degrees=None):
         if self._post_graph_op is not None:
             if self._post_msg_op.aggr_type in [
                 "proj_concat", "learnable_weighted", "iterate_learnable_weighted"]:
                 raise ValueError(
                     "Learnable weighted message operator is not supported in the post-processing phase!")
-            output = F.softmax(output, dim=1)
-            output = output.detach().numpy()
-            output = self._post_graph_op.propagate(adj, output)
-            output = self._post_msg_op.aggregate(output)
+            # soft labels are propagated where the output lives, see GraphOp.propagate_tensor
+            output = F.softmax(output.detach(), dim=1)
+            hops = self._post_msg_op.required_hops(self._post_graph_op.prop_steps)
+            output = self._post_graph_op.propagate_tensor(adj, output, hops, degrees, self._post_adj(adj, degrees))
+            with torch.no_grad():
+                output = self._post_msg_op.aggregate(output)
 
         return output
 
@@ -57,8 +103,9 @@ class BaseSGAPModel(nn.Module):
         if self._pre_msg_learnable is False:
             processed_feature = self._processed_feature[idx].to(device)
         else:
-            transferred_feat_list = [feat[idx].to(
-                device) for feat in self._processed_feat_list]
+            # hops that were not materialized during preprocessing stay None
+            transferred_feat_list = [feat[idx].to(device) if feat is not None else None
+                                     for feat in self._processed_feat_list]
             processed_feature = self._pre_msg_op.aggregate(
                 transferred_feat_list)
 
@@ -66,6 +113,65 @@ class BaseSGAPModel(nn.Module):
         return output
 
 
+# Propagated features of the predict_class nodes, as one list of prop_steps + 1 hops per subgraph containing them,
+# in the order of the subgraphs.
+# Sampled subgraphs are propagated by a shared NarsPropagator when shared_propagation is set and the graph operator
+# supports it: hops are computed once per distinct set of edge types within reach, instead of once per subgraph,
+# and every subgraph is yielded as soon as its hops are done.
+# Otherwise every subgraph is built (unless given in subgraph_list) and propagated on its own.
+# num_workers threads build and propagate the subgraphs concurrently, with at most max_in_flight of them pending.
+def propagate_subgraphs(graph_op, dataset, predict_class, random_subgraph_num=-1, subgraph_edge_type_num=-1,
+                        subgraph_list=None, shared_propagation=True, num_workers=1, max_in_flight=None):
+    def contains_predict_class(edge_types):
+        return any(predict_class in (edge_type.split("__")[0], edge_type.split("__")[2]) for edge_type in edge_types)
+
+    if subgraph_list is None:
+        chosen_edge_types = dataset.nars_edge_types(dataset.edge_types, predict_class,
+                                                    random_subgraph_num, subgraph_edge_type_num)
+        chosen_edge_types = [edge_types for edge_types in chosen_edge_types if contains_predict_class(edge_types)]
+        if shared_propagation and supports_factors(graph_op):
+            propagator = NarsPropagator(dataset.data, graph_op)
+            for propagated_feature in propagator.propagate_many(chosen_edge_types, predict_class,
+                                                                graph_op.prop_steps, num_workers):
+                yield propagated_feature
+            return
+        subgraph_list = [(edge_types, None) for edge_types in chosen_edge_types]
+
+    predict_idx = dataset.data.node_id_dict[predict_class]
+    num_predict = dataset.data.num_node[predict_class]
+
+    # the node types of a subgraph are stacked in the order of dataset.node_types (see sample_by_edge_type),
+    # so the predict_class nodes start after the nodes of the sampled types preceding it
+    def predict_offset(edge_types):
+        sampled_node_types = set()
+        for edge_type in edge_types:
+            sampled_node_types.update([edge_type.split("__")[0], edge_type.split("__")[2]])
+        offset = 0
+        for node_type in dataset.node_types:
+            if node_type == predict_class:
+                return offset
+            if node_type in sampled_node_types:
+                offset += dataset.data.num_node[node_type]
+
+    def propagate(subgraph):
+        key, value = subgraph
+        adj, feature, node_id = dataset.sample_by_edge_type(key) if value is None else value
+
+        start_pos = predict_offset(key)
+        if int(node_id[start_pos]) != predict_idx[0]:
+            # subgraphs laid out differently fall back to the search
+            start_pos = list(node_id).index(predict_idx[0])
+        return graph_op.propagate_rows(adj, feature, np.arange(start_pos, start_pos + num_predict))
+
+    subgraph_list = [(key, value) for key, value in subgraph_list if contains_predict_class(key)]
+    if num_workers > 1:
+        for propagated_feature in ordered_map(propagate, subgraph_list, num_workers, max_in_flight):
+            yield propagated_feature
+    else:
+        for subgraph in subgraph_list:
+            yield propagate(subgraph)
+
+
 class BaseHeteroSGAPModel(nn.Module):
     def __init__(self, prop_steps, feat_dim, output_dim):
         super(BaseHeteroSGAPModel, self).__init__()
@@ -82,9 +188,11 @@ class BaseHeteroSGAPModel(nn.Module):
         self._pre_msg_learnable = False
 
     # Either subgraph_list or (random_subgraph_num, subgraph_edge_type_num) should be provided.
+    # shared_propagation: propagate the sampled subgraphs with NarsPropagator
+    # num_workers, max_in_flight: concurrent propagation of the subgraphs, see propagate_subgraphs
     def preprocess(self, dataset, predict_class,
                    random_subgraph_num=-1, subgraph_edge_type_num=-1,
-                   subgraph_list=None):
+                   subgraph_list=None, shared_propagation=True, num_workers=1, max_in_flight=None):
         if subgraph_list is None and (random_subgraph_num == -1 or subgraph_edge_type_num == -1):
             raise ValueError(
                 "Either subgraph_list or (random_subgraph_num, subgraph_edge_type_num) should be provided!")
@@ -97,42 +205,33 @@ class BaseHeteroSGAPModel(nn.Module):
                 "Dataset must be an instance of HeteroNodeDataset!")
         elif predict_class not in dataset.node_types:
             raise ValueError("Please input valid node class for prediction!")
-        predict_idx = dataset.data.node_id_dict[predict_class]
-
-        if subgraph_list is None:
-            subgraph_dict = dataset.nars_preprocess(dataset.edge_types, predict_class,
-                                                    random_subgraph_num,
-                                                    subgraph_edge_type_num)
-            subgraph_list = [(key, subgraph_dict[key])
-                             for key in subgraph_dict]
-
-        self._propagated_feat_list_list = [[]
-                                           for _ in range(self._prop_steps + 1)]
-
-        for key, value in subgraph_list:
-            edge_type_list = []
-            for edge_type in key:
-                edge_type_list.append(edge_type.split("__")[0])
-                edge_type_list.append(edge_type.split("__")[2])
-            if predict_class in edge_type_list:
-                adj, feature, node_id = value
-                propagated_feature = self._pre_graph_op.propagate(adj, feature)
-
-                start_pos = list(node_id).index(predict_idx[0])
-                for i, feature in enumerate(propagated_feature):
-                    self._propagated_feat_list_list[i].append(
-                        feature[start_pos:start_pos + dataset.data.num_node[predict_class]])
+
+        # pre-stacked 4-d tensor (num_node, prop_steps + 1, num_subgraphs, feat_dim), filled as the subgraphs are propagated,
+        # so that a batch is gathered with one indexing and aggregated without stacking
+        max_subgraphs = len(subgraph_list) if subgraph_list is not None else random_subgraph_num
+        self._propagated_feat_list_list = None
+        num_subgraphs = 0
+        for propagated_feature in propagate_subgraphs(
+                self._pre_graph_op, dataset, predict_class, random_subgraph_num, subgraph_edge_type_num,
+                subgraph_list, shared_propagation, num_workers, max_in_flight):
+            if self._propagated_feat_list_list is None:
+                num_node, feat_dim = propagated_feature[0].shape
+                self._propagated_feat_list_list = torch.empty(
+                    (num_node, self._prop_steps + 1, max_subgraphs, feat_dim), dtype=torch.float32)
+            for i, feature in enumerate(propagated_feature):
+                self._propagated_feat_list_list[:, i, num_subgraphs] = feature
+            num_subgraphs += 1
+
+        if num_subgraphs < max_subgraphs:
+            self._propagated_feat_list_list = self._propagated_feat_list_list.narrow(
+                2, 0, num_subgraphs).contiguous()
 
     # a wrapper of the forward function
     def model_forward(self, idx, device):
         return self.forward(idx, device)
 
     def forward(self, idx, device):
-        feat_input = []
-        for x_list in self._propagated_feat_list_list:
-            feat_input.append([])
-            for x in x_list:
-                feat_input[-1].append(x[idx].to(device))
+        feat_input = self._propagated_feat_list_list[idx].to(device)
 
         aggregated_feat_list = self._aggregator(feat_input)
         combined_feat = self._pre_msg_op.aggregate(aggregated_feat_list)
@@ -141,12 +240,19 @@ class BaseHeteroSGAPModel(nn.Module):
         return output
 
 
+# layout of the propagated features: "feat_first" (num_node, feat_dim, num_subgraphs * prop_steps)
+# or "hop_first" (num_node, num_subgraphs * prop_steps, feat_dim), column s * prop_steps + k holding hop k of subgraph s
+# buffer_path: optional .npy file backing the propagated features (memory-mapped), instead of memory
 class FastBaseHeteroSGAPModel(nn.Module):
-    def __init__(self, prop_steps, feat_dim, output_dim):
+    def __init__(self, prop_steps, feat_dim, output_dim, layout="feat_first", buffer_path=None):
         super(FastBaseHeteroSGAPModel, self).__init__()
+        if layout not in ("feat_first", "hop_first"):
+            raise ValueError("Layout must be 'feat_first' or 'hop_first'!")
         self._prop_steps = prop_steps
         self._feat_dim = feat_dim
         self._output_dim = output_dim
+        self._layout = layout
+        self._buffer_path = buffer_path
 
         self._pre_graph_op = None
         self._aggregator = None
@@ -157,9 +263,11 @@ class FastBaseHeteroSGAPModel(nn.Module):
         self._pre_msg_learnable = False
 
     # Either subgraph_list or (random_subgraph_num, subgraph_edge_type_num) should be provided.
+    # shared_propagation: propagate the sampled subgraphs with NarsPropagator
+    # num_workers, max_in_flight: concurrent propagation of the subgraphs, see propagate_subgraphs
     def preprocess(self, dataset, predict_class,
                    random_subgraph_num=-1, subgraph_edge_type_num=-1,
-                   subgraph_list=None):
+                   subgraph_list=None, shared_propagation=True, num_workers=1, max_in_flight=None):
         if subgraph_list is None and (random_subgraph_num == -1 or subgraph_edge_type_num == -1):
             raise ValueError(
                 "Either subgraph_list or (random_subgraph_num, subgraph_edge_type_num) should be provided!")
@@ -172,42 +280,41 @@ class FastBaseHeteroSGAPModel(nn.Module):
                 "Dataset must be an instance of HeteroNodeDataset!")
         elif predict_class not in dataset.node_types:
             raise ValueError("Please input valid node class for prediction!")
-        predict_idx = dataset.data.node_id_dict[predict_class]
-
-        if subgraph_list is None:
-            subgraph_dict = dataset.nars_preprocess(dataset.edge_types, predict_class,
-                                                    random_subgraph_num,
-                                                    subgraph_edge_type_num)
-            subgraph_list = [(key, subgraph_dict[key])
-                             for key in subgraph_dict]
-
-        self._propagated_feat_list_list = [[]
-                                           for _ in range(self._prop_steps + 1)]
-
-        for key, value in subgraph_list:
-            edge_type_list = []
-            for edge_type in key:
-                edge_type_list.append(edge_type.split("__")[0])
-                edge_type_list.append(edge_type.split("__")[2])
-            if predict_class in edge_type_list:
-                adj, feature, node_id = value
-                propagated_feature = self._pre_graph_op.propagate(adj, feature)
-
-                start_pos = list(node_id).index(predict_idx[0])
-                for i, feature in enumerate(propagated_feature):
-                    self._propagated_feat_list_list[i].append(
-                        feature[start_pos:start_pos + dataset.data.num_node[predict_class]])
-
-        # 2-d list to 4-d tensor (num_node, feat_dim, num_subgraphs, prop_steps)
-        self._propagated_feat_list_list = [torch.stack(
-            x, dim=2) for x in self._propagated_feat_list_list]
-        self._propagated_feat_list_list = torch.stack(
-            self._propagated_feat_list_list, dim=3)
-
-        # 4-d tensor to 3-d tensor (num_node, feat_dim, num_subgraphs * prop_steps)
-        shape = self._propagated_feat_list_list.size()
-        self._propagated_feat_list_list = self._propagated_feat_list_list.view(
-            shape[0], shape[1], shape[2] * shape[3])
+
+        # every subgraph is written into the preallocated 3-d tensor as soon as it is propagated
+        num_hops = self._prop_steps + 1
+        max_subgraphs = len(subgraph_list) if subgraph_list is not None else random_subgraph_num
+        self._propagated_feat_list_list = None
+        num_subgraphs = 0
+        for propagated_feature in propagate_subgraphs(
+                self._pre_graph_op, dataset, predict_class, random_subgraph_num, subgraph_edge_type_num,
+                subgraph_list, shared_propagation, num_workers, max_in_flight):
+            if self._propagated_feat_list_list is None:
+                num_node, feat_dim = propagated_feature[0].shape
+                self._propagated_feat_list_list = self._allocate_hop_tensor(
+                    num_node, feat_dim, max_subgraphs * num_hops)
+            for i, feature in enumerate(propagated_feature):
+                column = num_subgraphs * num_hops + i
+                if self._layout == "feat_first":
+                    self._propagated_feat_list_list[:, :, column] = feature
+                else:
+                    self._propagated_feat_list_list[:, column, :] = feature
+            num_subgraphs += 1
+
+        if num_subgraphs < max_subgraphs:
+            # fewer subgraphs contain the predict class than were sampled
+            dim = 2 if self._layout == "feat_first" else 1
+            self._propagated_feat_list_list = self._propagated_feat_list_list.narrow(
+                dim, 0, num_subgraphs * num_hops).contiguous()
+
+    def _allocate_hop_tensor(self, num_node, feat_dim, num_columns):
+        if self._layout == "feat_first":
+            shape = (num_node, feat_dim, num_columns)
+        else:
+            shape = (num_node, num_columns, feat_dim)
+        if self._buffer_path is None:
+            return torch.empty(shape, dtype=torch.float32)
+        return torch.from_numpy(np.lib.format.open_memmap(self._buffer_path, mode="w+", dtype=np.float32, shape=shape))
 
     # a wrapper of the forward function
     def model_forward(self, idx, device):
@@ -3,6 +3,7 @@ import torch.nn as nn
 import torch.nn.functional as F
 
 from sgl.data.base_dataset import HeteroNodeDataset
+from sgl.operators.cache import normalization_key
 
 
 class BaseSGAPModelDist(nn.Module):
@@ -19,24 +20,47 @@ class BaseSGAPModelDist(nn.Module):
         self._processed_feat_list = None
         self._processed_feature = None
         self._pre_msg_learnable = False
+        # (adj, degrees, normalized adjacency) of the last preprocessing, reused and then dropped by postprocess
+        self._pre_adj = None
 
-    def preprocess(self, adj, feature):
+    def preprocess(self, adj, feature, degrees=None):
         if self._pre_graph_op is not None:
             self._processed_feat_list = self._pre_graph_op.propagate(
-                adj, feature)
+                adj, feature, degrees=degrees)
+            self._pre_adj = (adj, degrees, self._pre_graph_op._adj)
         else:
             self._processed_feat_list = [feature]
 
-    def postprocess(self, adj, output):
+    # every rank propagates its own rows [row_bounds[rank], row_bounds[rank + 1]) and keeps them as its hop store
+    def dist_preprocess(self, adj_rows, feature_rows, row_bounds):
+        if self._pre_graph_op is not None:
+            self._processed_feat_list = self._pre_graph_op.propagate_distributed(
+                adj_rows, feature_rows, row_bounds)
+        else:
+            self._processed_feat_list = [torch.FloatTensor(feature_rows)]
+
+    # the normalized adjacency of the preprocessing when the post-processing normalizes the same inputs in the same way
+    def _post_adj(self, adj, degrees):
+        pre_adj, self._pre_adj = self._pre_adj, None
+        if pre_adj is None or pre_adj[0] is not adj or pre_adj[1] is not degrees:
+            return None
+        pre_key = normalization_key(self._pre_graph_op)
+        if pre_key is None or pre_key != normalization_key(self._post_graph_op):
+            return None
+        return pre_adj[2]
+
+    def postprocess(self, adj, output, degrees=None):
         if self._post_graph_op is not None:
             if self._post_msg_op.aggr_type in [
                 "proj_concat", "learnable_weighted", "iterate_learnable_weighted"]:
                 raise ValueError(
                     "Learnable weighted message operator is not supported in the post-processing phase!")
-            output = F.softmax(output, dim=1)
-            output = output.detach().numpy()
-            output = self._post_graph_op.propagate(adj, output)
-            output = self._post_msg_op.aggregate(output)
+            # soft labels are propagated where the output lives, see GraphOp.propagate_tensor
+            output = F.softmax(output.detach(), dim=1)
+            hops = self._post_msg_op.required_hops(self._post_graph_op.prop_steps)
+            output = self._post_graph_op.propagate_tensor(adj, output, hops, degrees, self._post_adj(adj, degrees))
+            with torch.no_grad():
+                output = self._post_msg_op.aggregate(output)
 
         return output
 
@@ -18,8 +18,14 @@ class OneDimConvolution(nn.Module):
         for weight in self.__learnable_weight:
             nn.init.xavier_uniform_(weight)
 
-    # feat_list_list = hop_num * feat_list = hop_num * (subgraph_num * feat)
+    # feat_list_list = hop_num * feat_list = hop_num * (subgraph_num * feat),
+    # or a pre-stacked tensor (num_node, hop_num, subgraph_num, feat_dim) reduced by a single einsum
     def forward(self, feat_list_list):
+        if isinstance(feat_list_list, torch.Tensor):
+            weight = torch.stack(list(self.__learnable_weight))
+            aggregated_feat = torch.einsum("nksf,kfs->knf", feat_list_list, weight) / feat_list_list.shape[2]
+            return list(aggregated_feat.unbind(dim=0))
+
         aggregated_feat_list = []
         for i in range(self.__hop_num):
             adopted_feat = torch.stack(feat_list_list[i], dim=2)
@@ -48,8 +54,14 @@ class OneDimConvolutionWeightSharedAcrossFeatures(nn.Module):
         for weight in self.__learnable_weight:
             nn.init.xavier_uniform_(weight)
 
-    # feat_list_list = hop_num * feat_list = hop_num * (subgraph_num * feat)
+    # feat_list_list = hop_num * feat_list = hop_num * (subgraph_num * feat),
+    # or a pre-stacked tensor (num_node, hop_num, subgraph_num, feat_dim) reduced by a single einsum
     def forward(self, feat_list_list):
+        if isinstance(feat_list_list, torch.Tensor):
+            weight = torch.stack(list(self.__learnable_weight)).squeeze(dim=1)
+            aggregated_feat = torch.einsum("nksf,ks->knf", feat_list_list, weight) / feat_list_list.shape[2]
+            return list(aggregated_feat.unbind(dim=0))
+
         aggregated_feat_list = []
         for i in range(self.__hop_num):
             adopted_feat = torch.stack(feat_list_list[i], dim=2)
@@ -62,11 +74,15 @@ class OneDimConvolutionWeightSharedAcrossFeatures(nn.Module):
 
 
 class FastOneDimConvolution(nn.Module):
-    def __init__(self, num_subgraphs, prop_steps):
+    # layout: "feat_first" or "hop_first" layout of the input, see FastBaseHeteroSGAPModel
+    def __init__(self, num_subgraphs, prop_steps, layout="feat_first"):
         super(FastOneDimConvolution, self).__init__()
+        if layout not in ("feat_first", "hop_first"):
+            raise ValueError("Layout must be 'feat_first' or 'hop_first'!")
 
         self.__num_subgraphs = num_subgraphs
         self.__prop_steps = prop_steps
+        self.__layout = layout
 
         # How to initialize the weight is extremely important.
         # Pure xavier will lead to extremely unstable accuracy.
@@ -74,8 +90,11 @@ class FastOneDimConvolution(nn.Module):
         self.__learnable_weight = nn.Parameter(
             torch.ones(num_subgraphs * prop_steps, 1))
 
-    # feat_list_list: 3-d tensor (num_node, feat_dim, num_subgraphs * prop_steps)
+    # feat_list_list: 3-d tensor (num_node, feat_dim, num_subgraphs * prop_steps),
+    # or (num_node, num_subgraphs * prop_steps, feat_dim) with the "hop_first" layout
     def forward(self, feat_list_list):
+        if self.__layout == "hop_first":
+            return (self.__learnable_weight.t() @ feat_list_list).squeeze(dim=1)
         return (feat_list_list @ self.__learnable_weight).squeeze(dim=2)
 
     @property
@@ -140,6 +159,45 @@ class MultiLayerPerceptron(nn.Module):
         output = self.__fcs[-1](feature)
         return output
 
+# num_groups independent MultiLayerPerceptrons (without batch norm) evaluated together:
+# every layer is one batched matmul over the stacked groups, each group keeping its own weights and PReLU.
+class GroupedMultiLayerPerceptron(nn.Module):
+    def __init__(self, num_groups, feat_dim, hidden_dim, num_layers, output_dim, dropout=0.5):
+        super(GroupedMultiLayerPerceptron, self).__init__()
+        if num_layers < 2:
+            raise ValueError("MLP must have at least two layers!")
+        self.__num_layers = num_layers
+
+        dims = [feat_dim] + [hidden_dim] * (num_layers - 1) + [output_dim]
+        self.__weights = nn.ParameterList()
+        self.__biases = nn.ParameterList()
+        for in_dim, out_dim in zip(dims[:-1], dims[1:]):
+            self.__weights.append(nn.Parameter(torch.FloatTensor(num_groups, in_dim, out_dim)))
+            self.__biases.append(nn.Parameter(torch.FloatTensor(num_groups, 1, out_dim)))
+
+        self.__dropout = nn.Dropout(dropout)
+        # one PReLU slope per group, as nn.PReLU() in every MultiLayerPerceptron
+        self.__prelu_weight = nn.Parameter(torch.full((num_groups, 1, 1), 0.25))
+        self.reset_parameters()
+
+    def reset_parameters(self):
+        gain = nn.init.calculate_gain("relu")
+        for weight, bias in zip(self.__weights, self.__biases):
+            for group_weight in weight:
+                nn.init.xavier_uniform_(group_weight, gain=gain)
+            nn.init.zeros_(bias)
+
+    # feature: 3-d tensor (num_groups, num_node, feat_dim) -> (num_groups, num_node, output_dim)
+    def forward(self, feature):
+        for i in range(self.__num_layers - 1):
+            feature = torch.baddbmm(self.__biases[i], feature, self.__weights[i])
+            feature = torch.where(feature >= 0, feature, self.__prelu_weight * feature)
+            feature = self.__dropout(feature)
+
+        output = torch.baddbmm(self.__biases[-1], feature, self.__weights[-1])
+        return output
+
+
 class ResMultiLayerPerceptron(nn.Module):
     def __init__(self, feat_dim, hidden_dim, num_layers, output_dim, dropout=0.8, bn=False):
         super(ResMultiLayerPerceptron, self).__init__()
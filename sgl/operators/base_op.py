@@ -1,3 +1,5 @@
+import inspect
+from functools import lru_cache
 import numpy as np
 import platform
 import scipy.sparse as sp
@@ -5,7 +7,10 @@ import torch
 import torch.nn as nn
 from torch import Tensor
 
-from sgl.operators.utils import csr_sparse_dense_matmul, cuda_csr_sparse_dense_matmul
+from sgl.data.disk_csr import DiskCSRMatrix
+from sgl.operators.dist_propagation import DistributedPropagator
+from sgl.operators.sharded_propagation import ShardedPropagator
+from sgl.operators.utils import csr_sparse_dense_matmul, cuda_csr_sparse_dense_matmul, csr_block_dense_matmul
 
 
 class GraphOp:
@@ -13,27 +18,240 @@ class GraphOp:
         self._prop_steps = prop_steps
         self._adj = None
 
-    def _construct_adj(self, adj):
+    @property
+    def prop_steps(self):
+        return self._prop_steps
+
+    # degrees: optional precomputed degrees of adj + I, see Graph.degrees(self_loops=True)
+    def _construct_adj(self, adj, degrees=None):
+        raise NotImplementedError
+
+    # The normalized adjacency written as diag(row_scale) @ adj @ diag(col_scale) + diag(diag),
+    # given the degrees of the adjacency with self-loops. Used when the adjacency is not materialized.
+    def _adj_factors(self, degrees):
         raise NotImplementedError
 
-    def propagate(self, adj, feature):
-        self._adj = self._construct_adj(adj)
+    # hops: indices of the propagated features that will actually be read (None for all of them).
+    # Hops that are not required are returned as None, so positional indexing is unchanged,
+    # and only the buffers of the current and the next hop are kept alive for the others.
+    # degrees: optional degrees of adj + I cached with the dataset, so the normalization does not recompute them.
+    # The normalized adjacency is kept in a local variable, so that several threads may propagate with the same op.
+    def propagate(self, adj, feature, hops=None, degrees=None):
+        self._adj = adj_normalized = self._build_adj(adj, degrees)
 
         if not isinstance(adj, sp.csr_matrix):
             raise TypeError("The adjacency matrix must be a scipy csr sparse matrix!")
         elif not isinstance(feature, np.ndarray):
             raise TypeError("The feature matrix must be a numpy.ndarray!")
-        elif self._adj.shape[1] != feature.shape[0]:
+        elif adj_normalized.shape[1] != feature.shape[0]:
             raise ValueError("Dimension mismatch detected for the adjacency and the feature matrix!")
 
-        prop_feat_list = [feature]
-        for _ in range(self._prop_steps):
+        hops = self._check_hops(hops)
+
+        prop_feat_list = [None] * (self._prop_steps + 1)
+        if 0 in hops:
+            prop_feat_list[0] = torch.FloatTensor(feature)
+
+        feat_temp = feature
+        for step in range(1, max(hops) + 1):
             if platform.system() == "Linux":
-                feat_temp = csr_sparse_dense_matmul(self._adj, prop_feat_list[-1])
+                feat_temp = csr_sparse_dense_matmul(adj_normalized, feat_temp)
             else:
-                feat_temp = self._adj.dot(prop_feat_list[-1])
-            prop_feat_list.append(feat_temp)
-        return [torch.FloatTensor(feat) for feat in prop_feat_list]
+                feat_temp = adj_normalized.dot(feat_temp)
+            if step in hops:
+                prop_feat_list[step] = self._to_tensor(feat_temp)
+        return prop_feat_list
+
+    # Propagation of a torch tensor (e.g. the soft labels of the post-processing) on its own device, with torch.sparse.mm,
+    # so the features never go through numpy. No gradient is recorded.
+    # adj_normalized: optional normalized adjacency already built from adj (and degrees), e.g. during the preprocessing.
+    def propagate_tensor(self, adj, feature, hops=None, degrees=None, adj_normalized=None):
+        if not isinstance(adj, sp.csr_matrix):
+            raise TypeError("The adjacency matrix must be a scipy csr sparse matrix!")
+        elif not isinstance(feature, Tensor):
+            raise TypeError("The feature matrix must be a tensor!")
+        elif adj.shape[1] != feature.shape[0]:
+            raise ValueError("Dimension mismatch detected for the adjacency and the feature matrix!")
+
+        hops = self._check_hops(hops)
+        if adj_normalized is None:
+            adj_normalized = self._build_adj(adj, degrees)
+        adj_tensor = self._sparse_tensor(adj_normalized, feature.device)
+
+        prop_feat_list = [None] * (self._prop_steps + 1)
+        feat_temp = feature.detach().float()
+        if 0 in hops:
+            prop_feat_list[0] = feat_temp
+        with torch.no_grad():
+            for step in range(1, max(hops) + 1):
+                feat_temp = torch.sparse.mm(adj_tensor, feat_temp)
+                if step in hops:
+                    prop_feat_list[step] = feat_temp
+        return prop_feat_list
+
+    # Propagated features of the given rows only (one tensor of shape (len(rows), num_features) per hop).
+    # Hop k is computed for the rows within prop_steps - k hops of the given ones, the nested reach sets
+    # being grown backwards from the rows through the columns of the normalized adjacency, so the last hop
+    # only covers the given rows and nodes out of reach are never propagated.
+    def propagate_rows(self, adj, feature, rows, hops=None, degrees=None):
+        adj_normalized = self._build_adj(adj, degrees)
+
+        if not isinstance(adj, sp.csr_matrix):
+            raise TypeError("The adjacency matrix must be a scipy csr sparse matrix!")
+        elif not isinstance(feature, np.ndarray):
+            raise TypeError("The feature matrix must be a numpy.ndarray!")
+        elif adj_normalized.shape[1] != feature.shape[0]:
+            raise ValueError("Dimension mismatch detected for the adjacency and the feature matrix!")
+
+        hops = self._check_hops(hops)
+        rows = np.unique(np.asarray(rows, dtype=np.int64))
+        last_hop = max(hops)
+
+        # reach[k]: sorted rows whose hop k is needed
+        reach = [None] * (last_hop + 1)
+        reach[last_hop] = rows
+        for step in range(last_hop, 0, -1):
+            block = adj_normalized[reach[step]]
+            reach[step - 1] = np.union1d(reach[step], np.unique(block.indices))
+
+        prop_feat_list = [None] * (self._prop_steps + 1)
+        if 0 in hops:
+            prop_feat_list[0] = torch.FloatTensor(feature[rows])
+
+        feat_temp = np.ascontiguousarray(feature[reach[0]], dtype=np.float32)
+        for step in range(1, last_hop + 1):
+            block = adj_normalized[reach[step]][:, reach[step - 1]].tocsr()
+            feat_next = np.zeros((len(reach[step]), feat_temp.shape[1]), dtype=np.float32)
+            self._spmm_block(block.indptr, block.indices, block.data, feat_temp, feat_next)
+            feat_temp = feat_next
+            if step in hops:
+                prop_feat_list[step] = self._to_tensor(feat_temp[np.searchsorted(reach[step], rows)])
+        return prop_feat_list
+
+    # Streams the row ranges of an adjacency stored on disk (sgl.data.DiskCSRMatrix) through the native kernel,
+    # normalizing each block on the fly, so that the adjacency is never held in memory as a whole.
+    # The adjacency is assumed to be symmetric, as is the case for all the datasets in SGL.
+    def propagate_disk(self, disk_adj, feature, hops=None, chunk_nnz=1 << 24, degrees=None):
+        if not isinstance(disk_adj, DiskCSRMatrix):
+            raise TypeError("The adjacency matrix must be a DiskCSRMatrix!")
+        elif not isinstance(feature, np.ndarray):
+            raise TypeError("The feature matrix must be a numpy.ndarray!")
+        elif disk_adj.shape[1] != feature.shape[0]:
+            raise ValueError("Dimension mismatch detected for the adjacency and the feature matrix!")
+        elif chunk_nnz >= 2 ** 31:
+            raise ValueError("chunk_nnz must fit into a 32-bit row pointer!")
+
+        hops = self._check_hops(hops)
+        if degrees is None:
+            degrees = disk_adj.row_sums(chunk_nnz) + 1
+        row_scale, col_scale, diag = self._adj_factors(np.asarray(degrees, dtype=np.float64).reshape(-1))
+        row_scale, col_scale = row_scale.astype(np.float32), col_scale.astype(np.float32)
+        diag = diag.astype(np.float32).reshape(-1, 1)
+
+        prop_feat_list = [None] * (self._prop_steps + 1)
+        if 0 in hops:
+            prop_feat_list[0] = torch.FloatTensor(feature)
+
+        feat_temp = np.ascontiguousarray(feature, dtype=np.float32)
+        for step in range(1, max(hops) + 1):
+            feat_next = np.zeros(feat_temp.shape, dtype=np.float32)
+            for start, end in disk_adj.row_chunks(chunk_nnz):
+                indptr, indices, data = disk_adj.row_block(start, end)
+                data *= col_scale[indices]
+                data *= np.repeat(row_scale[start:end], np.diff(indptr))
+
+                self._spmm_block(indptr, indices, data, feat_temp, feat_next[start:end])
+                feat_next[start:end] += diag[start:end] * feat_temp[start:end]
+            feat_temp = feat_next
+            if step in hops:
+                prop_feat_list[step] = self._to_tensor(feat_temp)
+        return prop_feat_list
+
+    # Propagation sharded by rows across num_workers local processes (see ShardedPropagator),
+    # each worker being pinned to the cpus of one NUMA node when numa_aware is set.
+    def propagate_sharded(self, adj, feature, num_workers, hops=None, numa_aware=True, degrees=None):
+        self._adj = self._build_adj(adj, degrees)
+
+        if not isinstance(adj, sp.csr_matrix):
+            raise TypeError("The adjacency matrix must be a scipy csr sparse matrix!")
+        elif not isinstance(feature, np.ndarray):
+            raise TypeError("The feature matrix must be a numpy.ndarray!")
+        elif self._adj.shape[1] != feature.shape[0]:
+            raise ValueError("Dimension mismatch detected for the adjacency and the feature matrix!")
+
+        hops = self._check_hops(hops)
+        with ShardedPropagator(self._adj, num_workers, numa_aware) as propagator:
+            return propagator.propagate(feature, self._prop_steps, hops)
+
+    # Row-partitioned propagation across the ranks of the default torch.distributed process group
+    # (see DistributedPropagator). Every rank passes its own adjacency rows (global column ids) and feature rows,
+    # and receives the propagated features of these rows only.
+    # The adjacency must be symmetric: every rank multiplies with its own rows, whereas propagate uses the transpose
+    # of adj + I, and the degrees of the rows owned by other ranks are their row sums on their owners.
+    def propagate_distributed(self, adj_rows, feature, row_bounds, hops=None):
+        if not isinstance(adj_rows, sp.csr_matrix):
+            raise TypeError("The adjacency rows must be a scipy csr sparse matrix!")
+        elif not isinstance(feature, np.ndarray):
+            raise TypeError("The feature matrix must be a numpy.ndarray!")
+
+        hops = self._check_hops(hops)
+        propagator = DistributedPropagator(adj_rows, row_bounds)
+        factors = self._adj_factors(propagator.degrees)
+        return propagator.propagate(feature, factors, self._prop_steps, hops)
+
+    # operators written before degrees could be passed only take the adjacency, and build it from adj alone
+    def _build_adj(self, adj, degrees):
+        if degrees is None or not _takes_degrees(type(self)):
+            return self._construct_adj(adj)
+        return self._construct_adj(adj, degrees=degrees)
+
+    # a scipy sparse matrix as a float32 torch sparse tensor on device: csr on the cpu, coalesced coo elsewhere
+    @staticmethod
+    def _sparse_tensor(adj, device):
+        if device.type == "cpu":
+            adj = adj.tocsr()
+            return torch.sparse_csr_tensor(
+                torch.from_numpy(adj.indptr.astype(np.int64)), torch.from_numpy(adj.indices.astype(np.int64)),
+                torch.from_numpy(adj.data.astype(np.float32)), size=adj.shape)
+        adj = adj.tocoo()
+        indices = torch.from_numpy(np.vstack((adj.row, adj.col)).astype(np.int64))
+        adj_tensor = torch.sparse_coo_tensor(indices, torch.from_numpy(adj.data.astype(np.float32)), size=adj.shape)
+        return adj_tensor.coalesce().to(device)
+
+    # accumulate the product of a csr row block and the whole feature matrix into answer
+    @staticmethod
+    def _spmm_block(indptr, indices, data, feature, answer):
+        if platform.system() == "Linux":
+            csr_block_dense_matmul(indptr, indices, data, feature, answer)
+        else:
+            block = sp.csr_matrix((data, indices, indptr), shape=(len(indptr) - 1, feature.shape[0]))
+            answer += block.dot(feature)
+        return answer
+
+    def _check_hops(self, hops):
+        if hops is None:
+            return set(range(self._prop_steps + 1))
+
+        hops = set(hops)
+        if len(hops) == 0:
+            raise ValueError("At least one hop must be required!")
+        elif min(hops) < 0 or max(hops) > self._prop_steps:
+            raise ValueError("The required hops must lie in [0, prop_steps]!")
+        return hops
+
+    # the buffer produced by the kernel is owned by nobody else, so float32 results are shared instead of copied
+    @staticmethod
+    def _to_tensor(feat):
+        if feat.dtype == np.float32:
+            return torch.from_numpy(feat)
+        return torch.FloatTensor(feat)
+
+
+# whether the _construct_adj of a GraphOp class accepts the degrees, inspected once per class
+@lru_cache(maxsize=None)
+def _takes_degrees(op_class):
+    parameters = inspect.signature(op_class._construct_adj).parameters.values()
+    return any(parameter.name == "degrees" or parameter.kind == parameter.VAR_KEYWORD for parameter in parameters)
 
 
 # Might include training parameters
@@ -47,6 +265,11 @@ class MessageOp(nn.Module):
     def aggr_type(self):
         return self._aggr_type
 
+    # indices of the hops read by _combine when prop_steps propagation steps are performed
+    def required_hops(self, prop_steps):
+        start, end, _ = slice(self._start, self._end).indices(prop_steps + 1)
+        return list(range(start, end))
+
     def _combine(self, feat_list):
         return NotImplementedError
 
@@ -54,7 +277,8 @@ class MessageOp(nn.Module):
         if not isinstance(feat_list, list):
             return TypeError("The input must be a list consists of feature matrices!")
         for feat in feat_list:
-            if not isinstance(feat, Tensor):
+            # hops that were not required during propagation are left as None
+            if feat is not None and not isinstance(feat, Tensor):
                 raise TypeError("The feature matrices must be tensors!")
 
         return self._combine(feat_list)
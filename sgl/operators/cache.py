@@ -0,0 +1,98 @@
+from collections import OrderedDict
+
+import numpy as np
+import torch.nn as nn
+from torch import Tensor
+
+
+# Memoization of the non-learnable pre-processing across models sharing a dataset, e.g. the trials of a search.
+# Entries are keyed by the identities of their inputs (adjacency, features, degrees, propagated feature list)
+# together with the configuration of the operators. The inputs are kept alive by the entries, so that their ids
+# are never reused while the entries exist. The least recently used entries are evicted beyond max_entries.
+
+
+class LRUCache:
+    def __init__(self, max_entries=8):
+        if max_entries <= 0:
+            raise ValueError("The number of cached entries must be a positive integer!")
+        self.__max_entries = max_entries
+        self.__entries = OrderedDict()
+
+    # the cached value or None
+    def get(self, key):
+        if key not in self.__entries:
+            return None
+        self.__entries.move_to_end(key)
+        return self.__entries[key][1]
+
+    # refs: the objects whose ids appear in the key, held as long as the entry
+    def put(self, key, value, refs=()):
+        self.__entries[key] = (refs, value)
+        self.__entries.move_to_end(key)
+        while len(self.__entries) > self.__max_entries:
+            self.__entries.popitem(last=False)
+
+    def clear(self):
+        self.__entries.clear()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __contains__(self, key):
+        return key in self.__entries
+
+
+# propagated feature lists and the normalized adjacency, keyed by (id(adj), id(feature), id(degrees), graph op config,
+# hops)
+propagation_cache = LRUCache(max_entries=4)
+# aggregated features, keyed by (id(propagated feature list), message op config)
+aggregation_cache = LRUCache(max_entries=16)
+
+
+def clear_caches():
+    propagation_cache.clear()
+    aggregation_cache.clear()
+
+
+# marks a setting that cannot be part of a key
+_UNKEYABLE = object()
+# bookkeeping attributes of every nn.Module (parameters, buffers, submodules, hooks, training flag)
+_MODULE_STATE = frozenset(vars(nn.Module()))
+
+
+def _hashable(value):
+    if isinstance(value, (bool, int, float, str)) or value is None:
+        return value
+    elif isinstance(value, (Tensor, np.ndarray)) and int(np.prod(value.shape)) <= 1024:
+        return tuple(value.flatten().tolist())
+    elif isinstance(value, (tuple, list)):
+        items = tuple(_hashable(item) for item in value)
+        return _UNKEYABLE if any(item is _UNKEYABLE for item in items) else items
+    return _UNKEYABLE
+
+
+# Class of the operator and its settings (small tensors, such as hand-crafted weights, by value), or None when one
+# of the settings cannot be keyed (e.g. a large tensor), in which case the operator must not be memoized.
+def config_key(op):
+    items = []
+    for name, value in sorted(vars(op).items()):
+        if name == "_adj":
+            continue
+        elif isinstance(op, nn.Module) and name in _MODULE_STATE:
+            # learnable state is never part of a key
+            if name in ("_parameters", "_buffers", "_modules") and len(value) > 0:
+                return None
+            continue
+        hashable = _hashable(value)
+        if hashable is _UNKEYABLE:
+            return None
+        items.append((name, hashable))
+    return (type(op).__name__,) + tuple(items)
+
+
+# config_key of a graph operator without its number of propagation steps, which the normalization does not depend on
+def normalization_key(graph_op):
+    key = config_key(graph_op)
+    if key is None:
+        return None
+    return tuple(item for item in key if not (isinstance(item, tuple) and item[0] == "_prop_steps"))
@@ -0,0 +1,131 @@
+import numpy as np
+import platform
+import scipy.sparse as sp
+import torch
+import torch.distributed as dist
+
+from sgl.operators.utils import csr_block_dense_matmul
+
+
+# All-to-all exchange realized with point-to-point operations, since gloo provides no all_to_all collective.
+# send_list[p] is sent to rank p and recv_list[p] is filled by rank p; the entries of this rank are skipped.
+def _exchange(send_list, recv_list, group=None):
+    rank = dist.get_rank()
+    requests = []
+    for peer, tensor in enumerate(send_list):
+        if peer != rank and tensor.numel() > 0:
+            requests.append(dist.isend(tensor, dst=peer, group=group))
+    for peer, tensor in enumerate(recv_list):
+        if peer != rank and tensor.numel() > 0:
+            requests.append(dist.irecv(tensor, src=peer, group=group))
+    for request in requests:
+        request.wait()
+
+
+# Rank-local part of a row-partitioned propagation. Every rank owns the rows [row_bounds[rank], row_bounds[rank + 1])
+# of the adjacency (with global column ids) and of the features. The boundary ("halo") rows referenced by the
+# local adjacency rows are requested from their owners once, then exchanged before every hop.
+# The adjacency is assumed to be symmetric, so the degrees of the halo nodes are the row sums on their owners.
+# The features live in host memory, so the exchanges run over a gloo group spanning all the ranks, created on top of
+# the default group when the latter uses another backend (e.g. nccl, which only accepts cuda tensors).
+class DistributedPropagator:
+    def __init__(self, adj_rows, row_bounds):
+        if not dist.is_initialized():
+            raise RuntimeError("The default process group must be initialized before the distributed propagation!")
+        if not isinstance(adj_rows, sp.csr_matrix):
+            raise TypeError("The adjacency rows must be a scipy csr sparse matrix!")
+        # new_group is collective, every rank creates its propagator at the same point
+        self.__group = None if dist.get_backend() == "gloo" else dist.new_group(backend="gloo")
+
+        rank, world_size = dist.get_rank(), dist.get_world_size()
+        row_bounds = np.asarray(row_bounds, dtype=np.int64)
+        if len(row_bounds) != world_size + 1:
+            raise ValueError("row_bounds must hold world_size + 1 boundaries!")
+        self.__start, self.__end = int(row_bounds[rank]), int(row_bounds[rank + 1])
+        self.__num_local = self.__end - self.__start
+        if adj_rows.shape[0] != self.__num_local:
+            raise ValueError("The adjacency rows do not match the row range owned by this rank!")
+
+        indices = adj_rows.indices.astype(np.int64)
+        is_local = (indices >= self.__start) & (indices < self.__end)
+        halo = np.unique(indices[~is_local])
+        self.__num_halo = len(halo)
+
+        # halo is sorted, so the requests to every owner are consecutive
+        owners = np.searchsorted(row_bounds, halo, side="right") - 1
+        self.__halo_split = np.searchsorted(owners, np.arange(world_size + 1))
+        requests = [torch.from_numpy(halo[self.__halo_split[p]:self.__halo_split[p + 1]]) for p in range(world_size)]
+
+        request_counts = [torch.zeros(world_size, dtype=torch.long) for _ in range(world_size)]
+        dist.all_gather(request_counts, torch.LongTensor([len(request) for request in requests]), group=self.__group)
+        served = [torch.empty(int(request_counts[p][rank]), dtype=torch.long) for p in range(world_size)]
+        _exchange(requests, served, self.__group)
+        # local rows every peer asked for
+        self.__served = [request.numpy() - self.__start for request in served]
+
+        # columns are renumbered into the extended [local rows; halo rows] matrix
+        ext_indices = np.empty_like(indices)
+        ext_indices[is_local] = indices[is_local] - self.__start
+        ext_indices[~is_local] = self.__num_local + np.searchsorted(halo, indices[~is_local])
+        self.__indptr = adj_rows.indptr.astype(np.int32)
+        self.__indices = ext_indices.astype(np.int32)
+        self.__data = adj_rows.data.astype(np.float32)
+
+        local_degrees = np.asarray(adj_rows.sum(axis=1), dtype=np.float64).reshape(-1, 1) + 1
+        ext_degrees = np.empty((self.__num_local + self.__num_halo, 1), dtype=np.float64)
+        ext_degrees[:self.__num_local] = local_degrees
+        self._gather_halo(local_degrees, ext_degrees[self.__num_local:])
+        self.__degrees = ext_degrees.reshape(-1)
+
+    @property
+    def row_range(self):
+        return self.__start, self.__end
+
+    # degrees (with self-loops) of the local rows followed by those of the halo rows
+    @property
+    def degrees(self):
+        return self.__degrees
+
+    # fill out with the rows of the halo, given the values of the local rows
+    def _gather_halo(self, local_values, out):
+        send_list = [torch.from_numpy(np.ascontiguousarray(local_values[served])) for served in self.__served]
+        recv_list = [torch.from_numpy(out[self.__halo_split[p]:self.__halo_split[p + 1]])
+                     for p in range(len(self.__served))]
+        _exchange(send_list, recv_list, self.__group)
+        return out
+
+    # factors: (row_scale, col_scale, diag) over the extended rows, as returned by GraphOp._adj_factors
+    def propagate(self, feature, factors, prop_steps, hops):
+        if feature.shape[0] != self.__num_local:
+            raise ValueError("The feature rows do not match the row range owned by this rank!")
+
+        row_scale, col_scale, diag = factors
+        data = self.__data * col_scale[self.__indices].astype(np.float32)
+        data *= np.repeat(row_scale[:self.__num_local].astype(np.float32), np.diff(self.__indptr))
+        diag = diag[:self.__num_local].astype(np.float32).reshape(-1, 1)
+        block = None
+        if platform.system() != "Linux":
+            block = sp.csr_matrix((data, self.__indices, self.__indptr),
+                                  shape=(self.__num_local, self.__num_local + self.__num_halo))
+
+        prop_feat_list = [None] * (prop_steps + 1)
+        if 0 in hops:
+            prop_feat_list[0] = torch.FloatTensor(feature)
+
+        feat_temp = np.ascontiguousarray(feature, dtype=np.float32)
+        for step in range(1, max(hops) + 1):
+            ext_feat = np.empty((self.__num_local + self.__num_halo, feat_temp.shape[1]), dtype=np.float32)
+            ext_feat[:self.__num_local] = feat_temp
+            self._gather_halo(feat_temp, ext_feat[self.__num_local:])
+
+            feat_next = np.zeros(feat_temp.shape, dtype=np.float32)
+            if block is None:
+                csr_block_dense_matmul(self.__indptr, self.__indices, data, ext_feat, feat_next)
+            else:
+                feat_next += block.dot(ext_feat)
+            feat_next += diag * feat_temp
+            feat_temp = feat_next
+
+            if step in hops:
+                prop_feat_list[step] = torch.from_numpy(feat_temp)
+        return prop_feat_list
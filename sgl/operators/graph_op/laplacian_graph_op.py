@@ -1,7 +1,7 @@
 import scipy.sparse as sp
 
 from sgl.operators.base_op import GraphOp
-from sgl.operators.utils import adj_to_symmetric_norm
+from sgl.operators.utils import adj_to_symmetric_norm, degree_power
 
 
 class LaplacianGraphOp(GraphOp):
@@ -9,11 +9,13 @@ class LaplacianGraphOp(GraphOp):
         super(LaplacianGraphOp, self).__init__(prop_steps)
         self.__r = r
 
-    def _construct_adj(self, adj):
-        if isinstance(adj, sp.csr_matrix):
-            adj = adj.tocoo()
-        elif not isinstance(adj, sp.coo_matrix):
+    def _construct_adj(self, adj, degrees=None):
+        if not isinstance(adj, (sp.csr_matrix, sp.coo_matrix)):
             raise TypeError("The adjacency matrix must be a scipy.sparse.coo_matrix/csr_matrix!")
 
-        adj_normalized = adj_to_symmetric_norm(adj, self.__r)
-        return adj_normalized.tocsr()
+        return adj_to_symmetric_norm(adj, self.__r, degrees)
+
+    def _adj_factors(self, degrees):
+        row_scale = degree_power(degrees, self.__r - 1)
+        col_scale = degree_power(degrees, -self.__r)
+        return row_scale, col_scale, row_scale * col_scale
@@ -1,7 +1,7 @@
 import scipy.sparse as sp
 
 from sgl.operators.base_op import GraphOp
-from sgl.operators.utils import adj_to_symmetric_norm
+from sgl.operators.utils import adj_to_symmetric_norm, degree_power
 
 
 class PprGraphOp(GraphOp):
@@ -10,12 +10,18 @@ class PprGraphOp(GraphOp):
         self.__r = r
         self.__alpha = alpha
 
-    def _construct_adj(self, adj):
-        if isinstance(adj, sp.csr_matrix):
-            adj = adj.tocoo()
-        elif not isinstance(adj, sp.coo_matrix):
+    def _construct_adj(self, adj, degrees=None):
+        if not isinstance(adj, (sp.csr_matrix, sp.coo_matrix)):
             raise TypeError("The adjacency matrix must be a scipy.sparse.coo_matrix/csr_matrix!")
 
-        adj_normalized = adj_to_symmetric_norm(adj, self.__r)
-        adj_normalized = (1 - self.__alpha) * adj_normalized + self.__alpha * sp.eye(adj.shape[0])
-        return adj_normalized.tocsr()
+        adj_normalized = adj_to_symmetric_norm(adj, self.__r, degrees)
+        # (1 - alpha) * adj_normalized + alpha * I, in place
+        adj_normalized.data *= (1 - self.__alpha)
+        adj_normalized.setdiag(adj_normalized.diagonal() + self.__alpha)
+        adj_normalized.eliminate_zeros()
+        return adj_normalized
+
+    def _adj_factors(self, degrees):
+        row_scale = (1 - self.__alpha) * degree_power(degrees, self.__r - 1)
+        col_scale = degree_power(degrees, -self.__r)
+        return row_scale, col_scale, row_scale * col_scale + self.__alpha
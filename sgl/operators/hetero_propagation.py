@@ -0,0 +1,229 @@
+import numpy as np
+import platform
+import torch
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from sgl.operators.utils import csr_block_dense_matmul
+
+
+# Propagation over the relation subgraphs sampled by NARS, sharing the work between subgraphs.
+#
+# The adjacency of a subgraph S (a set of edge types) is made of typed blocks, cell (u, w) holding the edges
+# from node type u to node type w. Written with the factors of the graph operator (GraphOp._adj_factors),
+# one propagation step restricted to the nodes of type u reads
+#     X^k_u = row_u * sum_w cell(w, u)^T (col_w * X^(k-1)_w) + diag_u * X^(k-1)_u,
+# the factors of a node type depending on its degree in S only. X^k_u therefore only depends on the edge types
+# of S incident to the node types within k hops of u: propagated features are memoized per
+# (node type, hop, those edge types), and subgraphs overlapping in edge types reuse each other's hops.
+# The results equal the propagation over the whole subgraph adjacency up to float rounding.
+
+
+def _edge_node_types(edge_type):
+    return edge_type.split("__")[0], edge_type.split("__")[2]
+
+
+def supports_factors(graph_op):
+    """
+    whether the normalized adjacency of graph_op can be written from its degrees (see GraphOp._adj_factors)
+    """
+    try:
+        graph_op._adj_factors(np.ones(1))
+    except NotImplementedError:
+        return False
+    return True
+
+
+class NarsPropagator:
+    """
+    g - HeteroGraph; graph_op - GraphOp implementing _adj_factors
+    undirected - edges between two node types are symmetrized, as HeteroNodeDataset.sample_by_edge_type does
+    """
+    def __init__(self, g, graph_op, undirected=True):
+        self.__g = g
+        self.__graph_op = graph_op
+        self.__undirected = undirected
+        self.__cells = {}
+        self.__factors = {}
+        self.__features = {}
+
+    def __neighbor_types(self, edge_types):
+        neighbors = {}
+        for edge_type in edge_types:
+            src_type, dst_type = _edge_node_types(edge_type)
+            neighbors.setdefault(src_type, set()).add(dst_type)
+            neighbors.setdefault(dst_type, set()).add(src_type)
+        return neighbors
+
+    # edge types of the subgraph incident to the node types within num_hop hops of node_type
+    def __signature(self, node_type, num_hop, edge_types, neighbors):
+        reach, frontier = {node_type}, {node_type}
+        for _ in range(num_hop):
+            frontier = set().union(*(neighbors[u] for u in frontier)) - reach
+            reach |= frontier
+        return frozenset(edge_type for edge_type in edge_types
+                         if any(u in reach for u in _edge_node_types(edge_type)))
+
+    # binary block of the edges from src_type to dst_type among the given edge types, transposed and cached
+    def __cell_t(self, src_type, dst_type, edge_types):
+        contributing = []
+        for edge_type in sorted(edge_types):
+            u, w = _edge_node_types(edge_type)
+            if (u, w) == (src_type, dst_type):
+                contributing.append((edge_type, False))
+            elif self.__undirected and u != w and (w, u) == (src_type, dst_type):
+                contributing.append((edge_type, True))
+        if len(contributing) == 0:
+            return None
+        key = (src_type, dst_type, tuple(contributing))
+        if key not in self.__cells:
+            cell = None
+            for edge_type, transposed in contributing:
+                block = self.__g.block(edge_type)
+                block = block.transpose() if transposed else block
+                cell = block if cell is None else cell + block
+            cell = cell.tocsr()
+            cell.sum_duplicates()
+            cell.data = np.ones(len(cell.data), dtype=np.float32)
+            cell_t = cell.transpose().tocsr()
+            cell_t.indptr, cell_t.indices = cell_t.indptr.astype(np.int32), cell_t.indices.astype(np.int32)
+            self.__cells[key] = (cell, cell_t)
+        return self.__cells[key]
+
+    # (row_scale, col_scale, diag) of the nodes of node_type, from their degrees (with self-loops) in the subgraph
+    def __type_factors(self, node_type, edge_types, neighbors):
+        incident = frozenset(edge_type for edge_type in edge_types if node_type in _edge_node_types(edge_type))
+        key = (node_type, incident)
+        if key not in self.__factors:
+            degrees = np.ones(self.__g.num_node[node_type], dtype=np.float64)
+            for dst_type in sorted(neighbors.get(node_type, ())):
+                cells = self.__cell_t(node_type, dst_type, incident)
+                if cells is not None:
+                    degrees += np.asarray(cells[0].sum(1), dtype=np.float64).reshape(-1)
+            row_scale, col_scale, diag = self.__graph_op._adj_factors(degrees)
+            self.__factors[key] = (row_scale.astype(np.float32).reshape(-1, 1),
+                                   col_scale.astype(np.float32).reshape(-1, 1),
+                                   diag.astype(np.float32).reshape(-1, 1))
+        return self.__factors[key]
+
+    def __initial_feature(self, node_type):
+        key = (node_type, 0, frozenset())
+        if key not in self.__features:
+            x = self.__g[node_type].x
+            x = x.numpy() if isinstance(x, torch.Tensor) else x
+            self.__features[key] = np.ascontiguousarray(x, dtype=np.float32)
+        return key
+
+    # Key of X^num_hop of node_type in the subgraph. The steps computing it and the hops it depends on are added to
+    # tasks[num_hop] (key -> step) unless already memoized or planned; a step only reads hops num_hop - 1.
+    def __plan(self, node_type, num_hop, edge_types, neighbors, tasks, planned):
+        if num_hop == 0:
+            return self.__initial_feature(node_type)
+        key = (node_type, num_hop, self.__signature(node_type, num_hop, edge_types, neighbors))
+        if key in self.__features or key in planned:
+            return key
+        planned.add(key)
+
+        row_scale, _, diag = self.__type_factors(node_type, edge_types, neighbors)
+        prev_key = self.__plan(node_type, num_hop - 1, edge_types, neighbors, tasks, planned)
+        terms = []
+        for src_type in sorted(neighbors.get(node_type, ())):
+            cells = self.__cell_t(src_type, node_type, edge_types)
+            if cells is None:
+                continue
+            _, col_scale, _ = self.__type_factors(src_type, edge_types, neighbors)
+            terms.append((cells[1], col_scale, self.__plan(src_type, num_hop - 1, edge_types, neighbors, tasks, planned)))
+        tasks[num_hop][key] = (row_scale, diag, prev_key, terms)
+        return key
+
+    def __step(self, task):
+        row_scale, diag, prev_key, terms = task
+        prev = self.__features[prev_key]
+        feature = np.zeros(prev.shape, dtype=np.float32)
+        for cell_t, col_scale, src_key in terms:
+            self.__spmm(cell_t, col_scale * self.__features[src_key], feature)
+        feature *= row_scale
+        feature += diag * prev
+        return feature
+
+    @staticmethod
+    def __spmm(adj, feature, answer):
+        if platform.system() == "Linux":
+            csr_block_dense_matmul(adj.indptr, adj.indices, adj.data, feature, answer)
+        else:
+            answer += adj.dot(feature)
+
+    def propagate(self, edge_types, node_type, prop_steps):
+        """
+        propagated features (prop_steps + 1 tensors) of the nodes of node_type in the subgraph of edge_types
+        """
+        return list(self.propagate_many([edge_types], node_type, prop_steps))[0]
+
+    def propagate_many(self, subgraphs, node_type, prop_steps, num_workers=1):
+        """
+        yield the propagated features of node_type for every subgraph (a list of edge types), in the order of subgraphs
+        num_workers - threads computing the distinct steps of a hop concurrently; the native kernel releases the GIL
+        subgraphs are computed one after the other, hop by hop, reusing the steps memoized by the previous ones;
+        a memoized hop is freed as soon as the last subgraph reading it is done with it, so only the hops shared
+        with later subgraphs are kept, and the outputs of a subgraph are only referenced by the consumer
+        """
+        # every step is planned once, by the first subgraph needing it; last_use: key -> last subgraph reading it
+        planned, last_use, plans = set(), {}, []
+        for index, edge_types in enumerate(subgraphs):
+            neighbors = self.__neighbor_types(edge_types)
+            if node_type not in neighbors:
+                raise ValueError("The subgraph does not contain the node type {}!".format(node_type))
+            tasks = [{} for _ in range(prop_steps + 1)]
+            output_keys = [self.__plan(node_type, hop, edge_types, neighbors, tasks, planned)
+                           for hop in range(prop_steps + 1)]
+            for hop_tasks in tasks:
+                for _, _, prev_key, terms in hop_tasks.values():
+                    for key in [prev_key] + [src_key for _, _, src_key in terms]:
+                        last_use[key] = index
+            for key in output_keys:
+                last_use[key] = index
+            plans.append((tasks, output_keys))
+
+        executor = ThreadPoolExecutor(num_workers) if num_workers > 1 else None
+        try:
+            for index, (tasks, output_keys) in enumerate(plans):
+                for hop in range(1, prop_steps + 1):
+                    keys = list(tasks[hop].keys())
+                    steps = [tasks[hop][key] for key in keys]
+                    features = executor.map(self.__step, steps) if executor is not None else map(self.__step, steps)
+                    for key, feature in zip(keys, features):
+                        self.__features[key] = feature
+                    # the previous hop of this subgraph is only read by this hop
+                    self.__release(index, lambda key: key[1] == hop - 1 and key not in output_keys, last_use)
+
+                outputs = [torch.from_numpy(self.__features[key]) for key in output_keys]
+                self.__release(index, lambda key: True, last_use)
+                yield outputs
+                del outputs
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    # drop the memoized hops matching condition that no subgraph after index reads
+    def __release(self, index, condition, last_use):
+        for key in [key for key in self.__features if last_use.get(key, -1) <= index and condition(key)]:
+            del self.__features[key]
+
+    def clear(self):
+        self.__features = {}
+
+
+def ordered_map(fn, items, num_workers, max_in_flight=None):
+    """
+    yield fn(item) for every item, in order, computed by num_workers threads;
+    at most max_in_flight (2 * num_workers by default) results are pending at a time, which bounds their memory
+    """
+    max_in_flight = 2 * num_workers if max_in_flight is None else max(max_in_flight, 1)
+    with ThreadPoolExecutor(num_workers) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+        while len(pending) > 0:
+            yield pending.popleft().result()
@@ -25,25 +25,31 @@ class IterateLearnableWeightedMessageOp(MessageOp):
             feat_dim = args[0]
             self.__learnable_weight = Linear(feat_dim + feat_dim, 1)
 
+    # Recursive attention: the score of hop i is sigmoid(W [x_i, h_i] + b), h_i being the features of the previous
+    # hops weighted by the current weights (h_start = x_start), and the weights are re-softmaxed together with every
+    # new score. W [x_i, h_i] = W_x x_i + W_h h_i and W_h h_i is the weighted sum of the W_h x_j, so the recursion
+    # only handles scalars per node and hop, and the features are reduced once at the end.
     def _combine(self, feat_list):
-        weight_list = None
         if self.__combination_type == "recursive":
-            weighted_feat = feat_list[self._start]
-            for i in range(self._start, self._end):
-                weights = torch.sigmoid(self.__learnable_weight(
-                    torch.hstack((feat_list[i], weighted_feat))))
-                if i == self._start:
+            adopted_feat = torch.stack(feat_list[self._start:self._end])
+            feat_dim = adopted_feat.shape[2]
+            weight, bias = self.__learnable_weight.weight, self.__learnable_weight.bias
+            # (num_node, num_hops) projections of every hop, as the input and as the history
+            feat_proj = (adopted_feat @ weight[:, :feat_dim].t()).squeeze(dim=2).t()
+            history_proj = (adopted_feat @ weight[:, feat_dim:].t()).squeeze(dim=2).t()
+
+            weight_list = None
+            history = history_proj[:, :1]
+            for i in range(self._end - self._start):
+                weights = torch.sigmoid(feat_proj[:, i:i + 1] + history + bias)
+                if i == 0:
                     weight_list = weights
                 else:
                     weight_list = torch.hstack((weight_list, weights))
                 weight_list = F.softmax(weight_list, dim=1)
+                history = (history_proj[:, :i + 1] * weight_list).sum(dim=1, keepdim=True)
 
-                weighted_feat = torch.mul(
-                    feat_list[self._start], weight_list[:, 0].view(-1, 1))
-                for j in range(1, i + 1):
-                    weighted_feat = weighted_feat + \
-                                    torch.mul(feat_list[self._start + j],
-                                              weight_list[:, j].view(-1, 1))
+            weighted_feat = torch.einsum("knf,nk->nf", adopted_feat, weight_list)
 
         else:
             raise NotImplementedError
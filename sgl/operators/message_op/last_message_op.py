@@ -6,5 +6,8 @@ class LastMessageOp(MessageOp):
         super(LastMessageOp, self).__init__()
         self._aggr_type = "last"
 
+    def required_hops(self, prop_steps):
+        return [prop_steps]
+
     def _combine(self, feat_list):
         return feat_list[-1]
@@ -56,6 +56,14 @@ class LearnableWeightedMessageOp(MessageOp):
             self.__learnable_weight = Linear(
                 feat_dim + (prop_steps + 1) * feat_dim, 1)
 
+    def required_hops(self, prop_steps):
+        hops = super(LearnableWeightedMessageOp, self).required_hops(prop_steps)
+        if self.__combination_type == "ori_ref":
+            hops = sorted(set(hops) | {0})
+        elif self.__combination_type == "jk":
+            hops = list(range(prop_steps + 1))
+        return hops
+
     def _combine(self, feat_list):
         weight_list = None
         if self.__combination_type == "simple":
@@ -66,24 +74,25 @@ class LearnableWeightedMessageOp(MessageOp):
             weight_list = self.__learnable_weight[self._start:self._end]
 
         elif self.__combination_type == "gate":
-            adopted_feat_list = torch.vstack(feat_list[self._start:self._end])
-            weight_list = F.softmax(
-                torch.sigmoid(self.__learnable_weight(adopted_feat_list).view(self._end - self._start, -1).T), dim=1)
-
-        elif self.__combination_type == "ori_ref":
-            reference_feat = feat_list[0].repeat(self._end - self._start, 1)
-            adopted_feat_list = torch.hstack(
-                (reference_feat, torch.vstack(feat_list[self._start:self._end])))
-            weight_list = F.softmax(
-                torch.sigmoid(self.__learnable_weight(adopted_feat_list).view(-1, self._end - self._start)), dim=1)
-
-        elif self.__combination_type == "jk":
-            reference_feat = torch.hstack(feat_list).repeat(
-                self._end - self._start, 1)
-            adopted_feat_list = torch.hstack(
-                (reference_feat, torch.vstack(feat_list[self._start:self._end])))
-            weight_list = F.softmax(
-                torch.sigmoid(self.__learnable_weight(adopted_feat_list).view(-1, self._end - self._start)), dim=1)
+            # one score per node and hop, without stacking the hops
+            scores = torch.hstack([self.__learnable_weight(feat) for feat in feat_list[self._start:self._end]])
+            weight_list = F.softmax(torch.sigmoid(scores), dim=1)
+
+        elif self.__combination_type in ["ori_ref", "jk"]:
+            # The Linear layer sees [reference, feat] with the same reference for every hop. Being linear, it splits
+            # into the reference part, evaluated once per node, and the hop part, so the reference is neither
+            # repeated for every hop nor concatenated with the hops.
+            weight, bias = self.__learnable_weight.weight, self.__learnable_weight.bias
+            feat_dim = feat_list[self._start].shape[1]
+            reference_feat_list = [feat_list[0]] if self.__combination_type == "ori_ref" else feat_list
+            reference_score = bias
+            for i, feat in enumerate(reference_feat_list):
+                reference_score = reference_score + feat @ weight[:, i * feat_dim:(i + 1) * feat_dim].t()
+            hop_weight = weight[:, len(reference_feat_list) * feat_dim:]
+            # the scores are laid out hop after hop and viewed as (-1, num_hops), as the stacked hops used to be
+            scores = torch.stack([reference_score + feat @ hop_weight.t()
+                                  for feat in feat_list[self._start:self._end]])
+            weight_list = F.softmax(torch.sigmoid(scores.view(-1, self._end - self._start)), dim=1)
 
         else:
             raise NotImplementedError
@@ -1,8 +1,7 @@
 import torch
 import torch.nn.functional as F
-from torch.nn import ModuleList
 
-from sgl.models.simple_models import MultiLayerPerceptron
+from sgl.models.simple_models import GroupedMultiLayerPerceptron
 from sgl.operators.base_op import MessageOp
 
 
@@ -11,18 +10,20 @@ class ProjectedConcatMessageOp(MessageOp):
         super(ProjectedConcatMessageOp, self).__init__(start, end)
         self._aggr_type = "proj_concat"
 
-        self.__learnable_weight = ModuleList()
-        for _ in range(end - start):
-            self.__learnable_weight.append(MultiLayerPerceptron(
-                feat_dim, hidden_dim, num_layers, hidden_dim))
+        # one MultiLayerPerceptron per hop, all of them applied by batched matmuls
+        self.__learnable_weight = GroupedMultiLayerPerceptron(
+            end - start, feat_dim, hidden_dim, num_layers, hidden_dim)
 
     def _combine(self, feat_list):
-        adopted_feat_list = feat_list[self._start:self._end]
+        adopted_feat = torch.stack(feat_list[self._start:self._end])
 
-        concat_feat = self.__learnable_weight[0](adopted_feat_list[0])
-        for i in range(1, self._end - self._start):
-            transformed_feat = F.relu(
-                self.__learnable_weight[i](adopted_feat_list[i]))
-            concat_feat = torch.hstack((concat_feat, transformed_feat))
+        transformed_feat = self.__learnable_weight(adopted_feat)
+        # the projection of the first hop is concatenated as is, the others after a relu
+        F.relu(transformed_feat[1:], inplace=True)
 
+        # (num_hops, num_node, hidden_dim) -> (num_node, num_hops * hidden_dim), written in one copy
+        num_hops, num_node, hidden_dim = transformed_feat.shape
+        concat_feat = torch.empty((num_node, num_hops * hidden_dim), dtype=transformed_feat.dtype,
+                                  device=transformed_feat.device)
+        concat_feat.view(num_node, num_hops, hidden_dim).copy_(transformed_feat.transpose(0, 1))
         return concat_feat
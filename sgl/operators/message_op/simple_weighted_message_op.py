@@ -39,12 +39,14 @@ class SimpleWeightedMessageOp(MessageOp):
 
     def _combine(self, feat_list):
         if self.__combination_type == "alpha":
+            # hops before start may be left as None, see MessageOp.required_hops
+            device = next(feat for feat in feat_list[self._start:self._end] if feat is not None).device
             self.__weight_list = [self.__alpha]
             for _ in range(len(feat_list) - 1):
                 self.__weight_list.append(
                     (1 - self.__alpha) * self.__weight_list[-1])
-            self.__weight_list = torch.FloatTensor(
-                self.__weight_list[self._start:self._end])
+            self.__weight_list = torch.tensor(
+                self.__weight_list[self._start:self._end], dtype=torch.float32, device=device)
 
         elif self.__combination_type == "hand_crafted":
             pass
@@ -0,0 +1,210 @@
+import glob
+import multiprocessing as mp
+import numpy as np
+import os
+import platform
+import scipy.sparse as sp
+import torch
+from multiprocessing import shared_memory
+
+from sgl.operators.utils import csr_block_dense_matmul
+
+
+# Split rows into num_parts consecutive ranges holding roughly the same number of non-zeros,
+# returned as num_parts + 1 boundaries. Rows are never split, so heavy rows may leave some ranges empty.
+def partition_rows_by_nnz(indptr, num_parts):
+    num_row = len(indptr) - 1
+    if num_parts <= 0:
+        raise ValueError("The number of partitions must be a positive integer!")
+
+    targets = np.linspace(0, indptr[-1], num_parts + 1)[1:-1]
+    bounds = np.searchsorted(indptr, targets, side="left")
+    bounds = np.concatenate(([0], np.clip(bounds, 0, num_row), [num_row]))
+    return np.maximum.accumulate(bounds)
+
+
+# cpu sets of the NUMA nodes found in sysfs; a single node holding every usable cpu otherwise
+def numa_cpu_sets():
+    usable = os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else set(range(os.cpu_count()))
+
+    cpu_sets = []
+    for node_dir in sorted(glob.glob("/sys/devices/system/node/node[0-9]*")):
+        with open(os.path.join(node_dir, "cpulist"), "r") as rf:
+            cpus = set()
+            for part in rf.read().strip().split(","):
+                if part == "":
+                    continue
+                st, _, ed = part.partition("-")
+                cpus.update(range(int(st), int(ed or st) + 1))
+        cpus &= usable
+        if len(cpus) > 0:
+            cpu_sets.append(sorted(cpus))
+
+    if len(cpu_sets) == 0:
+        cpu_sets = [sorted(usable)]
+    return cpu_sets
+
+
+# Workers are spread round-robin over the NUMA nodes, and the cpus of a node are split among its workers.
+def assign_worker_cpus(num_workers, numa_aware=True):
+    cpu_sets = numa_cpu_sets()
+    if not numa_aware:
+        all_cpus = sorted(set().union(*cpu_sets))
+        num_threads = max(len(all_cpus) // num_workers, 1)
+        return [None] * num_workers, [num_threads] * num_workers
+
+    workers_per_node = [list(range(num_workers))[i::len(cpu_sets)] for i in range(len(cpu_sets))]
+    worker_cpus = [None] * num_workers
+    for cpus, workers in zip(cpu_sets, workers_per_node):
+        for j, worker in enumerate(workers):
+            part = cpus[j::len(workers)]
+            worker_cpus[worker] = part if len(part) > 0 else cpus
+    return worker_cpus, [len(cpus) for cpus in worker_cpus]
+
+
+# Each worker holds one csr row slice and writes its rows of the destination buffer, one hop per request.
+def _shard_worker(conn, buffer_names, shape, row_range, indptr, indices, data, cpus, num_threads):
+    if cpus is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    # the OpenMP runtime was loaded with torch while unpickling this target and has read OMP_NUM_THREADS,
+    # which the parent sets for every worker; the threads of its pool inherit the affinity set above
+    torch.set_num_threads(num_threads)
+
+    buffers = [shared_memory.SharedMemory(name=name) for name in buffer_names]
+    mats = [np.ndarray(shape, dtype=np.float32, buffer=buffer.buf) for buffer in buffers]
+    start, end = row_range
+    block = None
+    if platform.system() != "Linux":
+        block = sp.csr_matrix((data, indices, indptr), shape=(end - start, shape[0]))
+
+    # first touch of the output rows happens on the worker's own NUMA node
+    mats[1][start:end] = 0
+    conn.send(torch.get_num_threads())
+
+    answer = None
+    while True:
+        src = conn.recv()
+        if src is None:
+            break
+        answer = mats[1 - src][start:end]
+        answer[:] = 0
+        if block is None:
+            csr_block_dense_matmul(indptr, indices, data, mats[src], answer)
+        else:
+            answer += block.dot(mats[src])
+        conn.send(True)
+
+    # views into the shared memory must be released before it can be closed
+    del mats, answer
+    for buffer in buffers:
+        buffer.close()
+    conn.close()
+
+
+# Sharded propagation on a pool of local processes: the rows of the (normalized) adjacency are split across
+# the workers by non-zeros, the hop features live in two shared-memory buffers used alternately as
+# source and destination, and the workers are synchronized after every hop.
+class ShardedPropagator:
+    def __init__(self, adj, num_workers, numa_aware=True):
+        if not isinstance(adj, sp.csr_matrix):
+            raise TypeError("The adjacency matrix must be a scipy csr sparse matrix!")
+        elif adj.shape[0] != adj.shape[1]:
+            raise ValueError("The adjacency matrix must be square!")
+
+        self.__adj = adj
+        self.__num_workers = num_workers
+        self.__numa_aware = numa_aware
+        self.__buffers, self.__processes, self.__conns = [], [], []
+        self.__shape = None
+        self.__worker_threads = []
+
+    # number of threads every worker runs the native kernel with, as reported by the workers
+    @property
+    def worker_threads(self):
+        return list(self.__worker_threads)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _start(self, feat_dim):
+        self.__shape = (self.__adj.shape[0], feat_dim)
+        nbytes = max(int(np.prod(self.__shape)) * np.dtype(np.float32).itemsize, 1)
+        self.__buffers = [shared_memory.SharedMemory(create=True, size=nbytes) for _ in range(2)]
+
+        bounds = np.unique(partition_rows_by_nnz(self.__adj.indptr, self.__num_workers))
+        num_shards = len(bounds) - 1
+        worker_cpus, worker_threads = assign_worker_cpus(num_shards, self.__numa_aware)
+
+        # spawn avoids forking a parent whose OpenMP runtime may already be initialized
+        ctx = mp.get_context("spawn")
+        for i in range(num_shards):
+            start, end = int(bounds[i]), int(bounds[i + 1])
+            nnz_st, nnz_ed = self.__adj.indptr[start], self.__adj.indptr[end]
+            indptr = (self.__adj.indptr[start:end + 1] - nnz_st).astype(np.int32)
+            indices = self.__adj.indices[nnz_st:nnz_ed].astype(np.int32)
+            data = self.__adj.data[nnz_st:nnz_ed].astype(np.float32)
+
+            parent_conn, child_conn = ctx.Pipe()
+            process = ctx.Process(target=_shard_worker,
+                                  args=(child_conn, [buffer.name for buffer in self.__buffers], self.__shape,
+                                        (start, end), indptr, indices, data, worker_cpus[i], worker_threads[i]),
+                                  daemon=True)
+            # the environment is inherited by the spawned interpreter, before it loads the OpenMP runtime
+            omp_num_threads = os.environ.get("OMP_NUM_THREADS")
+            os.environ["OMP_NUM_THREADS"] = str(worker_threads[i])
+            try:
+                process.start()
+            finally:
+                if omp_num_threads is None:
+                    del os.environ["OMP_NUM_THREADS"]
+                else:
+                    os.environ["OMP_NUM_THREADS"] = omp_num_threads
+            child_conn.close()
+            self.__processes.append(process)
+            self.__conns.append(parent_conn)
+
+        self.__worker_threads = [conn.recv() for conn in self.__conns]
+
+    def propagate(self, feature, prop_steps, hops):
+        if len(self.__processes) == 0:
+            self._start(feature.shape[1])
+        elif feature.shape[1] != self.__shape[1]:
+            raise ValueError("The feature dimension differs from the one the workers were started with!")
+
+        mats = [np.ndarray(self.__shape, dtype=np.float32, buffer=buffer.buf) for buffer in self.__buffers]
+        mats[0][:] = feature
+
+        prop_feat_list = [None] * (prop_steps + 1)
+        if 0 in hops:
+            prop_feat_list[0] = torch.FloatTensor(feature)
+
+        src = 0
+        for step in range(1, max(hops) + 1):
+            for conn in self.__conns:
+                conn.send(src)
+            for conn in self.__conns:
+                conn.recv()
+            src = 1 - src
+            if step in hops:
+                prop_feat_list[step] = torch.from_numpy(mats[src].copy())
+
+        del mats
+        return prop_feat_list
+
+    def close(self):
+        for conn in self.__conns:
+            try:
+                conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self.__processes:
+            process.join()
+        for conn in self.__conns:
+            conn.close()
+        for buffer in self.__buffers:
+            buffer.close()
+            buffer.unlink()
+        self.__buffers, self.__processes, self.__conns = [], [], []
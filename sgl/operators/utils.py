@@ -40,6 +40,42 @@ def csr_sparse_dense_matmul(adj, feature):
     return answer.reshape(feature.shape)
 
 
+# multiply the row block (indptr, indices, data) of a csr matrix with the whole dense feature matrix,
+# accumulating into answer, a zero-initialized float32 array of shape (num_block_rows, feature.shape[1])
+def csr_block_dense_matmul(indptr, indices, data, feature, answer):
+    file_path = osp.abspath(__file__)
+    dir_path = osp.split(file_path)[0]
+
+    ctl_lib = ctl.load_library("./csrc/libmatmul.so", dir_path)
+
+    arr_1d_int = ctl.ndpointer(
+        dtype=np.int32,
+        ndim=1,
+        flags="CONTIGUOUS"
+    )
+
+    arr_1d_float = ctl.ndpointer(
+        dtype=np.float32,
+        ndim=1,
+        flags="CONTIGUOUS"
+    )
+    ctl_lib.FloatCSRMulDenseOMP.argtypes = [arr_1d_float, arr_1d_float, arr_1d_int, arr_1d_int, arr_1d_float,
+                                            c_int, c_int]
+    ctl_lib.FloatCSRMulDenseOMP.restypes = None
+
+    if not feature.flags["C_CONTIGUOUS"] or feature.dtype != np.float32:
+        raise TypeError("The feature matrix must be a C-contiguous float32 numpy.ndarray!")
+    elif not answer.flags["C_CONTIGUOUS"] or answer.dtype != np.float32:
+        raise TypeError("The answer matrix must be a C-contiguous float32 numpy.ndarray!")
+
+    block_row, mat_col = len(indptr) - 1, feature.shape[1]
+    ctl_lib.FloatCSRMulDenseOMP(answer.reshape(-1), data.astype(np.float32, copy=False),
+                                indices.astype(np.int32, copy=False), indptr.astype(np.int32, copy=False),
+                                feature.reshape(-1), block_row, mat_col)
+
+    return answer
+
+
 def cuda_csr_sparse_dense_matmul(adj, feature):
     file_path = osp.abspath(__file__)
     dir_path = osp.split(file_path)[0]
@@ -73,19 +109,114 @@ def cuda_csr_sparse_dense_matmul(adj, feature):
     return answer.reshape(feature.shape)
 
 
-def adj_to_symmetric_norm(adj, r):
-    adj = adj + sp.eye(adj.shape[0])
-    degrees = np.array(adj.sum(1))
-    r_inv_sqrt_left = np.power(degrees, r - 1).flatten()
-    r_inv_sqrt_left[np.isinf(r_inv_sqrt_left)] = 0.
-    r_mat_inv_sqrt_left = sp.diags(r_inv_sqrt_left)
+# Normalized adjacency diag(d^(r-1)) (adj + I)^T diag(d^-r), d being the row sums of adj + I,
+# computed directly on the csr arrays: the self-loops are inserted into a single new copy of the arrays
+# and the two degree scalings are applied in place to its data. The values are evaluated in the same order
+# as the former sp.eye / sp.diags products, (a_ji * d_i^(r-1)) * d_j^-r in float64, so the result is bit-identical.
+# degrees: optional precomputed row sums of adj + I (e.g. Graph.degrees(self_loops=True)), skipping their computation
+# symmetric: whether adj is known to be symmetric, which avoids the transposition; detected by is_symmetric_csr when None
+def adj_to_symmetric_norm(adj, r, degrees=None, symmetric=None):
+    if isinstance(adj, sp.coo_matrix):
+        adj = adj.tocsr()
+    elif not isinstance(adj, sp.csr_matrix):
+        raise TypeError("The adjacency matrix must be a scipy.sparse.coo_matrix/csr_matrix!")
+    if not adj.has_canonical_format:
+        # duplicates are summed in the original dtype, as the former coo -> csr conversion did
+        adj = adj.tocoo().tocsr()
+
+    adj = add_self_loops_csr(adj)
+    if degrees is None:
+        # csr row sums, accumulated in index order like scipy's sum
+        degrees = np.asarray(adj.sum(1))
+    degrees = np.asarray(degrees, dtype=np.float64).reshape(-1)
+    left = degree_power(degrees, r - 1)
+    right = degree_power(degrees, -r)
+
+    if symmetric is None:
+        symmetric = is_symmetric_csr(adj)
+    if not symmetric:
+        adj = adj.tocsc()
+
+    # the csc arrays of adj + I are the csr arrays of its transpose: entry (i, j) of the result holds a_ji
+    indptr, indices, data = adj.indptr, adj.indices, adj.data
+    data *= np.repeat(left, np.diff(indptr))
+    data *= right[indices]
+
+    adj_normalized = sp.csr_matrix((data, indices, indptr), shape=adj.shape, copy=False)
+    adj_normalized.has_sorted_indices = True
+    # the sparse products dropped the entries that became zero
+    adj_normalized.eliminate_zeros()
+    return adj_normalized
 
-    r_inv_sqrt_right = np.power(degrees, -r).flatten()
-    r_inv_sqrt_right[np.isinf(r_inv_sqrt_right)] = 0.
-    r_mat_inv_sqrt_right = sp.diags(r_inv_sqrt_right)
 
-    adj_normalized = adj.dot(r_mat_inv_sqrt_left).transpose().dot(r_mat_inv_sqrt_right)
-    return adj_normalized
+# Whether a csr matrix with sorted indices equals its transpose, without materializing the transpose:
+# the rows [start, end) of the transpose are gathered from the entries whose column lies in [start, end),
+# one block of about block_nnz entries at a time (at most 16 passes over the indices by default).
+def is_symmetric_csr(adj, block_nnz=None):
+    num_row, nnz = adj.shape[0], adj.nnz
+    if adj.shape[0] != adj.shape[1]:
+        return False
+    indptr, indices, data = adj.indptr, adj.indices, adj.data
+    # the number of entries of every column must match the one of the row
+    if not np.array_equal(np.bincount(indices, minlength=num_row), np.diff(indptr)):
+        return False
+    block_nnz = max(1 << 24, nnz // 16) if block_nnz is None else max(block_nnz, 1)
+
+    start = 0
+    while start < num_row:
+        end = int(np.searchsorted(indptr, indptr[start] + block_nnz, side="right")) - 1
+        end = min(max(end, start + 1), num_row)
+        positions = np.flatnonzero((indices >= start) & (indices < end))
+        # entries are scanned row by row, so a stable sort by column keeps the rows sorted within a column
+        order = np.argsort(indices[positions], kind="stable")
+        positions = positions[order]
+        rows = np.searchsorted(indptr, positions, side="right") - 1
+        st, ed = int(indptr[start]), int(indptr[end])
+        if not (np.array_equal(rows, indices[st:ed]) and np.array_equal(data[positions], data[st:ed])):
+            return False
+        start = end
+    return True
+
+
+# new float64 csr matrix adj + I, with the diagonal entries inserted at their sorted positions
+def add_self_loops_csr(adj):
+    num_row = adj.shape[0]
+    indptr, indices = adj.indptr, adj.indices
+    rows = np.repeat(np.arange(num_row, dtype=indices.dtype), np.diff(indptr))
+
+    on_diag = indices == rows
+    has_loop = np.zeros(num_row, dtype=bool)
+    has_loop[rows[on_diag]] = True
+    missing = np.flatnonzero(~has_loop)
+    # position of the missing diagonal entries among the sorted indices of their rows
+    num_before = np.bincount(rows[indices < rows], minlength=num_row)
+    insert_pos = indptr[missing] + num_before[missing]
+
+    num_new = len(indices) + len(missing)
+    new_pos = np.arange(len(indices)) + np.searchsorted(insert_pos, np.arange(len(indices)), side="right")
+    new_insert_pos = insert_pos + np.arange(len(missing))
+
+    new_indices = np.empty(num_new, dtype=indices.dtype)
+    new_indices[new_pos] = indices
+    new_indices[new_insert_pos] = missing
+    new_data = np.empty(num_new, dtype=np.float64)
+    new_data[new_pos] = adj.data
+    new_data[new_pos[on_diag]] += 1.
+    new_data[new_insert_pos] = 1.
+
+    new_indptr = indptr + np.concatenate(([0], np.cumsum(~has_loop))).astype(indptr.dtype)
+    adj_loop = sp.csr_matrix((new_data, new_indices, new_indptr), shape=adj.shape, copy=False)
+    # entries cancelled by the self-loops are dropped, as the sparse addition does
+    adj_loop.eliminate_zeros()
+    return adj_loop
+
+
+# elementwise degrees ** exponent, with the entries of zero-degree nodes set to zero
+def degree_power(degrees, exponent):
+    with np.errstate(divide="ignore"):
+        powered = np.power(degrees, exponent)
+    powered[np.isinf(powered)] = 0.
+    return powered
 
 
 def one_dim_weighted_add(feat_list, weight_list):
@@ -98,6 +229,7 @@ def one_dim_weighted_add(feat_list, weight_list):
 
     feat_shape = feat_list[0].shape
     feat_reshape = torch.vstack([feat.view(1, -1).squeeze(0) for feat in feat_list])
+    weight_list = weight_list.to(feat_reshape.device)
     weighted_feat = (feat_reshape * weight_list.view(-1, 1)).sum(dim=0).view(feat_shape)
     return weighted_feat
 
@@ -111,6 +243,6 @@ def two_dim_weighted_add(feat_list, weight_list):
         raise ValueError("The weight list should be a 2d tensor!")
 
     feat_reshape = torch.stack(feat_list, dim=2)
-    weight_reshape = weight_list.unsqueeze(dim=2)
+    weight_reshape = weight_list.to(feat_reshape.device).unsqueeze(dim=2)
     weighted_feat = torch.bmm(feat_reshape, weight_reshape).squeeze(dim=2)
     return weighted_feat
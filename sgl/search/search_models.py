@@ -15,6 +15,8 @@ class SearchModel(BaseSGAPModel):
         post_types = arch[5]
         pmsg_types = arch[6]
         super(SearchModel, self).__init__(prop_steps, feat_dim, output_dim)
+        # trials sharing (prop_types, prop_steps, mesg_types) reuse the pre-processed features
+        self._memoize = True
 
         if prop_types == 1:
             self._pre_graph_op = LaplacianGraphOp(prop_steps, r=0.5)
@@ -46,7 +46,7 @@ class NodeClassification(BaseTask):
         set_seed(self.__seed)
 
         pre_time_st = time.time()
-        self.__model.preprocess(self.__dataset.adj, self.__dataset.x)
+        self.__model.preprocess(self.__dataset.adj, self.__dataset.x, self.__dataset.degrees)
         pre_time_ed = time.time()
         print(f"Preprocessing done in {(pre_time_ed - pre_time_st):.4f}s")
 
@@ -104,7 +104,7 @@ class NodeClassification(BaseTask):
                 else:
                     outputs = torch.vstack((outputs, output))
 
-        final_output = self.__model.postprocess(self.__dataset.adj, outputs)
+        final_output = self.__model.postprocess(self.__dataset.adj, outputs, self.__dataset.degrees)
         acc_val = accuracy(
             final_output[self.__dataset.val_idx], self.__labels[self.__dataset.val_idx])
         acc_test = accuracy(
@@ -1,3 +1,4 @@
+import numpy as np
 import os
 import time
 import torch
@@ -7,6 +8,7 @@ import torch.distributed as dist
 import torch.multiprocessing as mp
 from torch.utils.data import Dataset, DataLoader
 
+from sgl.operators.sharded_propagation import partition_rows_by_nnz
 from sgl.tasks.base_task import BaseTask
 from sgl.tasks.utils import accuracy, set_seed, train, mini_batch_train, evaluate, mini_batch_evaluate
 
@@ -32,7 +34,13 @@ class NodeClassificationDist(BaseTask):
         self.__model = model
         self.__seed = seed
 
+    # With args.dist_preprocess set, the propagation is done by the workers themselves: every rank owns a row
+    # partition of the adjacency and of the features, propagates it with the other ranks and trains from it.
+    # args.backend selects the process group backend ('nccl' by default, 'gloo' to run on CPU processes).
     def _execute(self, args):
+        if getattr(args, "dist_preprocess", False):
+            return self._execute_dist_preprocess(args)
+
         t_pre_start = time.time()
         self.__model.preprocess(self.__dataset.adj, self.__dataset.x)
         t_pre_end = time.time()
@@ -95,6 +103,95 @@ class NodeClassificationDist(BaseTask):
                 loss.backward()
                 optimizer.step()
 
+    def _execute_dist_preprocess(self, args):
+        args.world_size = args.gpus * args.nodes
+        os.environ['MASTER_ADDR'] = '127.0.0.1'
+        os.environ['MASTER_PORT'] = '1788'
+
+        t_total = time.time()
+        result_queue = mp.get_context("spawn").SimpleQueue()
+        mp.spawn(self._train_partitioned, nprocs=args.gpus, args=(args, self.__dataset, self.__model, result_queue))
+        acc_val, acc_test = result_queue.get()
+        print('acc_val: {:.4f}'.format(acc_val), 'acc_test: {:.4f}'.format(acc_test))
+
+        print("Optimization Finished!")
+        print("Total time elapsed: {:.4f}s".format(time.time() - t_total))
+        return acc_test
+
+    def _train_partitioned(self, gpu, args, dataset, model, result_queue):
+        rank = args.nr * args.gpus + gpu
+        backend = getattr(args, "backend", "nccl")
+        dist.init_process_group(backend=backend, init_method='env://', world_size=args.world_size, rank=rank)
+        set_seed(self.__seed)
+
+        device = torch.device("cpu")
+        if backend == "nccl":
+            torch.cuda.set_device(gpu)
+            device = torch.device(f"cuda:{gpu}")
+
+        adj = dataset.adj
+        row_bounds = partition_rows_by_nnz(adj.indptr, args.world_size)
+        start, end = int(row_bounds[rank]), int(row_bounds[rank + 1])
+        feature = dataset.x
+        feature = feature.numpy() if isinstance(feature, torch.Tensor) else np.asarray(feature)
+
+        t_pre_start = time.time()
+        model.dist_preprocess(adj[start:end], feature[start:end], row_bounds)
+        if rank == 0:
+            print(f"Distributed preprocessing done in {(time.time() - t_pre_start):.4f}s")
+        _processed_feat_list = model._processed_feat_list
+
+        model = model.to(device)
+        criterion = nn.CrossEntropyLoss().to(device)
+        optimizer = Adam(model.parameters(), lr=args.lr, weight_decay=args.wd)
+        model = nn.parallel.DistributedDataParallel(model, device_ids=[gpu] if backend == "nccl" else None)
+
+        labels_all = dataset.y
+
+        # global node ids owned by this rank, shifted to rows of the local hop store
+        def local_rows(idx):
+            idx = torch.as_tensor(idx, dtype=torch.long)
+            return idx[(idx >= start) & (idx < end)] - start
+
+        train_rows = local_rows(dataset.train_idx)
+        # every rank must run the same number of steps for the gradient all-reduce
+        num_train = torch.LongTensor([len(train_rows)])
+        dist.all_reduce(num_train, op=dist.ReduceOp.MAX)
+        num_train = int(num_train.item())
+
+        for epoch in range(args.epochs):
+            model.train()
+            if len(train_rows) > 0:
+                perm = train_rows[torch.randperm(len(train_rows))]
+                perm = perm.repeat((num_train + len(perm) - 1) // len(perm))[:num_train]
+            else:
+                perm = torch.zeros(0, dtype=torch.long)
+            for i in range(0, num_train, args.batch):
+                idx = perm[i:i + args.batch]
+                transferred_feat_list = [feat[idx].to(device) for feat in _processed_feat_list]
+                labels = labels_all[idx + start].to(device)
+                outputs = model(transferred_feat_list)
+                # ranks without training rows still take part in the all-reduce with a zero loss
+                loss = criterion(outputs, labels) if len(idx) > 0 else outputs.sum() * 0.
+
+                optimizer.zero_grad()
+                loss.backward()
+                optimizer.step()
+
+        model.eval()
+        counts = torch.zeros(4, dtype=torch.float64)
+        with torch.no_grad():
+            for k, idx in enumerate([dataset.val_idx, dataset.test_idx]):
+                rows = local_rows(idx)
+                if len(rows) > 0:
+                    outputs = model.module([feat[rows].to(device) for feat in _processed_feat_list])
+                    counts[2 * k] = (outputs.argmax(dim=1).cpu() == labels_all[rows + start]).sum().item()
+                counts[2 * k + 1] = len(rows)
+        dist.all_reduce(counts)
+        if rank == 0:
+            result_queue.put((counts[0].item() / max(counts[1].item(), 1.), counts[2].item() / max(counts[3].item(), 1.)))
+        dist.destroy_process_group()
+
     def _postprocess(self):
         device = torch.device(f"cuda:{0}" if torch.cuda.is_available() else "cpu")
         model = self.__model.to(device)
@@ -102,7 +199,7 @@ class NodeClassificationDist(BaseTask):
 
         t_forward_start = time.time()
         output = model.model_forward(range(self.__dataset.num_node), device)
-        final_output = model.postprocess(self.__dataset.adj, output)
+        final_output = model.postprocess(self.__dataset.adj, output).to("cpu")
         t_forward_end = time.time()
         time_forward = t_forward_end - t_forward_start
 